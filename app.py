@@ -1,12 +1,45 @@
-from fastapi import FastAPI, HTTPException, Body, Response
+from fastapi import FastAPI, HTTPException, Body, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Any, Dict, List
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import quote
+import base64
+import binascii
+import contextvars
+import hashlib
+import io
+import json
 import logging
+import os
+import queue
+import re
+import threading
+import time
+import zipfile
+
+from pptx.exc import PackageNotFoundError
 
 # WICHTIG: direkt aus dem Builder importieren – inkl. Version für Sichtbarkeit
-from pptx_builder import build_pptx, build_base64, sanitize_text, BUILDER_VERSION
-from json_sanitizer import validate_and_sanitize
+from pptx_builder import (build_pptx, execute_plan, execute_variants, merge_decks, sanitize_text,
+                          base_template, BUILDER_VERSION)
+from json_sanitizer import (validate_and_sanitize, sanitize_theme, sanitize_filename_safe,
+                            sanitize_variant, variants_from_csv)
+from render_plan import compile_deck, deck_timestamp
+import cost_model
+import deadline
+import input_limits
+import logo_store
+import master_template
+import memtrack
+import metrics
+import object_store
+import profiling
+import recycle
+import render_cache
+import scheduler
+import singleflight
+import theme_store
+import tracing
 
 # Configure logging
 logging.basicConfig(
@@ -17,16 +50,45 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="PPTX Maker")
 
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+# Deadline pro Request (X-PPTX-Deadline-Ms / PPTX_RENDER_TIMEOUT_SECONDS), bricht bei Client-Abbruch ab
+app.add_middleware(deadline.DeadlineMiddleware)
+
+# Root-Span pro Request (PPTX_TRACE_SAMPLE_RATE), Export als OTLP/JSON
+app.add_middleware(tracing.TracingMiddleware)
+
 # CORS (erlaubt Aufrufe aus Power Automate/Browser)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition", "X-PPTX-Render-Id", "X-PPTX-Cache", "X-PPTX-Slides",
+                    "X-PPTX-Variants", "X-PPTX-Trace-Id"],
 )
 
+# Request-Body begrenzen (PPTX_MAX_BODY_BYTES), auch ohne Content-Length (chunked)
+app.add_middleware(input_limits.BodySizeLimitMiddleware)
+
+@app.middleware("http")
+async def close_when_draining(request: Request, call_next):
+    """A worker being recycled closes keep-alive connections, so clients move to other workers."""
+    response = await call_next(request)
+    if recycle.draining():
+        response.headers["Connection"] = "close"
+    return response
+
+# Slim base template einmal pro Worker beim Start bauen, nicht beim ersten Request
+base_template()
+# Corporate Master-Template (PPTX_TEMPLATE_PATH) ebenso vorab parsen
+master_template.load()
+
 @app.get("/")
 def root():
+    if recycle.draining():
+        # Load balancer health checks: this worker is about to be replaced
+        return JSONResponse(status_code=503, content={"status": "draining", "reason": recycle.draining()})
     return {
         "status": "ok",
         "service": "pptx-maker",
@@ -35,10 +97,62 @@ def root():
             "unicode-sanitization",
             "raw-json-passthrough",
             "json-auto-correction",
-            "robustness-layer"
+            "robustness-layer",
+            "inline-logos",
+            "render-cache",
+            "render-plan",
+            "themes",
+            "master-template",
+            "merge",
+            "variants",
+            "progress-stream",
+            "object-store"
         ]
     }
 
+@app.get("/metrics")
+def get_metrics():
+    """Per-worker counters/timings plus shared render cache stats (JSON)."""
+    result = metrics.snapshot()
+    result["worker"] = recycle.status()
+    result["scheduler"] = scheduler.status()
+    cache = render_cache.get_cache()
+    if cache is not None:
+        result["render_cache"] = cache.stats()
+    return result
+
+@app.post("/themes")
+def register_theme(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    """
+    Registriert ein Theme (Font, Farben, Logos) einmalig; Render-Requests
+    referenzieren es danach nur noch über meta.style.themeId.
+    Ein bestehendes Theme mit derselben id wird ersetzt.
+    """
+    try:
+        theme = sanitize_theme(payload)
+        registered = theme_store.register(theme["id"], theme["style"])
+        metrics.incr("themes.registered")
+        result = registered.as_dict()
+        result["logos"] = _logo_refs({"meta": {"style": registered.style}})
+        return result
+    except ValueError as e:
+        logger.error(f"Theme validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /themes endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/themes")
+def list_themes() -> Dict[str, Any]:
+    return {"themes": theme_store.list_ids()}
+
+@app.get("/themes/{theme_id}")
+def get_theme(theme_id: str) -> Dict[str, Any]:
+    theme = theme_store.get(theme_id)
+    if theme is None:
+        raise HTTPException(status_code=404, detail=f"Unknown theme '{theme_id}'")
+    return theme.as_dict()
+
 def _extract_and_sanitize_deck(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Extracts and sanitizes deck from payload.
@@ -46,7 +160,9 @@ def _extract_and_sanitize_deck(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     try:
         # Validate and sanitize the entire payload
-        sanitized_deck = validate_and_sanitize(payload)
+        with memtrack.stage("sanitize"), tracing.span("sanitize") as sp:
+            sanitized_deck = validate_and_sanitize(payload)
+            sp.set_attribute("deck.slides", len(sanitized_deck["slides"]))
 
         # Mini-Diagnose: welche Keys kommen pro Slide an?
         slides = sanitized_deck.get("slides", [])
@@ -55,22 +171,88 @@ def _extract_and_sanitize_deck(payload: Dict[str, Any]) -> Dict[str, Any]:
                 if isinstance(sl, dict):
                     logger.info(f"Slide {i} keys: {list(sl.keys())}")
 
-        # Builder-Version zusätzlich in meta schreiben (sichtbar im PPTX-Badge & Header)
-        meta = sanitized_deck.setdefault("meta", {})
-        if isinstance(meta, dict):
-            meta.setdefault("builder_version", BUILDER_VERSION)
-
+        # Deck ist ab hier unveränderlich; Builder-Version kommt aus BUILDER_VERSION
         return sanitized_deck
 
     except ValueError as e:
-        # Validation error from sanitizer
+        # Validation error from sanitizer (InputLimitError carries 413/400)
         logger.error(f"Validation error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+        if isinstance(e, input_limits.InputLimitError):
+            metrics.incr("limits.rejected")
+        raise HTTPException(status_code=getattr(e, "status_code", 400), detail=str(e))
     except Exception as e:
         # Unexpected error
         logger.exception("Unexpected error during deck extraction")
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
+def _logo_refs(deck: Dict[str, Any]) -> Dict[str, str]:
+    """
+    "sha256:" references of inline logos, so clients can send just the hash next time.
+    """
+    style = deck.get("meta", {}).get("style", {})
+    return {
+        key: style[key]
+        for key in ("logo", "clientLogo")
+        if logo_store.is_logo_ref(style.get(key))
+    }
+
+# identical decks rendered concurrently in this worker share one build
+_inflight = singleflight.SingleFlight("singleflight")
+
+def _single_flight_enabled() -> bool:
+    return os.getenv("PPTX_SINGLE_FLIGHT", "1").lower() not in ("0", "false", "no")
+
+def _build(deck: Dict[str, Any], on_slide: Optional[Callable] = None) -> bytes:
+    # small decks first, oversized decks in their own lane (see scheduler)
+    predicted = cost_model.estimate(deck)
+    with scheduler.slot(predicted.seconds, poll=lambda: deadline.check("queued")):
+        started = time.perf_counter()
+        data = build_pptx(deck, on_slide)
+        cost_model.record(predicted, time.perf_counter() - started, len(data))
+    # RSS + render count; may start recycling this worker (after this response)
+    recycle.note_render()
+    return data
+
+def _render(deck: Dict[str, Any], on_slide: Optional[Callable] = None) -> Tuple[str, Optional[str], Optional[str], Optional[bytes]]:
+    """
+    Renders a sanitized deck through the shared disk cache (if enabled), joining
+    an identical render already in flight in this worker.
+    `on_slide` (progress) is only called when this request draws the slides itself.
+    Returns (cache_status, render_id, cached_path, pptx_bytes) – either path or bytes is set.
+    cache_status: "off" / "miss" (rendered), "hit" (from disk), "joined" (shared render).
+    render_id: cache key usable with /merge (None without render cache).
+    """
+    # waited too long in the threadpool queue already? then do not start
+    deadline.check("queued")
+    cache = render_cache.get_cache()
+    if cache is None and not _single_flight_enabled():
+        return "off", None, None, _build(deck, on_slide)
+
+    key = render_cache.deck_hash(deck)
+    render_id = key if cache is not None else None
+    if cache is not None:
+        path = cache.get_path(key)
+        if path:
+            return "hit", render_id, path, None
+
+    def build() -> bytes:
+        data = _build(deck, on_slide)
+        if cache is not None:
+            try:
+                cache.put(key, data)
+            except OSError as e:
+                # a full or read-only cache volume must not fail the render
+                logger.warning(f"Could not write render cache entry {key}: {e}")
+        return data
+
+    if not _single_flight_enabled():
+        return "miss", render_id, None, build()
+    # waiters give up on their own deadline; another caller's deadline is no reason to fail
+    data, shared = _inflight.do(key, build, poll=deadline.check, retry_on=(deadline.RenderCancelled,))
+    if shared:
+        return "joined", render_id, None, data
+    return ("off" if cache is None else "miss"), render_id, None, data
+
 @app.post("/render")
 def render_pptx(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
     """
@@ -78,23 +260,124 @@ def render_pptx(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
     Enthält automatische JSON-Korrektur für robuste Verarbeitung von LLM-Output.
     """
     try:
-        deck = _extract_and_sanitize_deck(payload)
-        customer = sanitize_text(deck.get("meta", {}).get("customer", "Deck"))
-        title = sanitize_text(deck.get("meta", {}).get("deckTitle", "Presentation"))
-        filename = f"{customer} - {title}.pptx"
-        result = build_base64(deck, filename)
+        with memtrack.track_request() as mem:
+            deck = _extract_and_sanitize_deck(payload)
+            customer = sanitize_text(deck.get("meta", {}).get("customer", "Deck"))
+            title = sanitize_text(deck.get("meta", {}).get("deckTitle", "Presentation"))
+            filename = f"{customer} - {title}.pptx"
+            cache_status, render_id, cached_path, pptx_bytes = _render(deck)
+            with memtrack.stage("encode"):
+                encoded = None
+                if cached_path:
+                    try:
+                        with render_cache.get_cache().open_mmap(cached_path) as mm:
+                            encoded = base64.b64encode(mm).decode("utf-8")
+                    except FileNotFoundError:
+                        logger.warning(f"Render cache entry {render_id} evicted, rendering again")
+                        cache_status, pptx_bytes = "miss", _build(deck)
+                if encoded is None:
+                    encoded = base64.b64encode(pptx_bytes).decode("utf-8")
+        result = {"filename": filename, "file": encoded}
         # Optional: Version im Response ergänzen für Debug
         result["_meta"] = {
             "builder_version": deck.get("meta", {}).get("builder_version", BUILDER_VERSION),
-            "sanitized": True
+            "sanitized": True,
+            "logos": _logo_refs(deck),
+            "cache": cache_status
         }
+        if render_id:
+            result["_meta"]["renderId"] = render_id
+        if mem is not None:
+            result["_meta"]["memory"] = mem.as_dict()
         return result
     except HTTPException:
         raise
+    except deadline.RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.exception("Error in /render endpoint")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/render/plan")
+def render_plan_dry_run(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    """
+    Dry run: sanitizes and compiles the deck into its render plan (draw operations
+    with resolved geometry and styles) without building a PPTX.
+    """
+    try:
+        deck = _extract_and_sanitize_deck(payload)
+        started = time.perf_counter()
+        plan = compile_deck(deck)
+        compile_seconds = time.perf_counter() - started
+        predicted = cost_model.estimate(deck)
+        return {
+            "plan": plan,
+            "_meta": {
+                "builder_version": deck.get("meta", {}).get("builder_version", BUILDER_VERSION),
+                "slides": len(plan["slides"]),
+                "ops": sum(len(sl["ops"]) for sl in plan["slides"]),
+                "compile_seconds": round(compile_seconds, 6),
+                "estimate": dict(predicted.as_dict(), lane=scheduler.lane_for(predicted.seconds)),
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in /render/plan endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/render/profile")
+def render_profile(payload: Dict[str, Any] = Body(...),
+                   x_pptx_admin_token: Optional[str] = Header(None),
+                   top: int = 25, sort: str = "cumulative", include_file: bool = False) -> Dict[str, Any]:
+    """
+    Admin: rendert unter cProfile (Sanitizer + Build, ohne Cache) und liefert die
+    teuersten Funktionen und Zeiten pro Slide-Typ, optional zusätzlich die Datei.
+    Nur aktiv mit PPTX_PROFILING_ENABLED=1 und PPTX_ADMIN_TOKEN, sonst 404.
+    """
+    if not profiling.enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.authorized(x_pptx_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if sort not in profiling.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(profiling.SORT_KEYS)}")
+    try:
+        timer = profiling.SlideTimer()
+        (deck, plan, data), seconds, prof = profiling.profile_stages([
+            ("sanitize", lambda _: _extract_and_sanitize_deck(payload)),
+            ("compile", compile_deck),
+            ("execute", lambda plan: execute_plan(plan, on_slide=timer)),
+        ])
+        recycle.note_render()
+        metrics.incr("profile.requests")
+        result = {
+            "profile": {
+                "stages": seconds,
+                "total_seconds": round(sum(seconds.values()), 6),
+                "slides": len(plan["slides"]),
+                "sort": sort,
+                "functions": profiling.top_functions(prof, limit=max(1, min(top, 200)), sort=sort),
+                **timer.summary(),
+            },
+            "_meta": {
+                "builder_version": deck.get("meta", {}).get("builder_version", BUILDER_VERSION),
+                "bytes": len(data),
+            },
+        }
+        if include_file:
+            customer = sanitize_text(deck.get("meta", {}).get("customer", "Deck"))
+            title = sanitize_text(deck.get("meta", {}).get("deckTitle", "Presentation"))
+            result["filename"] = f"{customer} - {title}.pptx"
+            result["file"] = base64.b64encode(data).decode("utf-8")
+        return result
+    except HTTPException:
+        raise
+    except deadline.RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /render/profile endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/render/bytes")
 def render_pptx_bytes(payload: Dict[str, Any] = Body(...)):
     """
@@ -103,29 +386,553 @@ def render_pptx_bytes(payload: Dict[str, Any] = Body(...)):
     media_type = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
     """
     try:
-        deck = _extract_and_sanitize_deck(payload)
+        with memtrack.track_request() as mem:
+            deck = _extract_and_sanitize_deck(payload)
+            cache_status, render_id, cached_path, pptx_bytes = _render(deck)
+            cached_file = None
+            if cached_path:
+                # opened here, so eviction of the path before the response is sent cannot break it
+                try:
+                    cached_file = open(cached_path, "rb")
+                except FileNotFoundError:
+                    logger.warning(f"Render cache entry {render_id} evicted, rendering again")
+                    cache_status, pptx_bytes = "miss", _build(deck)
 
         customer = sanitize_text(deck.get("meta", {}).get("customer", "Deck"))
         title = sanitize_text(deck.get("meta", {}).get("deckTitle", "Presentation"))
         filename = f"{customer} - {title}.pptx"
 
-        # URL-encode filename für Content-Disposition (RFC 5987)
-        filename_encoded = quote(filename)
+        headers = {
+            "Content-Disposition": _content_disposition(filename),
+            "X-PPTX-Builder-Version": deck.get("meta", {}).get("builder_version", BUILDER_VERSION),
+            "X-PPTX-Sanitized": "true",
+            "X-PPTX-Cache": cache_status,
+        }
+        logos = _logo_refs(deck)
+        if "logo" in logos:
+            headers["X-PPTX-Logo-Ref"] = logos["logo"]
+        if "clientLogo" in logos:
+            headers["X-PPTX-Client-Logo-Ref"] = logos["clientLogo"]
+        if render_id:
+            headers["X-PPTX-Render-Id"] = render_id
+        if mem is not None:
+            headers["X-PPTX-Memory"] = mem.header_value()
 
-        pptx_bytes = build_pptx(deck)
+        if cached_file is not None:
+            # streamed from disk in chunks, never loaded into memory as a whole
+            headers["Content-Length"] = str(os.fstat(cached_file.fileno()).st_size)
+            return StreamingResponse(_file_chunks(cached_file), media_type=PPTX_MEDIA_TYPE, headers=headers)
 
         return Response(
             content=pptx_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-            headers={
-                # Doppelstrategie: klassisches filename + RFC5987 filename* für saubere Anzeige
-                "Content-Disposition": f'attachment; filename="{filename}"; filename*=UTF-8\'\'{filename_encoded}',
-                "X-PPTX-Builder-Version": deck.get("meta", {}).get("builder_version", BUILDER_VERSION),
-                "X-PPTX-Sanitized": "true",
-            },
+            media_type=PPTX_MEDIA_TYPE,
+            headers=headers,
         )
     except HTTPException:
         raise
+    except deadline.RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.exception("Error in /render/bytes endpoint")
         raise HTTPException(status_code=500, detail=str(e))
+
+def _file_chunks(f, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Reads an opened file to the end and closes it."""
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def _output_base_url(request: Request) -> str:
+    """Public address of this service for /outputs links (behind a proxy: PPTX_OUTPUT_BASE_URL)."""
+    return os.getenv("PPTX_OUTPUT_BASE_URL") or str(request.base_url)
+
+@app.post("/render/url")
+def render_pptx_url(request: Request, payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    """
+    Rendert eine PPTX in den Object Store (S3 oder Shared Volume) und liefert statt
+    der Datei eine ablaufende URL plus SHA-256. Bereits veröffentlichte Decks kommen
+    sofort als Referenz zurück, ohne erneutes Rendern oder Hochladen.
+    """
+    store = object_store.get_store()
+    if store is None:
+        raise HTTPException(status_code=501, detail="No object store configured (PPTX_S3_BUCKET or PPTX_OUTPUT_DIR)")
+    try:
+        deck = _extract_and_sanitize_deck(payload)
+        customer = sanitize_text(deck.get("meta", {}).get("customer", "Deck"))
+        title = sanitize_text(deck.get("meta", {}).get("deckTitle", "Presentation"))
+        filename = f"{customer} - {title}.pptx"
+        base_url = _output_base_url(request)
+        deck_key = render_cache.deck_hash(deck)
+
+        render_id = None
+        ref = object_store.lookup(store, deck_key, filename, base_url)
+        if ref is not None:
+            cache_status = "published"
+        else:
+            cache_status, render_id, cached_path, pptx_bytes = _render(deck)
+            with tracing.span("upload", {"object_store": store.name}):
+                try:
+                    ref = object_store.publish(store, deck_key, cached_path or pptx_bytes, filename, base_url)
+                except FileNotFoundError:
+                    # cache entry evicted between lookup and upload
+                    ref = object_store.publish(store, deck_key, _build(deck), filename, base_url)
+        result = {
+            "filename": filename,
+            "url": ref["url"],
+            "expiresAt": ref["expiresAt"],
+            "sha256": ref["sha256"],
+            "size": ref["size"],
+            "_meta": {
+                "builder_version": BUILDER_VERSION,
+                "sanitized": True,
+                "logos": _logo_refs(deck),
+                "cache": cache_status,
+                "store": ref["store"],
+                "uploaded": ref["uploaded"],
+            }
+        }
+        if render_id:
+            result["_meta"]["renderId"] = render_id
+        return result
+    except HTTPException:
+        raise
+    except deadline.RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except object_store.ObjectStoreError as e:
+        logger.error(f"Object store upload failed: {e}")
+        metrics.incr("object_store.errors")
+        raise HTTPException(status_code=502, detail=f"Object store upload failed: {e}")
+    except Exception as e:
+        logger.exception("Error in /render/url endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _variants_max_items() -> int:
+    return int(os.getenv("PPTX_VARIANTS_MAX_ITEMS", "100"))
+
+def _variant_decks(payload: Dict[str, Any]) -> Tuple[List[Any], List[str]]:
+    """
+    Sanitizes the base deck once and applies every variant's overrides to it.
+    Returns (decks, filenames) – all validation happens before the response starts.
+    """
+    base = _extract_and_sanitize_deck(payload)
+    try:
+        if payload.get("csv") is not None:
+            variants = variants_from_csv(payload["csv"])
+        else:
+            variants = payload.get("variants")
+            if not isinstance(variants, list) or not variants:
+                raise ValueError("'variants' must be a non-empty list (or send 'csv')")
+        if len(variants) > _variants_max_items():
+            raise ValueError(f"At most {_variants_max_items()} variants per request")
+        decks = [sanitize_variant(base, v, i) for i, v in enumerate(variants, start=1)]
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        if isinstance(e, input_limits.InputLimitError):
+            metrics.incr("limits.rejected")
+        raise HTTPException(status_code=getattr(e, "status_code", 400), detail=str(e))
+
+    filenames, seen = [], set()
+    for variant, deck in zip(variants, decks):
+        name = variant.get("filename")
+        if name:
+            name = sanitize_text(sanitize_filename_safe(str(name)))
+            name = name[:-5] if name.lower().endswith(".pptx") else name
+        else:
+            name = f"{sanitize_text(deck['meta']['customer'])} - {sanitize_text(deck['meta']['deckTitle'])}"
+        unique, n = name, 2
+        while unique.lower() in seen:
+            unique, n = f"{name} ({n})", n + 1
+        seen.add(unique.lower())
+        filenames.append(f"{unique}.pptx")
+    return decks, filenames
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only sink for zipfile; the response generator drains it after every entry."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _variant_archive(decks: List[Any], filenames: List[str]) -> Iterator[bytes]:
+    """
+    Renders the variants and streams them as a ZIP, one entry per finished variant
+    (stored, PPTX is already deflated). Cached variants are read from the render
+    cache; the others are compiled with a shared plan memo and rendered by
+    execute_variants, which draws only the slides that differ between variants.
+    Ends with manifest.json (filename, renderId, cache, reused slides per variant).
+    """
+    cache = render_cache.get_cache()
+    keys = [render_cache.deck_hash(deck) for deck in decks] if cache is not None else [None] * len(decks)
+    cached = [cache.get_path(key) if cache is not None else None for key in keys]
+
+    memo: Dict[Any, Any] = {}
+    plans = (compile_deck(deck, memo=memo) for deck, path in zip(decks, cached) if not path)
+    rendered = execute_variants(plans)
+
+    sink = _ChunkWriter()
+    date_time = deck_timestamp(decks[0]["meta"].get("date")).timetuple()[:6]
+    manifest = []
+    try:
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+            for deck, filename, key, path in zip(decks, filenames, keys, cached):
+                entry = {"filename": filename, "customer": deck["meta"]["customer"]}
+                data = None
+                if path:
+                    try:
+                        with open(path, "rb") as f:
+                            data = f.read()
+                        entry["cache"] = "hit"
+                    except FileNotFoundError:
+                        logger.warning(f"Render cache entry {key} evicted, rendering variant again")
+                if data is None:
+                    if path:
+                        data, reused = _build(deck), 0
+                    else:
+                        data, reused = next(rendered)
+                        recycle.note_render()
+                    entry["cache"] = "off" if cache is None else "miss"
+                    entry["reusedSlides"] = reused
+                    metrics.incr("variants.rendered")
+                    if cache is not None:
+                        try:
+                            cache.put(key, data)
+                        except OSError as e:
+                            logger.warning(f"Could not write render cache entry {key}: {e}")
+                if key:
+                    entry["renderId"] = key
+                manifest.append(entry)
+                zf.writestr(zipfile.ZipInfo(filename, date_time), data)
+                yield sink.drain()
+            info = zipfile.ZipInfo("manifest.json", date_time)
+            zf.writestr(info, json.dumps({"builder_version": BUILDER_VERSION, "variants": manifest},
+                                         ensure_ascii=False, indent=2))
+        yield sink.drain()
+    except deadline.RenderCancelled as e:
+        logger.warning(f"/render/variants abandoned: {e}")
+        raise
+    except Exception:
+        # headers are already sent – the client sees a truncated archive
+        logger.exception("Error while streaming /render/variants")
+        metrics.incr("variants.failures")
+        raise
+    finally:
+        rendered.close()
+
+@app.post("/render/variants")
+def render_variants(payload: Dict[str, Any] = Body(...)):
+    """
+    Ein Basis-Deck, viele Varianten (Kunde, Logos, Farben, einzelne Texte) in einem Call.
+    variants: [{"customer": ..., "clientLogo": ..., "colors.primary": ..., "slides": {"<id>": {...}}}, ...]
+    oder csv: Serienbrief-CSV, Spaltennamen = Felder. Antwort: ZIP-Stream mit einer PPTX pro Variante.
+    """
+    try:
+        decks, filenames = _variant_decks(payload)
+        metrics.incr("variants.requests")
+        metrics.incr("variants.items", len(decks))
+        name = payload.get("filename") or f"{decks[0]['meta']['deckTitle']} - Variants"
+        name = sanitize_text(sanitize_filename_safe(str(name)))
+        archive = name if name.lower().endswith(".zip") else f"{name}.zip"
+        headers = {
+            "Content-Disposition": _content_disposition(archive),
+            "X-PPTX-Builder-Version": BUILDER_VERSION,
+            "X-PPTX-Variants": str(len(decks)),
+        }
+        return StreamingResponse(_variant_archive(decks, filenames), media_type="application/zip",
+                                 headers=headers)
+    except HTTPException:
+        raise
+    except deadline.RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /render/variants endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
+_RENDER_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+def _merge_max_parts() -> int:
+    return int(os.getenv("PPTX_MERGE_MAX_PARTS", "20"))
+
+def _content_disposition(filename: str) -> str:
+    # Doppelstrategie: klassisches filename + RFC5987 filename* (URL-encoded) für saubere Anzeige
+    return f'attachment; filename="{filename}"; filename*=UTF-8\'\'{quote(filename)}'
+
+def _merge_sources(payload: Dict[str, Any]) -> Tuple[List[Any], str]:
+    """
+    Resolves the "parts" of a merge request to PPTX bytes (uploads) or paths
+    (render cache entries). Returns (sources, merge_key).
+    """
+    parts = payload.get("parts") if isinstance(payload, dict) else None
+    if not isinstance(parts, list) or not parts:
+        raise HTTPException(status_code=400, detail="'parts' must be a non-empty list")
+    if len(parts) > _merge_max_parts():
+        raise HTTPException(status_code=400, detail=f"At most {_merge_max_parts()} parts can be merged")
+
+    sources, ids = [], []
+    for i, part in enumerate(parts, start=1):
+        if not isinstance(part, dict):
+            raise HTTPException(status_code=400, detail=f"parts[{i}] must be an object with 'renderId' or 'file'")
+        if part.get("renderId"):
+            render_id = str(part["renderId"]).strip().lower()
+            if not _RENDER_ID_RE.match(render_id):
+                raise HTTPException(status_code=400, detail=f"parts[{i}]: invalid renderId")
+            cache = render_cache.get_cache()
+            if cache is None:
+                raise HTTPException(status_code=400, detail="renderId needs the render cache (PPTX_RENDER_CACHE_DIR)")
+            path = cache.get_path(render_id, count=False)
+            if not path:
+                raise HTTPException(status_code=404, detail=f"Render {render_id} is no longer cached - render it again")
+            sources.append(path)
+            ids.append(render_id)
+        elif part.get("file"):
+            try:
+                data = base64.b64decode(part["file"], validate=True)
+            except (binascii.Error, ValueError, TypeError):
+                raise HTTPException(status_code=400, detail=f"parts[{i}]: 'file' is not valid base64")
+            if not zipfile.is_zipfile(io.BytesIO(data)):
+                raise HTTPException(status_code=400, detail=f"parts[{i}] is not a PPTX package")
+            sources.append(data)
+            ids.append(hashlib.sha256(data).hexdigest())
+        else:
+            raise HTTPException(status_code=400, detail=f"parts[{i}] needs 'renderId' or 'file'")
+
+    merge_key = hashlib.sha256(f"{BUILDER_VERSION}|merge|{'|'.join(ids)}".encode("utf-8")).hexdigest()
+    return sources, merge_key
+
+def _merge(payload: Dict[str, Any]) -> Tuple[str, Optional[str], bytes, Dict[str, Any]]:
+    """
+    Merges the requested packages (through the render cache, if enabled).
+    Returns (filename, render_id, pptx_bytes, meta).
+    """
+    sources, key = _merge_sources(payload)
+    deadline.check("queued")
+    name = sanitize_text(sanitize_filename_safe(payload.get("filename") or "Merged"))
+    filename = name if name.lower().endswith(".pptx") else f"{name}.pptx"
+
+    cache = render_cache.get_cache()
+    if cache is not None:
+        path = cache.get_path(key, count=False)
+        if path:
+            with open(path, "rb") as f:
+                return filename, key, f.read(), {"parts": len(sources), "cache": "hit"}
+    try:
+        data, slides = merge_decks(sources)
+        recycle.note_render()
+    except FileNotFoundError:
+        # cache entry evicted between lookup and read
+        raise HTTPException(status_code=404, detail="A referenced render is no longer cached - render it again")
+    except (zipfile.BadZipFile, PackageNotFoundError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read PPTX part: {e}")
+    metrics.incr("merge.requests")
+    metrics.incr("merge.parts", len(sources))
+    if cache is not None:
+        try:
+            cache.put(key, data)
+        except OSError as e:
+            logger.warning(f"Could not write render cache entry {key}: {e}")
+    meta = {"parts": len(sources), "slides": slides, "cache": "off" if cache is None else "miss"}
+    return filename, (key if cache is not None else None), data, meta
+
+@app.post("/merge")
+def merge_pptx(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    """
+    Hängt bereits gerenderte PPTX-Dateien aneinander, ohne neu zu rendern.
+    parts: [{"renderId": "<X-PPTX-Render-Id>"} | {"file": "<base64 pptx>"}, ...]
+    """
+    try:
+        filename, render_id, data, meta = _merge(payload)
+        meta["builder_version"] = BUILDER_VERSION
+        if render_id:
+            meta["renderId"] = render_id
+        return {"filename": filename, "file": base64.b64encode(data).decode("utf-8"), "_meta": meta}
+    except HTTPException:
+        raise
+    except deadline.RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /merge endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/merge/bytes")
+def merge_pptx_bytes(payload: Dict[str, Any] = Body(...)):
+    """Wie /merge, liefert aber rohe PPTX-Bytes."""
+    try:
+        filename, render_id, data, meta = _merge(payload)
+        headers = {
+            "Content-Disposition": _content_disposition(filename),
+            "X-PPTX-Builder-Version": BUILDER_VERSION,
+            "X-PPTX-Cache": meta["cache"],
+        }
+        if "slides" in meta:
+            headers["X-PPTX-Slides"] = str(meta["slides"])
+        if render_id:
+            headers["X-PPTX-Render-Id"] = render_id
+        return Response(content=data, media_type=PPTX_MEDIA_TYPE, headers=headers)
+    except HTTPException:
+        raise
+    except deadline.RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.exception("Error in /merge/bytes endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---- Progress streaming (SSE / NDJSON) ----
+
+def _heartbeat_seconds() -> float:
+    return float(os.getenv("PPTX_STREAM_HEARTBEAT_SECONDS", "10"))
+
+def _stream_format(format: Optional[str], accept: Optional[str]) -> str:
+    if format:
+        if format not in ("sse", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be 'sse' or 'ndjson'")
+        return format
+    return "ndjson" if accept and "application/x-ndjson" in accept else "sse"
+
+def _event(fmt: str, name: str, data: Dict[str, Any]) -> bytes:
+    if fmt == "ndjson":
+        return (json.dumps({"event": name, **data}, ensure_ascii=False) + "\n").encode("utf-8")
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+def _heartbeat(fmt: str) -> bytes:
+    # SSE comment lines are ignored by EventSource, but keep proxies from cutting the connection
+    return _event(fmt, "heartbeat", {}) if fmt == "ndjson" else b": keep-alive\n\n"
+
+def _progress_events(deck: Dict[str, Any], filename: str, fmt: str, include_file: bool) -> Iterator[bytes]:
+    """
+    Renders `deck` in a background thread and yields its progress as events:
+    sanitized → slide (k/N, one per drawn slide) → saving → done (or error).
+    `done` carries a download reference (GET /renders/{id}, render cache) and,
+    without cache or with include_file, the file itself as base64.
+    """
+    total = len(deck["slides"])
+    events: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue()
+
+    def on_slide(i: int, slide_plan: Dict[str, Any], seconds: float) -> None:
+        events.put(("slide", {"index": i + 1, "total": total, "type": slide_plan.get("type"),
+                              "seconds": round(seconds, 4)}))
+        if i + 1 == total:
+            events.put(("saving", {}))
+
+    def work() -> None:
+        try:
+            started = time.perf_counter()
+            cache_status, render_id, cached_path, pptx_bytes = _render(deck, on_slide)
+            done: Dict[str, Any] = {"filename": filename, "cache": cache_status,
+                                    "seconds": round(time.perf_counter() - started, 3)}
+            if render_id:
+                done["renderId"] = render_id
+                done["download"] = f"/renders/{render_id}?filename={quote(filename)}"
+            if render_id is None or include_file:
+                if cached_path:
+                    with open(cached_path, "rb") as f:
+                        pptx_bytes = f.read()
+                done["file"] = base64.b64encode(pptx_bytes).decode("utf-8")
+            events.put(("done", done))
+        except deadline.RenderCancelled as e:
+            events.put(("error", {"status": e.status_code, "detail": str(e)}))
+        except Exception as e:
+            logger.exception("Error in /render/stream")
+            events.put(("error", {"status": 500, "detail": str(e)}))
+        finally:
+            events.put(None)
+
+    # the render thread keeps this request's deadline (cancelled on disconnect)
+    threading.Thread(target=contextvars.copy_context().run, args=(work,),
+                     name="render-stream", daemon=True).start()
+    metrics.incr("stream.requests")
+    yield _event(fmt, "sanitized", {"slides": total, "builder_version": BUILDER_VERSION})
+    heartbeat = _heartbeat_seconds()
+    while True:
+        try:
+            item = events.get(timeout=heartbeat)
+        except queue.Empty:
+            yield _heartbeat(fmt)
+            continue
+        # whatever else is queued goes out in the same chunk
+        batch = []
+        while item is not None:
+            batch.append(_event(fmt, *item))
+            try:
+                item = events.get_nowait()
+            except queue.Empty:
+                break
+        if batch:
+            yield b"".join(batch)
+        if item is None:
+            return
+
+@app.post("/render/stream")
+def render_pptx_stream(payload: Dict[str, Any] = Body(...), format: Optional[str] = None,
+                       include_file: bool = False, accept: Optional[str] = Header(None)):
+    """
+    Rendert wie /render, meldet aber den Fortschritt als Server-Sent Events
+    (Standard) oder NDJSON (?format=ndjson bzw. Accept: application/x-ndjson):
+    sanitized, slide k/N, saving, done (Download-Referenz bzw. Datei) oder error.
+    """
+    fmt = _stream_format(format, accept)
+    try:
+        deck = _extract_and_sanitize_deck(payload)
+        customer = sanitize_text(deck.get("meta", {}).get("customer", "Deck"))
+        title = sanitize_text(deck.get("meta", {}).get("deckTitle", "Presentation"))
+        filename = f"{customer} - {title}.pptx"
+        headers = {
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: do not buffer the event stream
+            "X-PPTX-Builder-Version": BUILDER_VERSION,
+        }
+        media_type = "application/x-ndjson" if fmt == "ndjson" else "text/event-stream"
+        return StreamingResponse(_progress_events(deck, filename, fmt, include_file),
+                                 media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in /render/stream endpoint")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/renders/{render_id}")
+def download_render(render_id: str, filename: Optional[str] = None):
+    """Lädt eine gerenderte Datei aus dem Render-Cache (renderId aus /render, /render/stream, /merge)."""
+    render_id = render_id.strip().lower()
+    if not _RENDER_ID_RE.match(render_id):
+        raise HTTPException(status_code=400, detail="Invalid render id")
+    cache = render_cache.get_cache()
+    path = cache.get_path(render_id, count=False) if cache is not None else None
+    if not path:
+        raise HTTPException(status_code=404, detail=f"Render {render_id} is not cached - render it again")
+    name = sanitize_text(sanitize_filename_safe(filename or f"render-{render_id[:12]}"))
+    name = name if name.lower().endswith(".pptx") else f"{name}.pptx"
+    headers = {"Content-Disposition": _content_disposition(name), "X-PPTX-Render-Id": render_id}
+    return FileResponse(path, media_type=PPTX_MEDIA_TYPE, headers=headers)
+
+@app.get("/outputs/{key}")
+def download_output(key: str, expires: int, filename: str, signature: str):
+    """Liefert eine Datei aus PPTX_OUTPUT_DIR über die signierte, ablaufende URL aus /render/url."""
+    store = object_store.get_store()
+    if not isinstance(store, object_store.VolumeStore) or not object_store.KEY_RE.match(key):
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        valid = store.verify(key, expires, filename, signature)
+    except object_store.ObjectStoreError as e:
+        logger.error(f"Cannot verify output link: {e}")
+        raise HTTPException(status_code=503, detail="Output links are not available")
+    if not valid:
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    path = store.path_for(key)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Output no longer available - render it again")
+    headers = {"Content-Disposition": _content_disposition(filename), "ETag": f'"{key[:-len(".pptx")]}"'}
+    return FileResponse(path, media_type=PPTX_MEDIA_TYPE, headers=headers)
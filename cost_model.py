@@ -0,0 +1,335 @@
+"""
+Preflight render cost estimation for PPTX Maker.
+
+Predicts render time and output size of a sanitized deck before it is built,
+from a few counts taken in one cheap pass over the deck (no planning, no
+python-pptx):
+
+    deck        1 per deck (template load, layouts, save)
+    title / text / two_column / table / chart / library
+                slides per planner kind (render_plan.slide_kind)
+    bullets     text lines of text and two-column slides
+    rows        table rows
+    points      chart data points (categories x series, pie: first series)
+    logo_kb     decoded logo bytes / 1024 (embedded once per package; with a
+                master template logos are drawn per slide, that time is
+                not modelled)
+
+Both predictions are linear in these features. The default coefficients were
+fitted with `calibrate()` on the benchmark decks of `benchmark_payloads()`;
+recalibrate on the target hardware (and optionally a loadtest corpus) with
+
+    python cost_model.py [corpus.jsonl ...] --write cost-model.json
+
+and point PPTX_COST_MODEL at the file. Every render records predicted vs.
+actual cost in /metrics (cost.seconds_ratio, cost.bytes_ratio = actual /
+predicted) so drift shows up before the scheduler starts misrouting decks.
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import logo_store
+import metrics
+from render_plan import resolve_logo, slide_kind
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ("deck", "title", "text", "two_column", "table", "chart", "library",
+            "bullets", "rows", "points", "logo_kb")
+
+# Fitted with calibrate() on benchmark_payloads() (3 runs each, median seconds;
+# median relative error 7% for seconds, 0.2% for bytes). Library slides are not
+# part of the benchmark and are priced like text slides. Chart seconds were fitted
+# later on a faster run and scaled by the ratio of the text coefficients.
+DEFAULT_COEFFICIENTS: Dict[str, Dict[str, float]] = {
+    "seconds": {
+        "deck": 0.00997, "title": 0.0016, "text": 0.00318, "two_column": 0.00394, "table": 0.00612,
+        "chart": 0.00933, "library": 0.00318, "bullets": 0.00042, "rows": 0.00166, "points": 0.0000164,
+        "logo_kb": 0.0000959,
+    },
+    "bytes": {
+        "deck": 10828, "title": 1085, "text": 1001, "two_column": 1037, "table": 1282,
+        "chart": 3907, "library": 1001, "bullets": 3.94, "rows": 7.2, "points": 14.4, "logo_kb": 932.6,
+    },
+}
+
+
+class Estimate:
+    """Predicted cost of rendering one deck."""
+
+    __slots__ = ("seconds", "bytes", "features")
+
+    def __init__(self, seconds: float, size: float, features: Dict[str, float]):
+        self.seconds = seconds
+        self.bytes = int(size)
+        self.features = features
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"seconds": round(self.seconds, 4), "bytes": self.bytes,
+                "features": {k: v for k, v in self.features.items() if v}}
+
+
+@lru_cache(maxsize=8)
+def _load_coefficients(path: str) -> Dict[str, Dict[str, float]]:
+    with open(path, "r", encoding="utf-8") as f:
+        loaded = json.load(f)
+    return {target: {name: float(loaded.get(target, {}).get(name, default))
+                     for name, default in DEFAULT_COEFFICIENTS[target].items()}
+            for target in DEFAULT_COEFFICIENTS}
+
+
+def coefficients() -> Dict[str, Dict[str, float]]:
+    """Active coefficients: PPTX_COST_MODEL (JSON from calibrate) or the built-in defaults."""
+    path = os.getenv("PPTX_COST_MODEL")
+    if path:
+        try:
+            return _load_coefficients(path)
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Could not load cost model {path}, using defaults: {e}")
+    return DEFAULT_COEFFICIENTS
+
+
+@lru_cache(maxsize=64)
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _logo_bytes(value: Any) -> int:
+    logo = resolve_logo(value)
+    if not logo:
+        return 0
+    if logo_store.is_logo_ref(logo):
+        data = logo_store.get_logo(logo)
+        return len(data) if data else 0
+    return _file_size(logo)
+
+
+def _lines(slide: Dict[str, Any]) -> int:
+    """Text lines / table rows of a slide: list entries plus a lead text."""
+    count = 0
+    for key, value in slide.items():
+        if isinstance(value, list):
+            count += len(value)
+        elif key == "text" and isinstance(value, str) and value:
+            count += 1
+    return count
+
+
+def features(deck: Dict[str, Any]) -> Dict[str, float]:
+    """Feature counts of a sanitized deck (see module docstring)."""
+    x = dict.fromkeys(FEATURES, 0.0)
+    x["deck"] = 1.0
+    for sl in deck.get("slides", []):
+        t = sl.get("type", "")
+        kind = "library" if t == "library" else slide_kind(t)
+        x[kind] += 1
+        if kind == "table":
+            x["rows"] += _lines(sl)
+        elif kind == "chart":
+            shown = len(sl.get("series") or [])
+            if sl.get("chartType") == "pie":
+                shown = min(shown, 1)
+            x["points"] += len(sl.get("categories") or []) * shown
+        elif kind in ("text", "two_column"):
+            x["bullets"] += _lines(sl)
+    style = deck.get("meta", {}).get("style", {})
+    logo_kb = (_logo_bytes(style.get("logo")) + _logo_bytes(style.get("clientLogo"))) / 1024
+    x["logo_kb"] = logo_kb
+    return x
+
+
+def estimate(deck: Dict[str, Any]) -> Estimate:
+    """Predicted render seconds and PPTX bytes of a sanitized deck."""
+    x = features(deck)
+    coef = coefficients()
+    seconds = sum(coef["seconds"][k] * v for k, v in x.items())
+    size = sum(coef["bytes"][k] * v for k, v in x.items())
+    return Estimate(max(seconds, 0.0), max(size, 0.0), x)
+
+
+def record(predicted: Estimate, seconds: float, size: int) -> None:
+    """Predicted vs. actual cost of one render (/metrics, for tuning)."""
+    metrics.observe("cost.predicted_seconds", predicted.seconds)
+    metrics.observe("cost.actual_seconds", seconds)
+    metrics.observe("cost.predicted_bytes", predicted.bytes)
+    metrics.observe("cost.actual_bytes", size)
+    if predicted.seconds > 0:
+        metrics.observe("cost.seconds_ratio", seconds / predicted.seconds)
+    if predicted.bytes > 0:
+        metrics.observe("cost.bytes_ratio", size / predicted.bytes)
+
+
+# ---- Calibration ----
+
+def _solve(a: List[List[float]], b: List[float]) -> Optional[List[float]]:
+    """Gaussian elimination with partial pivoting; None if (numerically) singular."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    scale = max(abs(v) for row in a for v in row) or 1.0
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12 * scale:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            f = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= f * m[col][c]
+    out = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        out[r] = (m[r][n] - sum(m[r][c] * out[c] for c in range(r + 1, n))) / m[r][r]
+    return out
+
+
+def fit(rows: Sequence[Dict[str, float]], targets: Sequence[float]) -> Dict[str, float]:
+    """
+    Non-negative least squares on relative error (weights ∝ 1/target²), so small
+    decks – the ones the scheduler has to recognize – are predicted as well as
+    large ones. Features without variation or with negative weight are dropped.
+    """
+    active = [f for f in FEATURES if any(r[f] for r in rows)]
+    mean = statistics.fmean(targets) if targets else 1.0
+    weights = [(mean / t) ** 2 if t > 0 else 0.0 for t in targets]
+    while active:
+        n = len(active)
+        a = [[sum(w * r[fi] * r[fj] for r, w in zip(rows, weights)) for fj in active] for fi in active]
+        for i in range(n):
+            a[i][i] += 1e-9 * (a[i][i] or 1.0)  # ridge: keeps near-collinear features solvable
+        b = [sum(w * r[fi] * t for r, t, w in zip(rows, targets, weights)) for fi in active]
+        solution = _solve(a, b)
+        if solution is None:
+            active.pop()
+            continue
+        negative = [f for f, c in zip(active, solution) if c < 0]
+        if not negative:
+            fitted = dict.fromkeys(FEATURES, 0.0)
+            fitted.update(zip(active, solution))
+            return fitted
+        active = [f for f in active if f not in negative]
+    return dict.fromkeys(FEATURES, 0.0)
+
+
+def _logo(size: Tuple[int, int], noise: int) -> str:
+    from PIL import Image
+    bio = io.BytesIO()
+    Image.effect_noise(size, noise).convert("RGB").save(bio, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode("ascii")
+
+
+def benchmark_payloads() -> List[Dict[str, Any]]:
+    """Benchmark decks spanning slide counts, slide kinds, bullets, table rows and logo sizes."""
+    def text(i, bullets):
+        return {"id": str(i), "type": "context", "title": f"Kontext {i}", "text": "Ausgangslage",
+                "bullets": [f"Punkt {j}" for j in range(bullets - 1)]}
+
+    def table(i, rows):
+        return {"id": str(i), "type": "investment", "title": f"Investition {i}",
+                "items": [{"label": f"Pos {j}", "value": "1.000 EUR", "note": "einmalig"} for j in range(rows)]}
+
+    def team(i, members):
+        return {"id": str(i), "type": "team", "title": f"Team {i}", "text": "Intro",
+                "trainers": [{"name": f"Name {j}", "role": "Rolle"} for j in range(members)]}
+
+    def chart(i, chart_type, points, series):
+        return {"id": str(i), "type": "chart", "title": f"Chart {i}", "chartType": chart_type,
+                "categories": [f"P{j}" for j in range(points)],
+                "series": [{"name": f"S{k}", "values": [(j * 37 + k * 11) % 101 for j in range(points)]}
+                           for k in range(series)]}
+
+    def deck(name, slides, **style):
+        title = {"id": "0", "type": "title", "title": name}
+        return {"deck": {"meta": {"deckTitle": name, "customer": "Benchmark", "date": "2025-10-14",
+                                  "style": style},
+                         "slides": [title] + slides}}
+
+    payloads = [deck("Title only", [])]
+    for n in (1, 8):
+        untitled = deck(f"Untitled {n}", [text(i, 4) for i in range(1, n + 1)])
+        untitled["deck"]["slides"].pop(0)
+        payloads.append(untitled)
+    for n in (2, 10, 40, 120):
+        payloads.append(deck(f"Text {n}", [text(i, 4) for i in range(1, n)]))
+        payloads.append(deck(f"Table {n}", [table(i, 5) for i in range(1, n)]))
+        payloads.append(deck(f"Team {n}", [team(i, 4) for i in range(1, n)]))
+    for bullets in (1, 12, 30):
+        payloads.append(deck(f"Bullets {bullets}", [text(i, bullets) for i in range(1, 20)]))
+    for rows in (1, 15, 40):
+        payloads.append(deck(f"Rows {rows}", [table(i, rows) for i in range(1, 20)]))
+    for n, chart_type, points, series in ((2, "bar", 12, 2), (10, "line", 200, 3), (10, "pie", 6, 1),
+                                          (20, "bar", 20, 1), (4, "line", 5000, 2)):
+        payloads.append(deck(f"Chart {chart_type} {points}", [chart(i, chart_type, points, series)
+                                                              for i in range(1, n + 1)]))
+    for size, noise in (((200, 80), 8), ((600, 300), 64), ((1200, 600), 128)):
+        logo = _logo(size, noise)
+        payloads.append(deck(f"Logo {size[0]}", [text(i, 4) for i in range(1, 10)], logo=logo))
+        payloads.append(deck(f"Logos {size[0]}", [table(i, 5) for i in range(1, 30)],
+                             logo=logo, clientLogo=_logo(size, noise // 2 or 1)))
+    return payloads
+
+
+def calibrate(payloads: Iterable[Dict[str, Any]], repeats: int = 3) -> Dict[str, Any]:
+    """
+    Renders each payload `repeats` times in-process and fits both models.
+    Returns {"seconds": {...}, "bytes": {...}, "samples": n, "median_error": {...}}.
+    """
+    from json_sanitizer import validate_and_sanitize
+    from pptx_builder import build_pptx
+
+    rows, seconds, sizes = [], [], []
+    for payload in payloads:
+        deck = validate_and_sanitize(payload)
+        build_pptx(deck)  # warm-up: logo decoding, template caches
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            data = build_pptx(deck)
+            timings.append(time.perf_counter() - started)
+        rows.append(features(deck))
+        seconds.append(statistics.median(timings))
+        sizes.append(float(len(data)))
+
+    model = {"seconds": fit(rows, seconds), "bytes": fit(rows, sizes), "samples": len(rows)}
+    model["median_error"] = {
+        target: round(statistics.median(
+            abs(sum(model[target][k] * v for k, v in x.items()) - y) / y for x, y in zip(rows, ys)), 4)
+        for target, ys in (("seconds", seconds), ("bytes", sizes))
+    }
+    return model
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Calibrate the PPTX Maker render cost model")
+    p.add_argument("corpus", nargs="*", help="loadtest corpus (.json/.jsonl files or directories) "
+                                             "rendered in addition to the benchmark decks")
+    p.add_argument("--repeats", type=int, default=3)
+    p.add_argument("--write", metavar="PATH", help="write coefficients as JSON (for PPTX_COST_MODEL)")
+    args = p.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    payloads = benchmark_payloads()
+    if args.corpus:
+        import loadtest
+        payloads += loadtest.load_corpus(args.corpus)[0]
+    model = calibrate(payloads, args.repeats)
+    text = json.dumps(model, indent=2)
+    if args.write:
+        with open(args.write, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
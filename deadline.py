@@ -0,0 +1,197 @@
+"""
+Per-request render deadlines for PPTX Maker.
+
+Every HTTP request gets a Deadline (X-PPTX-Deadline-Ms header, capped by the
+server default PPTX_RENDER_TIMEOUT_SECONDS). It is carried in a context variable,
+so it reaches the builder in the threadpool without being passed around.
+
+Cancellation is cooperative: the builder calls `check()` between slides and
+before saving. Once the deadline has passed, or DeadlineMiddleware has seen the
+client disconnect, the next check raises RenderCancelled. The render then stops
+there instead of finishing work nobody will receive. Abandoned renders are
+counted in /metrics (deadline.exceeded / deadline.disconnected, plus
+deadline.abandoned_seconds of work thrown away).
+
+Code running without a deadline (tests, scripts, pool processes) is unaffected:
+check() is a no-op there.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+import input_limits
+import metrics
+
+logger = logging.getLogger(__name__)
+
+HEADER = "x-pptx-deadline-ms"
+
+# how often waits (pool futures, single-flight) look at the deadline
+POLL_SECONDS = 0.1
+
+
+class RenderCancelled(Exception):
+    """The render was abandoned: deadline passed (504) or client disconnected (499)."""
+
+    def __init__(self, reason: str, stage: str = ""):
+        self.reason = reason
+        self.stage = stage
+        self.status_code = 499 if reason == "disconnected" else 504
+        what = "Client disconnected" if reason == "disconnected" else "Render deadline exceeded"
+        super().__init__(f"{what} ({stage})" if stage else what)
+
+
+class Deadline:
+    """Point in time (monotonic clock) after which a render is abandoned."""
+
+    __slots__ = ("started", "expires_at", "reason", "_counted")
+
+    def __init__(self, seconds: Optional[float]):
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds if seconds else None
+        self.reason: Optional[str] = None
+        self._counted = False
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (None = no time limit)."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self, reason: str = "disconnected") -> None:
+        """Marks the request as abandoned; the next check() raises."""
+        if self.reason is None:
+            self.reason = reason
+
+    def check(self, stage: str = "") -> None:
+        if self.reason is None:
+            if self.expires_at is None or time.monotonic() < self.expires_at:
+                return
+            self.reason = "exceeded"
+        if not self._counted:
+            self._counted = True
+            metrics.incr(f"deadline.{self.reason}")
+            metrics.observe("deadline.abandoned_seconds", time.monotonic() - self.started)
+            logger.warning(f"Abandoning render at {stage or 'check'}: {self.reason}")
+        raise RenderCancelled(self.reason, stage)
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("pptx_deadline", default=None)
+
+
+def default_seconds() -> float:
+    """Server default and upper bound for request deadlines (0 = none)."""
+    return float(os.getenv("PPTX_RENDER_TIMEOUT_SECONDS", "120"))
+
+
+def from_header(value: Optional[str]) -> Deadline:
+    """Deadline for a request: header value in ms, never longer than the server default."""
+    seconds = default_seconds()
+    if value:
+        try:
+            requested = int(value) / 1000
+        except ValueError:
+            logger.warning(f"Ignoring invalid {HEADER} header: {value!r}")
+        else:
+            if requested > 0:
+                seconds = min(seconds, requested) if seconds > 0 else requested
+    return Deadline(seconds if seconds > 0 else None)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+def check(stage: str = "") -> None:
+    """Raises RenderCancelled if the current request's deadline passed or its client left."""
+    dl = _current.get()
+    if dl is not None:
+        dl.check(stage)
+
+
+@contextmanager
+def use(dl: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Makes `dl` the current deadline for the enclosed code (and threads started via the context)."""
+    token = _current.set(dl)
+    try:
+        yield dl
+    finally:
+        _current.reset(token)
+
+
+def wait_future(future: Future, stage: str = "") -> Any:
+    """future.result(), giving up (and cancelling the future) when the deadline passes."""
+    while True:
+        try:
+            return future.result(timeout=POLL_SECONDS)
+        except FutureTimeout:
+            try:
+                check(stage)
+            except RenderCancelled:
+                future.cancel()
+                raise
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware: attaches a Deadline to every HTTP request and cancels it
+    when the client disconnects while the request is processed.
+
+    The request body is read up front and replayed to the app, so afterwards
+    this middleware owns `receive` and can wait for http.disconnect in the
+    background. Later receive() calls from the app (e.g. StreamingResponse
+    waiting for a disconnect) get that same message. The pre-read stops at
+    PPTX_MAX_BODY_BYTES (413), also when BodySizeLimitMiddleware is not in
+    front of it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope.get("headers") or []).get(HEADER.encode("latin-1"))
+        dl = from_header(header.decode("latin-1") if header else None)
+
+        chunks = []
+        size, limit = 0, input_limits.max_body_bytes()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                dl.cancel()
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > limit:
+                await input_limits.reject_body(send)
+                return
+            if not message.get("more_body", False):
+                break
+        replay = [{"type": "http.request", "body": b"".join(chunks), "more_body": False}]
+
+        async def watch():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                dl.cancel()
+            return message
+
+        watcher = asyncio.ensure_future(watch())
+
+        async def replay_receive():
+            if replay:
+                return replay.pop()
+            return await asyncio.shield(watcher)
+
+        token = _current.set(dl)
+        try:
+            await self.app(scope, replay_receive, send)
+        finally:
+            _current.reset(token)
+            watcher.cancel()
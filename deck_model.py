@@ -0,0 +1,123 @@
+"""
+Immutable deck representation for PPTX Maker.
+
+The sanitizer freezes its output once; planner, render cache and single-flight
+then share that object without copying it:
+
+    - FrozenDict / FrozenList are dict / list subclasses (so isinstance checks,
+      .get(), iteration and json.dumps keep working) whose mutating methods raise
+    - they carry no per-instance __dict__ (empty __slots__)
+    - dict keys and short string values are interned: slide types, colours,
+      field names and repeated labels exist once per process, not once per slide
+    - Deck caches the digest of its canonical JSON, so a deck is hashed once no
+      matter how often render_cache.deck_hash is asked
+
+Decks are never mutated after freezing, so one compiled deck can be cached,
+hashed and rendered from several threads at the same time.
+"""
+import hashlib
+import json
+import sys
+from typing import Any, Dict
+
+# Longer strings are slide text – unique per deck, not worth interning
+_INTERN_MAX_LEN = 64
+
+
+class FrozenError(TypeError):
+    """Raised when code tries to modify a frozen deck."""
+
+
+def _immutable(self, *args, **kwargs):
+    raise FrozenError(f"{type(self).__name__} is immutable – copy it with thaw() first")
+
+
+class FrozenDict(dict):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class FrozenList(list):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = remove = pop = clear = sort = reverse = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (list(self),))
+
+
+class Deck(FrozenDict):
+    """Frozen, sanitized deck: {"meta": ..., "slides": [...]} plus a cached content digest."""
+
+    __slots__ = ("_digest",)
+
+    @property
+    def meta(self) -> FrozenDict:
+        return self["meta"]
+
+    @property
+    def slides(self) -> FrozenList:
+        return self["slides"]
+
+    def digest(self) -> str:
+        """SHA-256 of the canonical JSON (computed once)."""
+        try:
+            return self._digest
+        except AttributeError:
+            self._digest = canonical_digest(self)
+            return self._digest
+
+    def __reduce__(self):
+        return (freeze_deck, (thaw(self),))
+
+
+def canonical_digest(value: Any) -> str:
+    """SHA-256 of the canonical JSON of `value` (sorted keys, no whitespace)."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":"),
+                                     ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def freeze(value: Any) -> Any:
+    """Recursively converts dicts/lists/tuples into FrozenDict/FrozenList, interning short strings."""
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= _INTERN_MAX_LEN else value
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((sys.intern(k) if isinstance(k, str) else k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return FrozenList(freeze(v) for v in value)
+    return value
+
+
+def freeze_deck(deck: Dict[str, Any]) -> Deck:
+    if isinstance(deck, Deck):
+        return deck
+    return Deck((sys.intern(k), freeze(v)) for k, v in deck.items())
+
+
+def thaw(value: Any) -> Any:
+    """Plain, mutable dict/list copy of a (frozen) value."""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [thaw(v) for v in value]
+    return value
@@ -0,0 +1,204 @@
+"""
+Input complexity limits for PPTX Maker.
+
+LLM output is not always sane: a 5 MB bullet, 10,000 slides or lists nested a
+thousand levels deep must not keep a worker busy for minutes. `bound_payload`
+walks the request once (iteratively, no recursion) and returns a bounded copy
+that the sanitizer then works on – every later stage (NFKD in sanitize_text,
+content normalization, layout) only ever sees bounded input:
+
+    - too many slides / too many values in total / nesting too deep → rejected
+      with InputLimitError (413 resp. 400)
+    - strings longer than the limit are cut, lists longer than the limit are
+      cut to their first items (logged, the deck still renders); chart data
+      ("categories", "values") has its own, higher limit PPTX_MAX_CHART_POINTS
+
+Logo fields are exempt from string truncation; logo_store enforces their size
+(PPTX_LOGO_MAX_BYTES). The request body itself is capped by
+BodySizeLimitMiddleware (PPTX_MAX_BODY_BYTES): against Content-Length before
+anything is read, and by counting bytes for chunked bodies.
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, List, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Inline logos may be megabytes of base64 – bounded by logo_store instead
+_UNTRUNCATED_KEYS = frozenset(("logo", "clientLogo"))
+# Chart data lists: thousands of points are legitimate, thousands of bullets are not
+_POINT_LIST_KEYS = frozenset(("categories", "values"))
+
+
+class InputLimitError(ValueError):
+    """Payload exceeds a configured limit; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 413):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        logger.warning(f"Invalid {name}, using {default}")
+        return default
+
+
+def max_body_bytes() -> int:
+    return _int_env("PPTX_MAX_BODY_BYTES", 20 * 1024 * 1024)
+
+
+def limits() -> Dict[str, int]:
+    """Current limits (read from the environment on every call)."""
+    return {
+        "slides": _int_env("PPTX_MAX_SLIDES", 1000),
+        "items": _int_env("PPTX_MAX_ITEMS", 500),
+        "string": _int_env("PPTX_MAX_STRING_CHARS", 10000),
+        "depth": _int_env("PPTX_MAX_DEPTH", 16),
+        "values": _int_env("PPTX_MAX_VALUES", 200000),
+        "points": _int_env("PPTX_MAX_CHART_POINTS", 10000),
+    }
+
+
+def bound_value(value: Any, where: str = "payload", depth: int = 0, _budget: List[int] = None) -> Any:
+    """
+    Bounded copy of a JSON value (dicts, lists, scalars) in a single pass.
+    `depth` is the nesting level `value` itself sits at.
+
+    Raises:
+        InputLimitError: nesting deeper than PPTX_MAX_DEPTH (400) or more than
+                         PPTX_MAX_VALUES values in total (413)
+    """
+    lim = limits()
+    max_items, max_string, max_depth = lim["items"], lim["string"], lim["depth"]
+    max_points = lim["points"]
+    # remaining values, shared by all parts of one payload
+    budget = _budget if _budget is not None else [lim["values"]]
+    cut_strings = cut_lists = 0
+
+    root: List[Any] = [None]
+    # (source container, target container, depth of its children)
+    stack: List[Tuple[Any, Any, int]] = [([value], root, depth)]
+    while stack:
+        src, dst, level = stack.pop()
+        is_dict = isinstance(src, dict)
+        budget[0] -= len(src)
+        if budget[0] < 0:
+            raise InputLimitError(f"{where} has more than {lim['values']} values")
+        for key, item in (src.items() if is_dict else enumerate(src)):
+            if isinstance(item, str):
+                if len(item) > max_string and key not in _UNTRUNCATED_KEYS:
+                    item = item[:max_string]
+                    cut_strings += 1
+            elif isinstance(item, (dict, list, tuple)):
+                if level + 1 > max_depth:
+                    raise InputLimitError(f"{where} is nested deeper than {max_depth} levels", status_code=400)
+                if isinstance(item, dict):
+                    copy: Any = {}
+                else:
+                    limit = max_points if key in _POINT_LIST_KEYS else max_items
+                    if len(item) > limit:
+                        item = item[:limit]
+                        cut_lists += 1
+                    copy = [None] * len(item)
+                stack.append((item, copy, level + 1))
+                item = copy
+            if is_dict and isinstance(key, str) and len(key) > max_string:
+                key = key[:max_string]
+                cut_strings += 1
+            dst[key] = item
+
+    if cut_strings or cut_lists:
+        logger.warning(f"{where}: cut {cut_strings} string(s) to {max_string} chars "
+                       f"and {cut_lists} list(s) to {max_items} items ({max_points} chart points)")
+    return root[0]
+
+
+def bound_payload(payload: Any) -> Any:
+    """
+    Bounded copy of a render request ({"deck": {"meta": ..., "slides": [...]}, ...}).
+    Only the deck is walked; `deck.slides` is limited by PPTX_MAX_SLIDES instead of
+    PPTX_MAX_ITEMS and rejected (413) rather than cut – dropping slides silently
+    would produce a wrong proposal.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("deck"), dict):
+        return payload
+    deck = payload["deck"]
+    slides = deck.get("slides")
+    if not isinstance(slides, list):
+        return dict(payload, deck=bound_value(deck, "deck", depth=1))
+
+    max_slides = limits()["slides"]
+    if len(slides) > max_slides:
+        raise InputLimitError(f"Deck has {len(slides)} slides, at most {max_slides} are allowed")
+    budget = [limits()["values"] - len(slides)]
+    bounded = bound_value({k: v for k, v in deck.items() if k != "slides"}, "deck", depth=1, _budget=budget)
+    bounded["slides"] = [bound_value(sl, f"slide {i}", depth=3, _budget=budget)
+                         for i, sl in enumerate(slides, start=1)]
+    return dict(payload, deck=bounded)
+
+
+async def reject_body(send) -> None:
+    """Sends the 413 answer for a body over PPTX_MAX_BODY_BYTES (raw ASGI)."""
+    metrics.incr("limits.body_rejected")
+    body = json.dumps({"detail": f"Request body exceeds {max_body_bytes()} bytes"}).encode("utf-8")
+    await send({"type": "http.response.start", "status": 413,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode("latin-1"))]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware: rejects bodies over PPTX_MAX_BODY_BYTES with 413.
+
+    A too large Content-Length is answered before anything is read. Bodies
+    without one (Transfer-Encoding: chunked) are counted while the app reads
+    them; once the limit is passed the 413 is sent and the app only sees a
+    client disconnect, so it stops reading and its own response is dropped.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = max_body_bytes()
+        length = dict(scope.get("headers") or []).get(b"content-length")
+        if length and length.isdigit() and int(length) > limit:
+            await reject_body(send)
+            return
+
+        received = 0
+        started = rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    if not started:
+                        await reject_body(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
@@ -2,10 +2,20 @@
 JSON Sanitizer & Validator for PPTX Maker
 Robustness layer to handle imperfect JSON from Copilot/LLM agents
 """
+import csv
+import io
 import logging
+import math
 import re
 from typing import Any, Dict, List, Optional
 
+import input_limits
+import logo_store
+import slide_library
+from deck_model import Deck, freeze_deck, thaw
+import theme_store
+import tracing
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,9 +38,17 @@ VALID_SLIDE_TYPES = {
     "approach", "principles", "architecture", "modules_overview",
     "module_detail", "transfer", "digital", "coaching", "target_group",
     "impact", "about_synk", "team", "references", "expertise", "partners",
-    "investment", "next_steps", "contact"
+    "investment", "next_steps", "contact", "library", "chart"
 }
 
+CHART_TYPES = ("bar", "line", "pie")
+_CHART_TYPE_ALIASES = {"column": "bar", "columns": "bar", "bars": "bar", "lines": "line", "donut": "pie"}
+
+# Fields a variant (POST /render/variants) may override
+VARIANT_META_FIELDS = ("deckTitle", "deckSubtitle", "author", "date", "customer", "useCase")
+VARIANT_STYLE_FIELDS = ("font", "logo", "clientLogo", "themeId")
+_VARIANT_LIST_FIELDS = ("content", "items", "bullets")
+
 
 def sanitize_hex_color(color: Any, fallback: str = "#000000") -> str:
     """
@@ -104,6 +122,112 @@ def sanitize_filename_safe(text: str) -> str:
     return text[:200] if text else "Document"
 
 
+def sanitize_logo(value: Any, field: str) -> str:
+    """
+    Normalizes a logo field.
+
+    - file paths are kept as-is (resolved by the builder)
+    - inline base64 / data URIs are decoded, cached and replaced by "sha256:<hex>"
+    - "sha256:<hex>" references must already be known to this server
+
+    Raises:
+        ValueError: If a hash reference is unknown (client has to resend the data)
+    """
+    if not isinstance(value, str) or not value.strip():
+        return ""
+    value = value.strip()
+
+    if logo_store.is_logo_ref(value):
+        if not logo_store.has_logo(value):
+            raise ValueError(
+                f"Unknown {field} reference '{value}' - send the logo as base64 or data URI again"
+            )
+        return value
+
+    if logo_store.is_inline_logo(value):
+        try:
+            return logo_store.store_logo(value)
+        except logo_store.LogoError as e:
+            logger.warning(f"Invalid inline {field}, rendering without it: {e}")
+            return ""
+
+    return value
+
+
+def _chart_number(value: Any) -> Optional[float]:
+    if isinstance(value, str):
+        value = value.strip().replace(" ", "")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def sanitize_chart_values(values: List[Any]) -> List[Optional[float]]:
+    """
+    Series values as floats, None for gaps (null, non-numeric, NaN/inf).
+    Converted in one map() over the list; only lists with bad entries go value by value.
+    """
+    try:
+        numbers = list(map(float, values))
+    except (TypeError, ValueError):
+        return [_chart_number(v) for v in values]
+    if all(map(math.isfinite, numbers)):
+        return numbers
+    return [v if math.isfinite(v) else None for v in numbers]
+
+
+def sanitize_chart(slide: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Normalizes the data of a chart slide to {"chartType", "categories", "series"}:
+
+        - chartType: "bar", "line" or "pie" (aliases like "column"; default "bar")
+        - series: [{"name", "values"}]; a bare list, a single dict or a top-level
+          "values" list also count; values become floats (None = gap)
+        - categories: strings, default "1".."n"; all series are cut / padded to them
+
+    Returns None if no series has a single number (the slide then renders as text).
+    """
+    chart_type = str(slide.get("chartType") or "bar").strip().lower()
+    chart_type = _CHART_TYPE_ALIASES.get(chart_type, chart_type)
+    if chart_type not in CHART_TYPES:
+        logger.warning(f"Invalid chartType '{chart_type}' in slide {slide.get('id')}, defaulting to 'bar'")
+        chart_type = "bar"
+
+    raw = slide.get("series")
+    if isinstance(raw, dict):
+        raw = [raw]
+    if not isinstance(raw, list) and isinstance(slide.get("values"), list):
+        raw = [{"name": slide.get("title"), "values": slide["values"]}]
+    if isinstance(raw, list) and raw and not isinstance(raw[0], (dict, list)):
+        raw = [raw]  # one series given as a plain list of numbers
+
+    series = []
+    for i, s in enumerate(raw if isinstance(raw, list) else [], start=1):
+        if isinstance(s, list):
+            s = {"values": s}
+        if not isinstance(s, dict) or not isinstance(s.get("values"), list):
+            continue
+        values = sanitize_chart_values(s["values"])
+        if any(v is not None for v in values):
+            name = s.get("name")
+            series.append({"name": str(name) if name not in (None, "") else f"Series {i}", "values": values})
+    if not series:
+        return None
+
+    categories = slide.get("categories")
+    if isinstance(categories, list) and categories:
+        categories = ["" if c is None else str(c) for c in categories]
+    else:
+        categories = [str(i) for i in range(1, max(len(s["values"]) for s in series) + 1)]
+    n = len(categories)
+    for s in series:
+        if len(s["values"]) != n:
+            s["values"] = s["values"][:n] + [None] * (n - len(s["values"]))
+    return {"chartType": chart_type, "categories": categories, "series": series}
+
+
 def sanitize_slide(slide: Dict[str, Any], index: int) -> Dict[str, Any]:
     """
     Validates and fixes a single slide object.
@@ -162,6 +286,23 @@ def sanitize_slide(slide: Dict[str, Any], index: int) -> Dict[str, Any]:
             sanitized["items"] = []
             logger.warning(f"Investment slide {sanitized['id']} has no items")
 
+    # For library: pre-rendered slides need a valid ref
+    if slide_type == "library":
+        if not slide_library.is_valid_ref(sanitized.get("ref")):
+            logger.warning(f"Library slide {sanitized['id']} has no valid ref, defaulting to 'text'")
+            sanitized["type"] = "text"
+        elif "theme" in sanitized and not theme_store.is_valid_id(sanitized["theme"]):
+            sanitized.pop("theme")
+
+    # For chart: numeric series per category, otherwise the numbers render as text
+    if slide_type == "chart":
+        chart = sanitize_chart(sanitized)
+        if chart is None:
+            logger.warning(f"Chart slide {sanitized['id']} has no numeric series, defaulting to 'text'")
+            sanitized["type"] = "text"
+        else:
+            sanitized.update(chart)
+
     # For contact: ensure contact dict
     if slide_type == "contact":
         if "contact" not in sanitized or not isinstance(sanitized["contact"], dict):
@@ -181,6 +322,75 @@ def sanitize_slide(slide: Dict[str, Any], index: int) -> Dict[str, Any]:
     return sanitized
 
 
+def sanitize_style(style: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validates font, colors and logos of a style block, filling in defaults.
+    """
+    # Handle colors
+    colors = style.get("colors", {})
+    if not isinstance(colors, dict):
+        logger.warning("Colors is not a dict, using defaults")
+        colors = {}
+
+    sanitized_colors = {}
+    for color_key, default_value in DEFAULT_COLORS.items():
+        color_value = colors.get(color_key, default_value)
+        sanitized_colors[color_key] = sanitize_hex_color(color_value, default_value)
+
+    return {
+        "font": style.get("font") or "Arial",
+        "colors": sanitized_colors,
+        "logo": sanitize_logo(style.get("logo"), "logo"),
+        "clientLogo": sanitize_logo(style.get("clientLogo"), "clientLogo")
+    }
+
+
+def resolve_theme_style(style: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replaces `style.themeId` by the registered theme's compiled style.
+    Only fields sent next to the themeId (overrides) are validated.
+
+    Raises:
+        ValueError: If the theme is not registered (client has to register it again)
+    """
+    theme_id = style.get("themeId")
+    resolved = theme_store.resolve(theme_id) if isinstance(theme_id, str) else None
+    if resolved is None:
+        raise ValueError(f"Unknown themeId '{theme_id}' - register the theme via POST /themes first")
+
+    colors = style.get("colors")
+    if isinstance(colors, dict):
+        for color_key, color_value in colors.items():
+            if color_key in DEFAULT_COLORS:
+                resolved["colors"][color_key] = sanitize_hex_color(color_value, resolved["colors"][color_key])
+    if style.get("font"):
+        resolved["font"] = style["font"]
+    for key in ("logo", "clientLogo"):
+        if style.get(key):
+            resolved[key] = sanitize_logo(style[key], key)
+    return resolved
+
+
+def sanitize_theme(payload: Any) -> Dict[str, Any]:
+    """
+    Validates a theme registration: {"id": "...", "font", "colors", "logo", "clientLogo"}
+    (the style fields may also be nested under "style").
+    Returns {"id": ..., "style": <compiled style>}.
+
+    Raises:
+        ValueError: If the payload or the id is unusable
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Theme must be a JSON object")
+    theme_id = payload.get("id") or payload.get("themeId")
+    if not theme_store.is_valid_id(theme_id):
+        raise ValueError(f"Invalid theme id '{theme_id}' - use 1-64 letters, digits, '_', '-' or '.'")
+    style = payload.get("style", payload)
+    if not isinstance(style, dict):
+        raise ValueError("Theme style must be a JSON object")
+    return {"id": theme_id, "style": sanitize_style(style)}
+
+
 def sanitize_meta(meta: Dict[str, Any]) -> Dict[str, Any]:
     """
     Validates and fixes meta section with defaults.
@@ -208,28 +418,17 @@ def sanitize_meta(meta: Dict[str, Any]) -> Dict[str, Any]:
         logger.warning("Style is not a dict, using defaults")
         style = {}
 
-    # Handle colors
-    colors = style.get("colors", {})
-    if not isinstance(colors, dict):
-        logger.warning("Colors is not a dict, using defaults")
-        colors = {}
-
-    sanitized_colors = {}
-    for color_key, default_value in DEFAULT_COLORS.items():
-        color_value = colors.get(color_key, default_value)
-        sanitized_colors[color_key] = sanitize_hex_color(color_value, default_value)
-
-    sanitized["style"] = {
-        "font": style.get("font") or "Arial",
-        "colors": sanitized_colors,
-        "logo": style.get("logo", ""),
-        "clientLogo": style.get("clientLogo", "")
-    }
+    if "themeId" in style:
+        sanitized["style"] = resolve_theme_style(style)
+        # theme decides which version of library slides is used
+        sanitized["themeId"] = style["themeId"]
+    else:
+        sanitized["style"] = sanitize_style(style)
 
     return sanitized
 
 
-def sanitize_deck(payload: Any) -> Dict[str, Any]:
+def sanitize_deck(payload: Any) -> Deck:
     """
     Main sanitization function: validates and fixes the entire deck structure.
 
@@ -237,10 +436,11 @@ def sanitize_deck(payload: Any) -> Dict[str, Any]:
         payload: Raw input (should contain "deck" key)
 
     Returns:
-        Sanitized deck dict ready for pptx_builder
+        Sanitized, immutable deck (deck_model.Deck) ready for pptx_builder
 
     Raises:
         ValueError: If payload is completely invalid
+        InputLimitError: If payload exceeds the input limits (see input_limits)
     """
     logger.info("=== Starting JSON Sanitization ===")
 
@@ -249,6 +449,9 @@ def sanitize_deck(payload: Any) -> Dict[str, Any]:
         logger.error(f"Payload is not a dict: {type(payload)}")
         raise ValueError(f"Payload must be a dictionary, got {type(payload)}")
 
+    # one bounded pass first: everything below only sees limited input
+    payload = input_limits.bound_payload(payload)
+
     # Extract deck
     if "deck" not in payload:
         logger.error("Missing 'deck' key in payload")
@@ -281,20 +484,23 @@ def sanitize_deck(payload: Any) -> Dict[str, Any]:
     logger.info(f"Sanitizing {len(slides)} slides...")
     sanitized_slides = []
     for i, slide in enumerate(slides, start=1):
-        sanitized_slide = sanitize_slide(slide, i)
+        with tracing.span("sanitize_slide", {"slide.number": i}) as sp:
+            sanitized_slide = sanitize_slide(slide, i)
+            sp.set_attribute("slide.type", sanitized_slide.get("type"))
         sanitized_slides.append(sanitized_slide)
 
-    sanitized_deck = {
+    # frozen once here, shared read-only by planner, render cache and single-flight
+    sanitized_deck = freeze_deck({
         "meta": sanitized_meta,
         "slides": sanitized_slides
-    }
+    })
 
     logger.info(f"=== Sanitization complete: {len(sanitized_slides)} slides validated ===")
 
     return sanitized_deck
 
 
-def validate_and_sanitize(payload: Dict[str, Any]) -> Dict[str, Any]:
+def validate_and_sanitize(payload: Dict[str, Any]) -> Deck:
     """
     Public API: Validates and sanitizes a complete payload.
 
@@ -309,3 +515,125 @@ def validate_and_sanitize(payload: Dict[str, Any]) -> Dict[str, Any]:
             pass
     """
     return sanitize_deck(payload)
+
+
+def _split_variant(overrides: Dict[str, Any], meta: Dict[str, Any], style: Dict[str, Any],
+                   slides: Dict[str, Dict[str, Any]]) -> None:
+    """Sorts nested ({"meta": {"style": ...}, "slides": {id: ...}}) and flat ("colors.primary") overrides."""
+    for key, value in overrides.items():
+        if key in VARIANT_META_FIELDS:
+            meta[key] = value
+        elif key in VARIANT_STYLE_FIELDS:
+            style[key] = value
+        elif key in ("meta", "style") and isinstance(value, dict):
+            _split_variant(value, meta, style, slides)
+        elif key == "colors" and isinstance(value, dict):
+            style.setdefault("colors", {}).update(value)
+        elif key == "slides" and isinstance(value, dict):
+            for slide_id, fields in value.items():
+                if not isinstance(fields, dict):
+                    raise ValueError(f"Overrides for slide '{slide_id}' must be an object")
+                slides.setdefault(str(slide_id), {}).update(fields)
+        elif key.startswith("colors.") and key[7:] in DEFAULT_COLORS:
+            style.setdefault("colors", {})[key[7:]] = value
+        elif key.startswith(("meta.", "style.")):
+            _split_variant({key.split(".", 1)[1]: value}, meta, style, slides)
+        elif key.startswith("slides.") and key.count(".") == 2:
+            _, slide_id, field = key.split(".")
+            slides.setdefault(slide_id, {})[field] = value
+        elif key != "filename":
+            raise ValueError(f"Unknown variant field '{key}'")
+
+
+def sanitize_variant(base: Deck, overrides: Any, index: int = 1) -> Deck:
+    """
+    Applies one variant's overrides to a sanitized base deck.
+    Only overridden fields are validated again; slides without overrides (and the
+    style, if untouched) stay the very same frozen objects as in `base`, so the
+    planner can reuse their compiled plans (render_plan.compile_deck memo).
+
+    Raises:
+        ValueError: If the overrides are not an object, name unknown fields or
+                    slide ids, or reference an unknown theme
+    """
+    if not isinstance(overrides, dict):
+        raise ValueError(f"Variant {index} must be a JSON object")
+    overrides = input_limits.bound_value(overrides, f"variant {index}")
+    meta_over: Dict[str, Any] = {}
+    style_over: Dict[str, Any] = {}
+    slide_over: Dict[str, Dict[str, Any]] = {}
+    try:
+        _split_variant(overrides, meta_over, style_over, slide_over)
+    except ValueError as e:
+        raise ValueError(f"Variant {index}: {e}")
+
+    base_meta = base["meta"]
+    meta = dict(base_meta)
+    if meta_over:
+        raw = {key: base_meta.get(key) for key in VARIANT_META_FIELDS}
+        raw.update(meta_over)
+        fixed = sanitize_meta(raw)
+        for key in VARIANT_META_FIELDS:
+            meta[key] = fixed[key]
+    if style_over:
+        if "themeId" in style_over:
+            try:
+                meta["style"] = resolve_theme_style(style_over)
+            except ValueError as e:
+                raise ValueError(f"Variant {index}: {e}")
+            meta["themeId"] = style_over["themeId"]
+        else:
+            style = thaw(base_meta["style"])
+            style["colors"].update(style_over.pop("colors", {}))
+            style.update(style_over)
+            meta["style"] = sanitize_style(style)
+
+    slides = list(base["slides"])
+    if slide_over:
+        positions = {sl.get("id"): i for i, sl in enumerate(slides)}
+        for slide_id, fields in slide_over.items():
+            if slide_id not in positions:
+                raise ValueError(f"Variant {index}: unknown slide id '{slide_id}'")
+            i = positions[slide_id]
+            slides[i] = sanitize_slide({**thaw(slides[i]), **fields, "id": slides[i]["id"]}, i + 1)
+
+    return freeze_deck({"meta": meta, "slides": slides})
+
+
+def variants_from_csv(text: Any) -> List[Dict[str, Any]]:
+    """
+    Mail-merge: one variant per CSV row, the header names the overridden fields
+    ("customer", "clientLogo", "colors.primary", "slides.<id>.title", ...).
+    Empty cells keep the base deck's value; line breaks in content/items/bullets
+    cells become list entries. Comma, semicolon and tab separated files are accepted.
+
+    Raises:
+        ValueError: If the text is not CSV with a header and at least one row
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("'csv' must be a non-empty string")
+    header = text.lstrip("\ufeff").splitlines()[0]
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")), dialect=dialect)
+    fields = [f.strip() for f in reader.fieldnames or [] if f and f.strip()]
+    if not fields:
+        raise ValueError("CSV needs a header row")
+
+    variants = []
+    for row in reader:
+        variant = {}
+        for key, value in row.items():
+            if not key or value is None or not value.strip():
+                continue
+            key, value = key.strip(), value.strip()
+            if key.rsplit(".", 1)[-1] in _VARIANT_LIST_FIELDS:
+                value = [line.strip() for line in value.splitlines() if line.strip()]
+            variant[key] = value
+        if variant:
+            variants.append(variant)
+    if not variants:
+        raise ValueError("CSV has no data rows")
+    return variants
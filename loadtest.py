@@ -0,0 +1,528 @@
+"""
+Load Test for PPTX Maker
+Replays a corpus of deck payloads against a local uvicorn server (or --url) and
+reports latency percentiles, error rate, throughput and server RSS.
+
+Corpus entries (files or directories, *.json / *.jsonl):
+    - {"deck": {...}}                   request payload as sent by clients
+    - {"meta": {...}, "slides": [...]}  bare deck
+    - {"request_id": ..., "body": ...}  requests.jsonl-style line whose body is a
+                                        payload/deck (dict or JSON string)
+
+Usage:
+    python loadtest.py samples/ --concurrency 8 --duration 30
+    python loadtest.py decks.jsonl --endpoint /render --endpoint /render/bytes --rate 5 --requests 200
+    python loadtest.py decks.jsonl --url http://localhost:8000 --report report.json
+
+Closed loop (default): `--concurrency` clients send back to back.
+Open loop (`--rate`): Poisson arrivals at the given requests/s, at most
+`--concurrency` in flight; latency includes queueing from the scheduled start,
+so an overloaded server shows up in the percentiles instead of being hidden.
+
+Only the standard library is used; the harness speaks HTTP/1.1 itself.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+SAMPLE_PAYLOAD = {
+    "deck": {
+        "meta": {"deckTitle": "Load Test", "customer": "Load", "date": "2025-10-14"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Load Test", "subtitle": "Sample"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["One", "Two", "Three"]},
+            {"id": "3", "type": "context", "title": "Context", "text": "Lead", "bullets": ["a", "b"]},
+            {"id": "4", "type": "investment", "title": "Investment",
+             "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]},
+        ]
+    }
+}
+
+
+# ---- Corpus ----
+
+def _payload_from(obj: Any) -> Optional[Dict[str, Any]]:
+    """Request payload for one corpus entry, or None if it holds no deck."""
+    if isinstance(obj, str):
+        try:
+            obj = json.loads(obj)
+        except ValueError:
+            return None
+    if not isinstance(obj, dict):
+        return None
+    if isinstance(obj.get("deck"), dict):
+        return {"deck": obj["deck"]}
+    if "slides" in obj:
+        return {"deck": obj}
+    for key in ("body", "payload"):
+        if key in obj:
+            return _payload_from(obj[key])
+    return None
+
+
+def _corpus_files(paths: Iterable[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names)
+                             if n.endswith((".json", ".jsonl")))
+        else:
+            files.append(path)
+    return files
+
+
+def load_corpus(paths: Iterable[str]) -> Tuple[List[Dict[str, Any]], int]:
+    """Loads payloads from .json/.jsonl files and directories. Returns (payloads, skipped)."""
+    payloads, skipped = [], 0
+    for path in _corpus_files(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                entries = [line for line in f if line.strip()]
+            else:
+                entries = [f.read()]
+        for entry in entries:
+            payload = _payload_from(entry)
+            if payload is None:
+                skipped += 1
+            else:
+                payloads.append(payload)
+    return payloads, skipped
+
+
+# ---- Statistics ----
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile (p in 0..100) of `values`, None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Aggregates request samples ({latency, status, bytes, error}) into report numbers."""
+    latencies = [s["latency"] for s in samples]
+    errors = [s for s in samples if s["error"] or not 200 <= s["status"] < 300]
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        key = str(s["status"]) if s["status"] else "error"
+        statuses[key] = statuses.get(key, 0) + 1
+
+    def ms(v):
+        return None if v is None else round(v * 1000, 2)
+
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(max(latencies) if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+        "bytes": sum(s["bytes"] for s in samples),
+        "status": statuses,
+    }
+
+
+# ---- Server RSS (Linux /proc) ----
+
+def _read_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _process_tree(pid: int) -> List[int]:
+    """`pid` and all its descendants (uvicorn master + workers + render pool)."""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return [pid]
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        tree.append(p)
+        todo.extend(children.get(p, []))
+    return tree
+
+
+def server_rss(pid: Optional[int]) -> Optional[int]:
+    """Summed RSS in bytes of the server process tree, None if unknown."""
+    if not pid or not os.path.exists("/proc"):
+        return None
+    return sum(_read_rss(p) for p in _process_tree(pid))
+
+
+# ---- Minimal HTTP/1.1 client (keep-alive) ----
+
+class HttpClient:
+    """One keep-alive connection. Reconnects transparently when the server closed it."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        for attempt in (1, 2):
+            if self._writer is None:
+                await self._connect()
+            try:
+                return await asyncio.wait_for(self._roundtrip(method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt == 2:
+                    raise
+            except BaseException:
+                await self.close()
+                raise
+
+    async def _roundtrip(self, method, path, body, headers):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Server closed connection")
+        status = int(status_line.split()[1])
+        resp_headers: Dict[str, str] = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            resp_headers[name.strip().lower()] = value.strip()
+
+        if resp_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readline()
+            data = b"".join(chunks)
+        else:
+            data = await self._reader.readexactly(int(resp_headers.get("content-length", "0")))
+        if resp_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, resp_headers, data
+
+
+# ---- Local server ----
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workers: int, env: Optional[Dict[str, str]] = None,
+                 log=subprocess.DEVNULL) -> subprocess.Popen:
+    """Starts `app:app` under uvicorn from this directory (output to `log`)."""
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+           "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    return subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=dict(os.environ, **(env or {})), stdout=log, stderr=log)
+
+
+async def wait_ready(host: str, port: int, timeout: float = 30.0,
+                     proc: Optional[subprocess.Popen] = None) -> Dict[str, Any]:
+    """Polls GET / until the server answers; returns its JSON."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode} (see --server-log)")
+        client = HttpClient(host, port, timeout=5)
+        try:
+            status, _, data = await client.request("GET", "/")
+            if status == 200:
+                return json.loads(data)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await client.close()
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Server on port {port} not ready after {timeout:.0f}s")
+        await asyncio.sleep(0.2)
+
+
+# ---- Load generation ----
+
+async def _sample_rss(pid: Optional[int], out: List[int], stop: asyncio.Event, interval: float = 0.5):
+    while not stop.is_set():
+        rss = server_rss(pid)
+        if rss is not None:
+            out.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(host: str, port: int, bodies: List[bytes], endpoints: List[str],
+                   concurrency: int, rate: Optional[float], total: Optional[int],
+                   duration: Optional[float], timeout: float,
+                   seed: int = 0) -> Tuple[Dict[str, List[Dict[str, Any]]], float]:
+    """
+    Sends requests (round-robin over endpoints × corpus) until `total` requests
+    or `duration` seconds. Returns (samples per endpoint, elapsed seconds).
+    """
+    samples: Dict[str, List[Dict[str, Any]]] = {e: [] for e in endpoints}
+    counter = iter(range(sys.maxsize))
+    start = time.monotonic()
+
+    def next_job() -> Optional[Tuple[str, bytes]]:
+        n = next(counter)
+        if total is not None and n >= total:
+            return None
+        if duration is not None and time.monotonic() - start >= duration:
+            return None
+        return endpoints[n % len(endpoints)], bodies[(n // len(endpoints)) % len(bodies)]
+
+    async def send(client: HttpClient, endpoint: str, body: bytes, t0: float):
+        status, size, error = 0, 0, None
+        try:
+            status, _, data = await client.request(
+                "POST", endpoint, body, {"Content-Type": "application/json"})
+            size = len(data)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        samples[endpoint].append({"latency": time.monotonic() - t0, "status": status,
+                                  "bytes": size, "error": error})
+
+    clients = [HttpClient(host, port, timeout) for _ in range(concurrency)]
+    try:
+        if rate is None:
+            async def closed_loop(client):
+                while True:
+                    job = next_job()
+                    if job is None:
+                        return
+                    await send(client, job[0], job[1], time.monotonic())
+            await asyncio.gather(*(closed_loop(c) for c in clients))
+        else:
+            rng = random.Random(seed)
+            pool: asyncio.Queue = asyncio.Queue()
+            for c in clients:
+                pool.put_nowait(c)
+            tasks = []
+
+            async def open_request(endpoint, body, scheduled):
+                client = await pool.get()
+                try:
+                    await send(client, endpoint, body, scheduled)
+                finally:
+                    pool.put_nowait(client)
+
+            scheduled = time.monotonic()
+            while True:
+                job = next_job()
+                if job is None:
+                    break
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(open_request(job[0], job[1], scheduled)))
+                scheduled += rng.expovariate(rate)
+            await asyncio.gather(*tasks)
+    finally:
+        for c in clients:
+            await c.close()
+    return samples, time.monotonic() - start
+
+
+async def run(args) -> Dict[str, Any]:
+    payloads, skipped = load_corpus(args.corpus) if args.corpus else ([SAMPLE_PAYLOAD], 0)
+    if not payloads:
+        raise SystemExit("Corpus contains no decks")
+    bodies = [json.dumps(p, ensure_ascii=False).encode("utf-8") for p in payloads]
+    endpoints = args.endpoint or ["/render/bytes"]
+    total = args.requests if args.requests or args.duration else 100
+
+    proc, log = None, subprocess.DEVNULL
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", args.port or _free_port()
+        env = dict(kv.split("=", 1) for kv in args.env)
+        if args.server_log:
+            log = open(args.server_log, "ab")
+        proc = start_server(port, args.workers, env, log)
+    try:
+        info = await wait_ready(host, port, proc=proc)
+        pid = proc.pid if proc else args.server_pid
+        rss: List[int] = []
+        stop = asyncio.Event()
+        sampler = asyncio.ensure_future(_sample_rss(pid, rss, stop))
+
+        if args.warmup:
+            await run_load(host, port, bodies, endpoints, min(args.concurrency, args.warmup),
+                           None, args.warmup, None, args.timeout)
+        rss_start = server_rss(pid)
+        samples, elapsed = await run_load(host, port, bodies, endpoints, args.concurrency,
+                                          args.rate, total, args.duration, args.timeout, args.seed)
+        rss_end = server_rss(pid)
+        stop.set()
+        await sampler
+
+        client = HttpClient(host, port, timeout=10)
+        try:
+            status, _, data = await client.request("GET", "/metrics")
+            server_metrics = json.loads(data) if status == 200 else None
+        except Exception:
+            server_metrics = None
+        finally:
+            await client.close()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+    all_samples = [s for lst in samples.values() for s in lst]
+    errors = [s["error"] for s in all_samples if s["error"]]
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "url": args.url or f"http://{host}:{port}",
+            "endpoints": endpoints,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "requests": total,
+            "duration": args.duration,
+            "workers": None if args.url else args.workers,
+            "env": args.env,
+            "corpus": args.corpus,
+            "corpus_payloads": len(payloads),
+            "corpus_skipped": skipped,
+        },
+        "server": {
+            "builder_version": info.get("builder_version"),
+            "rss_start": rss_start,
+            "rss_end": rss_end,
+            "rss_max": max(rss) if rss else None,
+            "metrics": server_metrics,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "total": summarize(all_samples, elapsed),
+        "endpoints": {e: summarize(lst, elapsed) for e, lst in samples.items()},
+        "error_samples": sorted(set(errors))[:10],
+    }
+
+
+def _mb(value: Optional[int]) -> str:
+    return "-" if value is None else f"{value / 1024 / 1024:.1f} MB"
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['config']['url']}  builder {report['server']['builder_version']}  "
+          f"{report['elapsed_seconds']:.1f}s")
+    print(f"{'endpoint':<16}{'req':>7}{'err%':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, st in rows:
+        lat = st["latency_ms"]
+        fmt = lambda v: "-" if v is None else f"{v:.0f}"
+        print(f"{name:<16}{st['requests']:>7}{st['error_rate'] * 100:>6.1f}%{st['throughput_rps']:>8.2f}"
+              f"{fmt(lat['p50']):>9}{fmt(lat['p95']):>9}{fmt(lat['p99']):>9}")
+    srv = report["server"]
+    print(f"Server RSS: start {_mb(srv['rss_start'])}, max {_mb(srv['rss_max'])}, end {_mb(srv['rss_end'])}")
+    for err in report["error_samples"]:
+        print(f"  ⚠ {err}")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Replay a deck corpus against PPTX Maker")
+    p.add_argument("corpus", nargs="*", help=".json/.jsonl files or directories (default: built-in sample deck)")
+    p.add_argument("--endpoint", action="append", choices=["/render", "/render/bytes"],
+                   help="endpoint(s) to hit, round-robin (default: /render/bytes)")
+    p.add_argument("--concurrency", type=int, default=4, help="parallel connections (default: 4)")
+    p.add_argument("--rate", type=float, help="open-loop arrival rate in requests/s (default: closed loop)")
+    p.add_argument("--requests", type=int, help="number of requests (default: 100 without --duration)")
+    p.add_argument("--duration", type=float, help="run for this many seconds")
+    p.add_argument("--warmup", type=int, default=0, help="unmeasured requests before the run")
+    p.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    p.add_argument("--url", help="target an already running server instead of starting one")
+    p.add_argument("--server-pid", type=int, help="pid of the --url server for RSS sampling")
+    p.add_argument("--port", type=int, help="port for the local server (default: free port)")
+    p.add_argument("--workers", type=int, default=1, help="uvicorn workers of the local server")
+    p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                   help="environment for the local server, e.g. PPTX_RENDER_CACHE_DIR=/tmp/c")
+    p.add_argument("--server-log", help="append local server output to this file (default: discard)")
+    p.add_argument("--seed", type=int, default=0, help="seed for open-loop arrivals")
+    p.add_argument("--report", default="loadtest-report.json", help="JSON report path ('-' for stdout)")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.report == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.report}")
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
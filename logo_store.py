@@ -0,0 +1,277 @@
+"""
+Logo Store for PPTX Maker
+Inline logos (base64 / data URI) with content-hash deduplication across requests.
+
+`style.logo` and `style.clientLogo` may carry:
+    - a file path on the server (as before)
+    - a data URI:        "data:image/png;base64,iVBORw0KGgo..."
+    - raw base64 data:   "iVBORw0KGgo..."
+    - a hash reference:  "sha256:<hex>"  (once the logo has been sent before)
+
+Inline logos are decoded once, hashed (SHA-256 of the decoded image bytes),
+validated with Pillow and downscaled to what a 0.4" logo actually needs.
+The optimized bytes are kept in a bounded LRU cache keyed by the hash, so
+repeated requests with the same logo skip decoding and validation and clients
+can switch to sending only the "sha256:..." reference.
+
+The LRU is per worker. With PPTX_LOGO_DIR set, optimized logos are also written
+there (one file per hash), so a reference sent to any worker – or after a
+restart – resolves; without it, hash-only requests need a single worker or
+sticky routing.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+LOGO_REF_PREFIX = "sha256:"
+
+# Logos are drawn 0.4" high; 300 px keeps them sharp on high-DPI screens and in print.
+LOGO_MAX_HEIGHT_PX = 300
+
+# Formats python-pptx can embed as picture parts
+_ALLOWED_FORMATS = {"PNG", "JPEG", "GIF", "BMP", "TIFF"}
+
+_DATA_URI_RE = re.compile(r'^data:image/[\w.+-]+;base64,', re.IGNORECASE)
+_BASE64_RE = re.compile(r'^[A-Za-z0-9+/=\s_-]+$')
+_REF_RE = re.compile(r'^sha256:[0-9a-f]{64}$')
+
+# Raw base64 is only assumed for long strings without a file extension that
+# are not an existing server-side file; everything else is treated as a path.
+_MIN_RAW_BASE64_LEN = 64
+
+# Extensions render_plan.resolve_logo probes for paths given without one
+PATH_PROBE_EXTENSIONS = ('.png', '.PNG', '.jpg', '.JPG', '.jpeg', '.JPEG')
+
+
+class LogoError(ValueError):
+    """Raised when inline logo data cannot be decoded or is not a usable image."""
+
+
+def _max_items() -> int:
+    return int(os.getenv("PPTX_LOGO_CACHE_MAX_ITEMS", "256"))
+
+
+def _max_decoded_bytes() -> int:
+    return int(os.getenv("PPTX_LOGO_MAX_BYTES", str(5 * 1024 * 1024)))
+
+
+def _logo_dir() -> Optional[str]:
+    return os.getenv("PPTX_LOGO_DIR") or None
+
+
+# ---- Bounded LRU cache: hash ref -> optimized image bytes ----
+_lock = threading.Lock()
+_logos: "OrderedDict[str, bytes]" = OrderedDict()
+# digest of the submitted text -> hash ref (lets repeated payloads skip base64 decoding)
+_aliases: "OrderedDict[str, str]" = OrderedDict()
+
+
+def is_logo_ref(value: object) -> bool:
+    return isinstance(value, str) and value.startswith(LOGO_REF_PREFIX)
+
+
+def server_file(value: str) -> Optional[str]:
+    """Existing file for a logo path, also probing image extensions for paths without one."""
+    if os.path.exists(value):
+        return value
+    base_name = os.path.splitext(value)[0]
+    for ext in PATH_PROBE_EXTENSIONS:
+        if os.path.exists(base_name + ext):
+            return base_name + ext
+    return None
+
+
+def is_inline_logo(value: object) -> bool:
+    """True for data URIs and raw base64 strings (as opposed to file paths / refs)."""
+    if not isinstance(value, str) or is_logo_ref(value):
+        return False
+    if _DATA_URI_RE.match(value):
+        return True
+    if len(value) < _MIN_RAW_BASE64_LEN or os.path.splitext(value)[1]:
+        return False
+    if not _BASE64_RE.match(value):
+        return False
+    # "/" is part of the base64 alphabet: a long path without extension looks
+    # the same, so a file on the server wins
+    return "/" not in value or server_file(value) is None
+
+
+def _cache_get(ref: str) -> Optional[bytes]:
+    with _lock:
+        data = _logos.get(ref)
+        if data is not None:
+            _logos.move_to_end(ref)
+        return data
+
+
+def _cache_put(ref: str, data: bytes, alias: Optional[str] = None) -> None:
+    limit = max(1, _max_items())
+    with _lock:
+        _logos[ref] = data
+        _logos.move_to_end(ref)
+        if alias:
+            _aliases[alias] = ref
+            _aliases.move_to_end(alias)
+        while len(_logos) > limit:
+            evicted, _ = _logos.popitem(last=False)
+            logger.info(f"Evicted logo {evicted[:19]}... from cache")
+        while len(_aliases) > limit:
+            _aliases.popitem(last=False)
+
+
+def _disk_path(directory: str, ref: str) -> str:
+    return os.path.join(directory, ref[len(LOGO_REF_PREFIX):] + ".logo")
+
+
+def _disk_get(ref: str) -> Optional[bytes]:
+    directory = _logo_dir()
+    if not directory:
+        return None
+    try:
+        with open(_disk_path(directory, ref), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _disk_put(ref: str, data: bytes) -> None:
+    """Atomically writes the optimized bytes of `ref` to PPTX_LOGO_DIR (content-addressed, written once)."""
+    directory = _logo_dir()
+    if not directory:
+        return
+    path = _disk_path(directory, ref)
+    if os.path.exists(path):
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    except OSError as e:
+        logger.warning(f"Could not persist logo {ref[:19]}... to {directory}: {e}")
+
+
+def _decode(value: str) -> bytes:
+    payload = _DATA_URI_RE.sub("", value, count=1)
+    payload = "".join(payload.split())
+    try:
+        if "-" in payload or "_" in payload:
+            raw = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        else:
+            raw = base64.b64decode(payload + "=" * (-len(payload) % 4), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise LogoError(f"Logo is not valid base64: {e}")
+    if not raw:
+        raise LogoError("Logo data is empty")
+    if len(raw) > _max_decoded_bytes():
+        raise LogoError(f"Logo exceeds {_max_decoded_bytes()} bytes")
+    return raw
+
+
+def _validate_and_optimize(raw: bytes) -> bytes:
+    """
+    Checks that `raw` is an image python-pptx can embed and downscales oversized logos.
+    Returns the original bytes when optimizing would not make them smaller.
+    """
+    try:
+        with Image.open(io.BytesIO(raw)) as probe:
+            probe.verify()
+        img = Image.open(io.BytesIO(raw))
+        img.load()
+    except Exception as e:
+        raise LogoError(f"Logo is not a readable image: {e}")
+
+    fmt = (img.format or "").upper()
+    if fmt not in _ALLOWED_FORMATS:
+        raise LogoError(f"Unsupported logo format '{fmt or 'unknown'}'")
+
+    if img.height <= LOGO_MAX_HEIGHT_PX:
+        return raw
+
+    width = max(1, round(img.width * LOGO_MAX_HEIGHT_PX / img.height))
+    img = img.resize((width, LOGO_MAX_HEIGHT_PX), Image.LANCZOS)
+    out = io.BytesIO()
+    if fmt == "JPEG" and img.mode in ("RGB", "L"):
+        img.save(out, format="JPEG", quality=90, optimize=True)
+    else:
+        if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA")
+        img.save(out, format="PNG", optimize=True)
+    optimized = out.getvalue()
+    if len(optimized) >= len(raw):
+        return raw
+    logger.info(f"Optimized logo from {len(raw)} to {len(optimized)} bytes")
+    return optimized
+
+
+def store_logo(value: str) -> str:
+    """
+    Decodes, validates and caches an inline logo. Returns its "sha256:<hex>" reference.
+
+    Raises:
+        LogoError: If the data is not valid base64 or not a supported image
+    """
+    alias = hashlib.sha256(value.encode("utf-8")).hexdigest()
+    with _lock:
+        known = _aliases.get(alias)
+    if known and _cache_get(known) is not None:
+        return known
+
+    raw = _decode(value)
+    ref = LOGO_REF_PREFIX + hashlib.sha256(raw).hexdigest()
+    data = get_logo(ref)
+    if data is None:
+        data = _validate_and_optimize(raw)
+        _disk_put(ref, data)
+        logger.info(f"Stored logo {ref[:19]}... ({len(raw)} bytes)")
+    _cache_put(ref, data, alias)
+    return ref
+
+
+def get_logo(ref: str) -> Optional[bytes]:
+    """Returns the optimized image bytes for a "sha256:<hex>" reference (or None)."""
+    if not isinstance(ref, str) or not _REF_RE.match(ref):
+        return None
+    data = _cache_get(ref)
+    if data is None:
+        # stored by another worker (or before a restart)
+        data = _disk_get(ref)
+        if data is not None:
+            _cache_put(ref, data)
+    return data
+
+
+def preload(ref: str, data: bytes) -> None:
+    """Puts already optimized bytes under `ref` (e.g. in a worker process of the render pool)."""
+    if _REF_RE.match(ref):
+        _cache_put(ref, data)
+
+
+def has_logo(ref: str) -> bool:
+    return get_logo(ref) is not None
+
+
+def clear_cache() -> None:
+    with _lock:
+        _logos.clear()
+        _aliases.clear()
@@ -0,0 +1,192 @@
+"""
+Corporate master template for PPTX Maker.
+
+With PPTX_TEMPLATE_PATH pointing at a .pptx, decks are built on that file's
+slide masters and layouts instead of python-pptx's default template:
+
+    - the template is parsed once per process; its sample slides, thumbnail and
+      printer settings are stripped and the result is kept as bytes every render
+      starts from (re-read when the file's mtime or size changes)
+    - slide types map to layouts by name (PPTX_TEMPLATE_LAYOUTS, JSON), e.g.
+      {"title": "Cover", "agenda": "Agenda", "text": "Content", "default": "Content"}
+      Keys are slide types or the planner kinds "title", "text", "two_column",
+      "table" and "default"; unmapped or missing layouts fall back to the
+      built-in drawing on the template's blank layout
+    - title, subtitle and body placeholders of mapped layouts are filled with the
+      slide's text (fonts, colours and bullets come from the template); the
+      builder only draws what has no placeholder (tables, logos, badge)
+"""
+import io
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from pptx import Presentation
+from pptx.enum.shapes import PP_PLACEHOLDER
+
+import pptx_package
+
+logger = logging.getLogger(__name__)
+
+# Standard Office layout names – most corporate templates keep them
+DEFAULT_LAYOUT_MAP = {
+    "title": "Title Slide",
+    "text": "Title and Content",
+    "two_column": "Two Content",
+    "table": "Title Only",
+}
+
+_TITLE_TYPES = (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE)
+_BODY_TYPES = (PP_PLACEHOLDER.BODY, PP_PLACEHOLDER.OBJECT)
+
+
+def template_path() -> Optional[str]:
+    return os.getenv("PPTX_TEMPLATE_PATH") or None
+
+
+@lru_cache(maxsize=8)
+def _parse_layout_map(raw: str) -> Dict[str, str]:
+    mapping = dict(DEFAULT_LAYOUT_MAP)
+    if raw:
+        try:
+            custom = json.loads(raw)
+            if not isinstance(custom, dict):
+                raise ValueError("not a JSON object")
+            mapping.update({str(k): str(v) for k, v in custom.items() if v})
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid PPTX_TEMPLATE_LAYOUTS: {e}")
+    return mapping
+
+
+def layout_map() -> Dict[str, str]:
+    return _parse_layout_map(os.getenv("PPTX_TEMPLATE_LAYOUTS", ""))
+
+
+class MasterTemplate:
+    """Parsed template: stripped package bytes plus placeholder roles per layout."""
+
+    __slots__ = ("path", "fingerprint", "data", "slide_width", "slide_height", "layouts", "blank_layout")
+
+    def __init__(self, path: str, fingerprint: str, data: bytes, slide_width: int, slide_height: int,
+                 layouts: Dict[str, Dict[str, int]], blank_layout: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.data = data
+        self.slide_width = slide_width
+        self.slide_height = slide_height
+        # layout name -> {"title": idx, "subtitle": idx, "body": idx, "body2": idx}
+        self.layouts = layouts
+        self.blank_layout = blank_layout
+
+    def layout_for(self, slide_type: str, kind: str) -> Optional[str]:
+        """Template layout for a slide (by type, then planner kind, then "default"), or None."""
+        mapping = layout_map()
+        for key in (slide_type, kind, "default"):
+            name = mapping.get(key)
+            if name:
+                if name in self.layouts:
+                    return name
+                logger.debug(f"Template has no layout '{name}' for '{key}'")
+        return None
+
+    def placeholders(self, layout: Optional[str]) -> Dict[str, int]:
+        return dict(self.layouts.get(layout or "", {}))
+
+
+def _placeholder_roles(layout) -> Dict[str, int]:
+    roles: Dict[str, int] = {}
+    bodies = []
+    for ph in layout.placeholders:
+        fmt = ph.placeholder_format
+        if fmt.type in _TITLE_TYPES:
+            roles.setdefault("title", fmt.idx)
+        elif fmt.type == PP_PLACEHOLDER.SUBTITLE:
+            roles.setdefault("subtitle", fmt.idx)
+        elif fmt.type in _BODY_TYPES:
+            bodies.append(fmt.idx)
+    for role, idx in zip(("body", "body2"), sorted(bodies)):
+        roles[role] = idx
+    return roles
+
+
+def _strip_slides(prs) -> int:
+    """Removes the template's sample slides, returns how many there were."""
+    sld_id_lst = prs.slides._sldIdLst
+    ids = list(sld_id_lst)
+    for sld_id in ids:
+        prs.part.drop_rel(sld_id.rId)
+        sld_id_lst.remove(sld_id)
+    return len(ids)
+
+
+def _parse(path: str, fingerprint: str) -> MasterTemplate:
+    prs = Presentation(path)
+    removed = _strip_slides(prs)
+    names = [layout.name for master in prs.slide_masters for layout in master.slide_layouts]
+    # keep every layout (users add slides from them later), drop thumbnail + printer settings
+    pptx_package.slim_package(prs, keep_layouts=names)
+
+    layouts = {}
+    for master in prs.slide_masters:
+        for layout in master.slide_layouts:
+            layouts.setdefault(layout.name, _placeholder_roles(layout))
+    if "Blank" in layouts:
+        blank = "Blank"
+    else:
+        blank = min(layouts, key=lambda name: len(layouts[name]))
+
+    bio = io.BytesIO()
+    prs.save(bio)
+    data = bio.getvalue()
+    logger.info(f"Loaded master template {path} ({len(layouts)} layouts, "
+                f"{removed} sample slide(s) removed, {len(data)} bytes)")
+    return MasterTemplate(path, fingerprint, data, int(prs.slide_width), int(prs.slide_height),
+                          layouts, blank)
+
+
+_lock = threading.Lock()
+_cached: Optional[MasterTemplate] = None
+
+
+def _stat(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def fingerprint() -> Optional[str]:
+    """"<path>:<mtime_ns>:<size>" of the configured template (None without one)."""
+    path = template_path()
+    if not path:
+        return None
+    mtime_ns, size = _stat(path)
+    return f"{os.path.abspath(path)}:{mtime_ns}:{size}"
+
+
+def load() -> Optional[MasterTemplate]:
+    """
+    The configured template, parsed once and re-parsed when the file changes.
+    None without PPTX_TEMPLATE_PATH.
+
+    Raises:
+        OSError: If the configured file cannot be read
+    """
+    global _cached
+    current = fingerprint()
+    if current is None:
+        return None
+    cached = _cached
+    if cached is not None and cached.fingerprint == current:
+        return cached
+    with _lock:
+        if _cached is None or _cached.fingerprint != current:
+            _cached = _parse(template_path(), current)
+        return _cached
+
+
+def clear_cache() -> None:
+    global _cached
+    with _lock:
+        _cached = None
@@ -0,0 +1,148 @@
+"""
+Per-request memory accounting for PPTX Maker.
+
+Opt-in via PPTX_MEMORY_TRACKING=1. Each request then records, per stage
+(sanitize, build, save, encode):
+
+    - peak_bytes:  tracemalloc peak of Python allocations above the stage start
+    - rss_delta:   change of the worker's resident set size (Linux /proc)
+
+Both are needed: python-pptx keeps slide XML in lxml trees, which libxml2
+allocates outside the Python allocator – tracemalloc does not see them, RSS does.
+
+Results go to the response (X-PPTX-Memory header / _meta.memory) and to
+/metrics ("memory.<stage>.peak_bytes", ...).
+
+tracemalloc is process-wide and slows rendering down noticeably, so tracked
+requests are serialized within a worker to keep the numbers attributable.
+Use it for measurements and debugging, not permanently in production.
+"""
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+import metrics
+
+STAGES = ("sanitize", "build", "save", "encode")
+
+_request_lock = threading.Lock()
+_current: ContextVar[Optional["MemoryReport"]] = ContextVar("memtrack_report", default=None)
+
+
+def enabled() -> bool:
+    return os.getenv("PPTX_MEMORY_TRACKING", "0").lower() in ("1", "true", "yes")
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, None where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemoryReport:
+    """Memory numbers of one request, per stage."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Optional[int]]] = {}
+        self.rss_start = rss_bytes()
+        self.rss_end: Optional[int] = None
+
+    def add(self, name: str, peak: int, rss_delta: Optional[int]) -> None:
+        # a stage entered more than once (e.g. build for compile + render) keeps its max peak
+        entry = self.stages.setdefault(name, {"peak_bytes": 0, "rss_delta": None})
+        entry["peak_bytes"] = max(entry["peak_bytes"], peak)
+        if rss_delta is not None:
+            entry["rss_delta"] = (entry["rss_delta"] or 0) + rss_delta
+
+    @property
+    def peak_bytes(self) -> int:
+        return max((s["peak_bytes"] for s in self.stages.values()), default=0)
+
+    @property
+    def rss_delta(self) -> Optional[int]:
+        if self.rss_start is None or self.rss_end is None:
+            return None
+        return self.rss_end - self.rss_start
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": self.stages,
+            "peak_bytes": self.peak_bytes,
+            "rss_bytes": self.rss_end,
+            "rss_delta": self.rss_delta,
+        }
+
+    def header_value(self) -> str:
+        """Compact form for X-PPTX-Memory: "sanitize=123;build=456;...;peak=456;rss_delta=789"."""
+        parts = [f"{name}={s['peak_bytes']}" for name, s in self.stages.items()]
+        parts.append(f"peak={self.peak_bytes}")
+        if self.rss_delta is not None:
+            parts.append(f"rss_delta={self.rss_delta}")
+        return ";".join(parts)
+
+    def publish(self) -> None:
+        for name, s in self.stages.items():
+            metrics.observe(f"memory.{name}.peak_bytes", s["peak_bytes"])
+            if s["rss_delta"] is not None:
+                metrics.observe(f"memory.{name}.rss_delta_bytes", s["rss_delta"])
+        metrics.observe("memory.request.peak_bytes", self.peak_bytes)
+        if self.rss_end is not None:
+            metrics.set_gauge("memory.rss_bytes", self.rss_end)
+
+
+def current() -> Optional[MemoryReport]:
+    return _current.get()
+
+
+@contextmanager
+def track_request(force: bool = False) -> Iterator[Optional[MemoryReport]]:
+    """
+    Tracks the enclosed request when PPTX_MEMORY_TRACKING is set (or `force`).
+    Yields the MemoryReport, or None when tracking is off.
+    """
+    if not (force or enabled()):
+        yield None
+        return
+    with _request_lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        report = MemoryReport()
+        token = _current.set(report)
+        try:
+            yield report
+        finally:
+            _current.reset(token)
+            report.rss_end = rss_bytes()
+            report.publish()
+            if started and not enabled():
+                # one-off (forced) measurement: don't leave the process traced
+                tracemalloc.stop()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Measures the enclosed block as stage `name` of the current request (no-op if untracked)."""
+    report = _current.get()
+    if report is None:
+        yield
+        return
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    rss0 = rss_bytes()
+    try:
+        yield
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        rss1 = rss_bytes()
+        report.add(name, max(0, peak - base),
+                   None if rss0 is None or rss1 is None else rss1 - rss0)
@@ -0,0 +1,73 @@
+"""
+In-process metrics for PPTX Maker.
+
+Counters, gauges and timings are kept per worker process and exposed as JSON
+via GET /metrics. Names are dotted, e.g. "render_cache.hits".
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, float] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+_started = time.time()
+
+
+def incr(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """Records one observation (e.g. seconds or bytes): count, sum, max."""
+    with _lock:
+        t = _timings.get(name)
+        if t is None:
+            t = _timings[name] = {"count": 0, "sum": 0.0, "max": 0.0}
+        t["count"] += 1
+        t["sum"] += value
+        if value > t["max"]:
+            t["max"] = value
+
+
+def counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def ratio(hits: str, misses: str) -> float:
+    """hits / (hits + misses), 0.0 when nothing was counted yet."""
+    with _lock:
+        h = _counters.get(hits, 0)
+        m = _counters.get(misses, 0)
+    return round(h / (h + m), 4) if (h + m) else 0.0
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        timings = {
+            name: dict(t, avg=round(t["sum"] / t["count"], 6) if t["count"] else 0.0)
+            for name, t in _timings.items()
+        }
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - _started, 1),
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": timings,
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
@@ -17,9 +17,13 @@ SlideType = Literal[
     "approach","principles","architecture","modules_overview",
     "module_detail","transfer","digital","coaching","target_group",
     "impact","about_synk","team","references","expertise","partners",
-    "investment","next_steps","contact"
+    "investment","next_steps","contact","library","chart"
 ]
 
+class ChartSeries(BaseModel):
+    name: Optional[str] = None
+    values: List[Optional[float]]
+
 class Slide(BaseModel):
     id: str
     type: SlideType
@@ -30,6 +34,10 @@ class Slide(BaseModel):
     trainers: Optional[List[TrainerItem]] = None
     visual: Optional[str] = None
     designHint: Optional[str] = None
+    ref: Optional[str] = None  # library slides
+    chartType: Optional[Literal["bar","line","pie"]] = None  # chart slides
+    categories: Optional[List[str]] = None
+    series: Optional[List[ChartSeries]] = None
 
 class Style(BaseModel):
     font: str = "Arial Narrow"
@@ -0,0 +1,416 @@
+"""
+Output offload for PPTX Maker: rendered packages go to an object store and the
+client gets a short-lived URL instead of the file.
+
+Returning a 5 MB deck as base64 in /render JSON keeps ~12 MB per request in the
+worker and on the wire. POST /render/url uploads the package instead and
+answers with {"url", "expiresAt", "sha256", "size"}:
+
+    - S3 (PPTX_S3_BUCKET + PPTX_S3_ENDPOINT, credentials): PUT with AWS
+      Signature V4, the URL is a presigned GET. Works with MinIO, Ceph, R2 and
+      AWS itself – no boto3 needed, signing is a few HMACs.
+    - shared volume (PPTX_OUTPUT_DIR): atomic write into the directory, the URL
+      points at GET /outputs/{key} of this service, signed with HMAC-SHA256 and
+      an expiry time. The signing key is PPTX_OUTPUT_SIGNING_KEY or a random
+      key created once in the directory (so all workers on the volume share it).
+
+Objects are content-addressed (<sha256>.pptx), so an identical package is
+uploaded once. Each worker remembers which deck hash (render_cache.deck_hash)
+was published as which object: a repeated request gets its reference without
+rendering, hashing or uploading anything. Uploads stream from the render cache
+file when there is one (sendfile / chunked reads), otherwise from the bytes the
+builder returned. Expiry of the objects themselves is left to the store
+(bucket lifecycle rule, cron on the volume).
+"""
+import hashlib
+import hmac
+import logging
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import quote, urlsplit
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+KEY_RE = re.compile(r"^[0-9a-f]{64}\.pptx$")
+
+# presigned S3 URLs may not live longer than 7 days
+_MAX_S3_TTL = 7 * 24 * 3600
+_CHUNK = 1024 * 1024
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+_MEMO_SIZE = 1024
+# generated key files hold 64 hex chars; anything much shorter is damaged
+_MIN_SIGNING_KEY_CHARS = 32
+
+# package bytes or path to a .pptx (e.g. a render cache entry)
+Source = Union[bytes, str]
+
+
+class ObjectStoreError(Exception):
+    """Upload or lookup in the object store failed."""
+
+
+def url_ttl_seconds() -> int:
+    return int(os.getenv("PPTX_OUTPUT_URL_TTL_SECONDS", "3600"))
+
+
+def _sha256(source: Source) -> Tuple[str, int]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest(), len(source)
+    h = hashlib.sha256()
+    size = 0
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# ---- AWS Signature Version 4 ----
+
+def _uri_encode(value: str, keep_slash: bool = False) -> str:
+    return quote(value, safe="-_.~/" if keep_slash else "-_.~")
+
+
+def _canonical_query(params: Dict[str, str]) -> str:
+    return "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(params.items()))
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _sign(secret_key: str, amz_date: str, region: str, canonical_request: str) -> Tuple[str, str]:
+    """(credential scope, signature) for a canonical request."""
+    date = amz_date[:8]
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()])
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), date)
+    for part in (region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    return scope, hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def sign_request(method: str, host: str, path: str, headers: Dict[str, str], payload_sha256: str,
+                 access_key: str, secret_key: str, region: str, now: Optional[datetime] = None) -> Dict[str, str]:
+    """Headers for a SigV4-signed request (Authorization, x-amz-date, x-amz-content-sha256 added)."""
+    amz_date = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    signed = {k.lower(): str(v).strip() for k, v in headers.items()}
+    signed.update({"host": host, "x-amz-date": amz_date, "x-amz-content-sha256": payload_sha256})
+    names = sorted(signed)
+    canonical = "\n".join([method, _uri_encode(path, keep_slash=True), "",
+                           "".join(f"{n}:{signed[n]}\n" for n in names), ";".join(names), payload_sha256])
+    scope, signature = _sign(secret_key, amz_date, region, canonical)
+    out = dict(headers, **{"x-amz-date": amz_date, "x-amz-content-sha256": payload_sha256})
+    out["Authorization"] = (f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+                            f"SignedHeaders={';'.join(names)}, Signature={signature}")
+    return out
+
+
+def presign(method: str, host: str, path: str, access_key: str, secret_key: str, region: str,
+            expires: int, params: Optional[Dict[str, str]] = None, now: Optional[datetime] = None) -> str:
+    """Query string of a presigned URL for `path` on `host` (SigV4, UNSIGNED-PAYLOAD)."""
+    amz_date = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    query = dict(params or {})
+    query.update({
+        "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+        "X-Amz-Credential": f"{access_key}/{amz_date[:8]}/{region}/s3/aws4_request",
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(expires),
+        "X-Amz-SignedHeaders": "host",
+    })
+    canonical = "\n".join([method, _uri_encode(path, keep_slash=True), _canonical_query(query),
+                           f"host:{host}\n", "host", "UNSIGNED-PAYLOAD"])
+    _, signature = _sign(secret_key, amz_date, region, canonical)
+    return _canonical_query(query) + f"&X-Amz-Signature={signature}"
+
+
+# ---- Stores ----
+
+class S3Store:
+    """S3-compatible bucket, path-style addressing (http(s)://endpoint/bucket/key)."""
+
+    name = "s3"
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", prefix: str = "", public_endpoint: Optional[str] = None):
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        # presigned URLs are signed for the host the client will use
+        self.public_endpoint = (public_endpoint or endpoint).rstrip("/")
+
+    @property
+    def identity(self) -> str:
+        return f"s3:{self.endpoint}/{self.bucket}/{self.prefix}"
+
+    def _path(self, key: str) -> str:
+        return f"/{self.bucket}/{self.prefix}{key}"
+
+    def _request(self, method: str, key: str, data=None, headers: Optional[Dict[str, str]] = None,
+                 payload_sha256: str = _EMPTY_SHA256):
+        path = self._path(key)
+        signed = sign_request(method, urlsplit(self.endpoint).netloc, path, headers or {}, payload_sha256,
+                              self.access_key, self.secret_key, self.region)
+        request = urllib.request.Request(self.endpoint + _uri_encode(path, keep_slash=True),
+                                         data=data, method=method, headers=signed)
+        return urllib.request.urlopen(request, timeout=60)
+
+    def exists(self, key: str) -> bool:
+        try:
+            with self._request("HEAD", key):
+                return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+            raise ObjectStoreError(f"HEAD {key} failed: HTTP {e.code}") from e
+        except OSError as e:
+            raise ObjectStoreError(f"HEAD {key} failed: {e}") from e
+
+    def put(self, key: str, source: Source, sha256: str, size: int) -> None:
+        headers = {"Content-Type": PPTX_MEDIA_TYPE, "Content-Length": str(size)}
+        try:
+            if isinstance(source, str):
+                with open(source, "rb") as f, self._request("PUT", key, f, headers, sha256):
+                    pass
+            else:
+                with self._request("PUT", key, bytes(source), headers, sha256):
+                    pass
+        except urllib.error.HTTPError as e:
+            raise ObjectStoreError(f"PUT {key} failed: HTTP {e.code} {e.read()[:200]!r}") from e
+        except OSError as e:
+            raise ObjectStoreError(f"PUT {key} failed: {e}") from e
+
+    def url(self, key: str, filename: str, ttl: int, base_url: str = "") -> Tuple[str, float]:
+        ttl = max(1, min(ttl, _MAX_S3_TTL))
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        path = self._path(key)
+        query = presign("GET", urlsplit(self.public_endpoint).netloc, path, self.access_key, self.secret_key,
+                        self.region, ttl, now=now, params={
+                            "response-content-disposition": _content_disposition(filename),
+                            "response-content-type": PPTX_MEDIA_TYPE,
+                        })
+        return f"{self.public_endpoint}{_uri_encode(path, keep_slash=True)}?{query}", now.timestamp() + ttl
+
+
+class VolumeStore:
+    """Directory on a volume shared by all workers, served signed via GET /outputs/{key}."""
+
+    name = "volume"
+
+    def __init__(self, directory: str, signing_key: Optional[str] = None):
+        self.directory = os.path.abspath(directory)
+        self._signing_key = signing_key.encode("utf-8") if signing_key else None
+
+    @property
+    def identity(self) -> str:
+        return f"volume:{self.directory}"
+
+    def path_for(self, key: str) -> str:
+        if not KEY_RE.match(key):
+            raise ValueError(f"Invalid object key {key!r}")
+        return os.path.join(self.directory, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path_for(key))
+
+    def put(self, key: str, source: Source, sha256: str, size: int) -> None:
+        path = self.path_for(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    if isinstance(source, str):
+                        with open(source, "rb") as src:
+                            shutil.copyfileobj(src, f, _CHUNK)
+                    else:
+                        f.write(source)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except FileNotFoundError:
+                    pass
+                raise
+        except OSError as e:
+            raise ObjectStoreError(f"Writing {path} failed: {e}") from e
+
+    def signing_key(self) -> bytes:
+        """
+        PPTX_OUTPUT_SIGNING_KEY, else a key file created once in the directory.
+
+        The file is written completely under a temporary name and then linked
+        into place, so other workers either see no key file or a complete one,
+        and the first worker to link wins.
+
+        Raises:
+            ObjectStoreError: no usable key could be created or read
+        """
+        if self._signing_key is None:
+            path = os.path.join(self.directory, ".signing-key")
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if not os.path.exists(path):
+                    fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                    try:
+                        with os.fdopen(fd, "w") as f:
+                            f.write(secrets.token_hex(32))
+                        os.chmod(tmp, 0o600)
+                        os.link(tmp, path)
+                    except FileExistsError:
+                        pass  # another worker was first
+                    finally:
+                        os.unlink(tmp)
+                with open(path, "r") as f:
+                    key = f.read().strip()
+            except OSError as e:
+                raise ObjectStoreError(f"Signing key {path} not usable: {e} "
+                                       f"(set PPTX_OUTPUT_SIGNING_KEY instead)") from e
+            if len(key) < _MIN_SIGNING_KEY_CHARS:
+                # never sign with an empty or truncated key
+                raise ObjectStoreError(f"Signing key {path} is empty or too short - delete it to create a new one")
+            self._signing_key = key.encode("utf-8")
+        return self._signing_key
+
+    def signature(self, key: str, expires: int, filename: str) -> str:
+        msg = f"{key}\n{expires}\n{filename}"
+        return hmac.new(self.signing_key(), msg.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def verify(self, key: str, expires: int, filename: str, signature: str) -> bool:
+        return (expires >= time.time()
+                and hmac.compare_digest(self.signature(key, expires, filename), signature))
+
+    def url(self, key: str, filename: str, ttl: int, base_url: str = "") -> Tuple[str, float]:
+        expires = int(time.time()) + max(1, ttl)
+        query = _canonical_query({"expires": str(expires), "filename": filename,
+                                  "signature": self.signature(key, expires, filename)})
+        return f"{base_url.rstrip('/')}/outputs/{key}?{query}", float(expires)
+
+
+def _content_disposition(filename: str) -> str:
+    return f'attachment; filename="{filename}"; filename*=UTF-8\'\'{quote(filename)}'
+
+
+Store = Union[S3Store, VolumeStore]
+
+_store: Optional[Store] = None
+_store_lock = threading.Lock()
+
+
+def _config() -> Optional[Tuple[str, ...]]:
+    bucket = os.getenv("PPTX_S3_BUCKET")
+    if bucket:
+        return ("s3", os.getenv("PPTX_S3_ENDPOINT", "https://s3.amazonaws.com"), bucket,
+                os.getenv("PPTX_S3_ACCESS_KEY", ""), os.getenv("PPTX_S3_SECRET_KEY", ""),
+                os.getenv("PPTX_S3_REGION", "us-east-1"), os.getenv("PPTX_S3_PREFIX", "renders/"),
+                os.getenv("PPTX_S3_PUBLIC_ENDPOINT", ""))
+    directory = os.getenv("PPTX_OUTPUT_DIR")
+    if directory:
+        return ("volume", directory, os.getenv("PPTX_OUTPUT_SIGNING_KEY", ""))
+    return None
+
+
+def get_store() -> Optional[Store]:
+    """Process-wide store configured from the environment (S3 wins over a volume), or None."""
+    global _store
+    config = _config()
+    if config is None:
+        return None
+    with _store_lock:
+        if _store is None or getattr(_store, "_config", None) != config:
+            if config[0] == "s3":
+                _store = S3Store(*config[1:7], public_endpoint=config[7] or None)
+            else:
+                _store = VolumeStore(config[1], config[2] or None)
+            _store._config = config
+            logger.info(f"Output offload enabled: {_store.identity}")
+        return _store
+
+
+# ---- Publishing ----
+
+# (store identity, deck hash) -> (object key, sha256, size); per worker, LRU
+_published: "OrderedDict[Tuple[str, str], Tuple[str, str, int]]" = OrderedDict()
+_published_lock = threading.Lock()
+
+
+def _reference(store: Store, key: str, sha256: str, size: int, filename: str,
+               base_url: str, uploaded: bool) -> Dict[str, Any]:
+    url, expires_at = store.url(key, filename, url_ttl_seconds(), base_url)
+    return {"url": url, "expiresAt": _iso(expires_at), "sha256": sha256, "size": size,
+            "store": store.name, "uploaded": uploaded}
+
+
+def lookup(store: Store, deck_key: str, filename: str, base_url: str = "") -> Optional[Dict[str, Any]]:
+    """Reference to the object already published for deck hash `deck_key` by this worker, or None."""
+    with _published_lock:
+        entry = _published.get((store.identity, deck_key))
+        if entry is not None:
+            _published.move_to_end((store.identity, deck_key))
+    if entry is None:
+        return None
+    key, sha256, size = entry
+    # a volume is cheap to check; bucket objects are trusted until their lifecycle rule
+    if isinstance(store, VolumeStore) and not store.exists(key):
+        with _published_lock:
+            _published.pop((store.identity, deck_key), None)
+        return None
+    metrics.incr("object_store.memo_hits")
+    return _reference(store, key, sha256, size, filename, base_url, uploaded=False)
+
+
+def publish(store: Store, deck_key: Optional[str], source: Source, filename: str,
+            base_url: str = "") -> Dict[str, Any]:
+    """
+    Uploads `source` (unless an identical object exists) and returns its reference:
+    {"url", "expiresAt", "sha256", "size", "store", "uploaded"}.
+
+    Raises:
+        ObjectStoreError: upload or existence check failed
+    """
+    sha256, size = _sha256(source)
+    key = f"{sha256}.pptx"
+    uploaded = False
+    if store.exists(key):
+        metrics.incr("object_store.dedup_hits")
+    else:
+        started = time.perf_counter()
+        store.put(key, source, sha256, size)
+        metrics.incr("object_store.uploads")
+        metrics.observe("object_store.upload_seconds", time.perf_counter() - started)
+        metrics.observe("object_store.upload_bytes", size)
+        uploaded = True
+    if deck_key:
+        with _published_lock:
+            _published[(store.identity, deck_key)] = (key, sha256, size)
+            _published.move_to_end((store.identity, deck_key))
+            while len(_published) > _MEMO_SIZE:
+                _published.popitem(last=False)
+    return _reference(store, key, sha256, size, filename, base_url, uploaded)
+
+
+def clear() -> None:
+    """Forget published references (tests)."""
+    with _published_lock:
+        _published.clear()
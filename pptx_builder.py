@@ -1,417 +1,475 @@
 import io, base64
+import logging
+import multiprocessing
 import os
-import unicodedata
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pptx import Presentation
-from pptx.util import Inches, Pt
+from pptx.util import Pt
 from pptx.dml.color import RGBColor
-from typing import List, Union
-
-# ---- Proof flag / version tag ----
-BUILDER_VERSION = "v2-2025-10-16"
-
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import deadline
+import logo_store
+import master_template
+import memtrack
+import metrics
+import pptx_chart
+import pptx_package
+import slide_library
+import tracing
+# Stage 1 (deck → plan) lives in render_plan; re-exported here for existing imports
+from render_plan import (
+    BUILDER_VERSION, sanitize_text, resolve_logo, compile_deck, slide_attributes, chart_points,
+    _normalize_content_from_slide,
+    plan_logos, plan_version_badge, plan_title_slide, plan_text_slide,
+    plan_two_col_text_slide, plan_table_slide, plan_chart_slide,
+)
+
+logger = logging.getLogger(__name__)
+
+_ALIGN = {"left": 0, "center": 1, "right": 2}  # 0=left, 1=center, 2=right
+
+@lru_cache(maxsize=256)
 def hex_to_rgb(hexstr: str):
     hexstr = hexstr.lstrip("#")
     return RGBColor(int(hexstr[0:2],16), int(hexstr[2:4],16), int(hexstr[4:6],16))
 
-def sanitize_text(text: str) -> str:
-    if text is None:
-        return ""
-    # Replace common problematic Unicode characters
-    replacements = {
-        '\u2013': '-',  # En dash
-        '\u2014': '-',  # Em dash
-        '\u2018': "'",  # Left single quotation mark
-        '\u2019': "'",  # Right single quotation mark
-        '\u201C': '"',  # Left double quotation mark
-        '\u201D': '"',  # Right double quotation mark
-        '\u2026': '...',  # Horizontal ellipsis
-        '\u00A0': ' ',  # Non-breaking space
-    }
-    for u, a in replacements.items():
-        text = text.replace(u, a)
-    text = unicodedata.normalize('NFKD', text)
-    # keep latin-1 safe (avoid odd glyphs)
-    return text.encode('ascii', 'ignore').decode('ascii')
-
-def add_logos(slide, synk_logo_path, client_logo_path, slide_width, slide_height):
-    # SYNK logo - bottom right corner
-    if synk_logo_path and os.path.exists(synk_logo_path):
-        logo_height = Inches(0.4)
-        logo_width = Inches(1.2)
-        left = slide_width - logo_width - Inches(0.3)
-        top = slide_height - logo_height - Inches(0.2)
-        try:
-            slide.shapes.add_picture(synk_logo_path, left, top, height=logo_height)
-        except Exception:
-            pass
-    # Client logo - bottom left corner
-    if client_logo_path and os.path.exists(client_logo_path):
-        logo_height = Inches(0.4)
-        left = Inches(0.3)
-        top = slide_height - logo_height - Inches(0.2)
+# ---- Stage 2: plan → PPTX (no decisions here, just drawing) ----
+
+def _style_font(font, style: Dict[str, Any]):
+    font.name = style["font"]; font.size = Pt(style["size"])
+    if style.get("bold"):
+        font.bold = True
+    if style.get("color"):
+        font.color.rgb = hex_to_rgb(style["color"])
+
+def _draw_textbox(s, op: Dict[str, Any]):
+    tb = s.shapes.add_textbox(op["x"], op["y"], op["w"], op["h"])
+    tf = tb.text_frame
+    for i, para in enumerate(op["paragraphs"]):
+        p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
+        p.text = para["text"]
+        _style_font(p.font, para)
+    if op.get("wrap"):
+        tf.word_wrap = True
+
+def _draw_picture(s, op: Dict[str, Any]):
+    image = op["image"]
+    with tracing.span("draw_picture") as sp:
+        if logo_store.is_logo_ref(image):
+            data = logo_store.get_logo(image)
+            sp.set_attributes({"image.source": "logo_store", "image.found": data is not None})
+            if data is None:
+                return
+            sp.set_attribute("image.bytes", len(data))
+            image = io.BytesIO(data)
+        else:
+            sp.set_attribute("image.source", "file")
         try:
-            slide.shapes.add_picture(client_logo_path, left, top, height=logo_height)
-        except Exception:
-            pass
-
-def add_version_badge(slide, meta, prs):
-    """Small version tag in bottom-right corner as visual proof of the deployed builder."""
-    try:
-        text = f"builder {meta.get('builder_version', '')}".strip()
-        if not text:
-            text = f"builder {BUILDER_VERSION}"
-        # place small, unobtrusive text in bottom-right
-        tb = slide.shapes.add_textbox(prs.slide_width - Inches(2.6), prs.slide_height - Inches(0.55), Inches(2.3), Inches(0.4))
-        p = tb.text_frame.paragraphs[0]
-        p.text = sanitize_text(text)
-        p.font.name = "Arial"
-        p.font.size = Pt(9)
-        # use accent color to be visible but subtle
-        p.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["accent1"])
-    except Exception:
-        # never fail the render just because of a badge
-        pass
-
-def add_title_slide(prs, meta, slide):
-    s = prs.slides.add_slide(prs.slide_layouts[6])  # blank
-    # background (primary)
-    fill = s.background.fill
-    fill.solid()
-    fill.fore_color.rgb = hex_to_rgb(meta["style"]["colors"]["primary"])
-    # title
-    tb = s.shapes.add_textbox(Inches(1), Inches(1.7), prs.slide_width - Inches(2), Inches(1.2))
-    p = tb.text_frame.paragraphs[0]
-    p.text = sanitize_text(slide.get("title",""))
-    p.font.name = "Arial"; p.font.size = Pt(44); p.font.bold = True; p.font.color.rgb = RGBColor(255,255,255)
-    tb.text_frame.word_wrap = True
-    # subtitle
-    sub = s.shapes.add_textbox(Inches(1), Inches(2.7), prs.slide_width - Inches(2), Inches(0.8))
-    sp = sub.text_frame.paragraphs[0]
-    sp.text = sanitize_text(slide.get("subtitle") or (meta.get("deckSubtitle") or ""))
-    sp.font.name = "Arial"; sp.font.size = Pt(20); sp.font.color.rgb = RGBColor(255,255,255)
-    sub.text_frame.word_wrap = True
-    # version badge
-    add_version_badge(s, meta, prs)
-    return s
-
-def _normalize_content_from_slide(slide: dict) -> List[str]:
-    """
-    Builds a flat list of strings to render as paragraphs from various schema variants.
-    Priority:
-      - 'content' if present (string or list)
-      - else 'text' (+ optional 'bullets' or 'items')
-      - else 'items' / 'bullets'
-      - for team: 'members'/'trainers' dicts → lines
-      - for contact: 'contact' dict → lines
-    """
-    out: List[str] = []
-
-    # Explicit content wins
-    if "content" in slide and slide["content"] not in (None, "", []):
-        c = slide["content"]
-        if isinstance(c, str):
-            out.append(c)
-        elif isinstance(c, list):
-            out.extend([str(x) for x in c if x is not None])
-        return [sanitize_text(x) for x in out]
-
-    # Contact block
-    if "contact" in slide and isinstance(slide["contact"], dict):
-        c = slide["contact"]
-        line1 = " - ".join([x for x in [c.get("name"), c.get("role")] if x])
-        line2 = c.get("email")
-        line3 = c.get("phone")
-        for ln in [line1, line2, line3]:
-            if ln:
-                out.append(ln)
-
-    # Team members / trainers
-    members = []
-    if isinstance(slide.get("members"), list):
-        members = slide["members"]
-    elif isinstance(slide.get("trainers"), list):
-        members = slide["trainers"]
-    if members:
-        for m in members:
-            if isinstance(m, dict):
-                name = m.get("name","")
-                role = m.get("role")
-                focus = m.get("focus")
-                parts = [name]
-                if role:  parts.append(role)
-                if focus: parts.append(f"({focus})")
-                out.append(" – ".join([p for p in parts if p]))
-            else:
-                out.append(str(m))
-
-    # Base text + bullets/items
-    base_text = slide.get("text")
-    if isinstance(base_text, str) and base_text.strip():
-        out.insert(0, base_text)  # lead paragraph first
-
-    for key in ("bullets", "items"):
-        lst = slide.get(key)
-        if isinstance(lst, list) and lst:
-            for x in lst:
-                if isinstance(x, str):
-                    out.append(x)
-                elif isinstance(x, dict):
-                    # e.g., investment items with label/value/note
-                    label = x.get("label")
-                    value = x.get("value")
-                    note  = x.get("note")
-                    if label or value or note:
-                        triple = " – ".join([t for t in [label, value, note] if t])
-                        out.append(triple)
-
-    out = [sanitize_text(x) for x in out if x is not None]
-    return out
-
-def add_text_slide(prs, meta, slide, header="", synk_logo_path=None, client_logo_path=None):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_logos(s, synk_logo_path, client_logo_path, prs.slide_width, prs.slide_height)
-
-    # header
-    hdr = s.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9.0), Inches(0.6))
-    hp = hdr.text_frame.paragraphs[0]
-    title_text = slide.get("title","")
-    if header:
-        title_text = f"{header} - {title_text}" if title_text else header
-    hp.text = sanitize_text(title_text)
-    hp.font.name = "Arial"; hp.font.size = Pt(28); hp.font.bold = True
-    hp.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-    hdr.text_frame.word_wrap = True
-
-    # body (Lead + Bullets)
-    left, top, width, height = Inches(0.5), Inches(1.3), Inches(9.0), Inches(3.8)
-    tb = s.shapes.add_textbox(left, top, width, height)
-    tf = tb.text_frame; tf.clear(); tf.word_wrap = True
-
-    content_list = _normalize_content_from_slide(slide)
-    if not content_list:
-        tf.paragraphs[0].text = ""
-        # version badge even if empty
-        add_version_badge(s, meta, prs)
-        return s
-
-    # Lead (erster Eintrag, normaler Absatz)
-    lead = content_list[0]
-    p0 = tf.paragraphs[0]
-    p0.text = lead
-    p0.font.name = "Arial"; p0.font.size = Pt(20)
-    p0.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-
-    # Bullets (alle restlichen Einträge)
-    for item in content_list[1:]:
-        p = tf.add_paragraph()
-        p.text = f"• {item}"
-        p.font.name = "Arial"; p.font.size = Pt(18)
-        p.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-
-    # version badge
-    add_version_badge(s, meta, prs)
-    return s
-
-def add_two_col_text_slide(prs, meta, title: str, left_lines, right_lines,
-                           left_width_in=4.3, gap_in=0.4, synk_logo_path=None, client_logo_path=None):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_logos(s, synk_logo_path, client_logo_path, prs.slide_width, prs.slide_height)
+            s.shapes.add_picture(image, op["x"], op["y"], height=op["h"])
+        except Exception as e:
+            sp.set_error(str(e))
 
-    # Header
-    hdr = s.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9.0), Inches(0.6))
-    hp = hdr.text_frame.paragraphs[0]
-    hp.text = sanitize_text(title)
-    hp.font.name = "Arial"; hp.font.size = Pt(28); hp.font.bold = True
-    hp.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-
-    # Spalten-Geometrie
-    left = Inches(0.5); top = Inches(1.3); height = Inches(3.8)
-    left_w = Inches(left_width_in)
-    right_w = Inches(9.0 - left_width_in - gap_in)
-    right = left + left_w + Inches(gap_in)
-
-    # Linke Spalte (Lead + Bullets)
-    ltb = s.shapes.add_textbox(left, top, left_w, height)
-    ltf = ltb.text_frame; ltf.clear(); ltf.word_wrap = True
-    if left_lines:
-        p0 = ltf.paragraphs[0]
-        p0.text = sanitize_text(left_lines[0])
-        p0.font.name = "Arial"; p0.font.size = Pt(20)
-        p0.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-        for line in left_lines[1:]:
-            p = ltf.add_paragraph(); p.text = f"• {sanitize_text(line)}"
-            p.font.name = "Arial"; p.font.size = Pt(18)
-            p.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-
-    # Rechte Spalte (nur Bullets)
-    rtb = s.shapes.add_textbox(right, top, right_w, height)
-    rtf = rtb.text_frame; rtf.clear(); rtf.word_wrap = True
-    if right_lines:
-        for i, line in enumerate(right_lines):
-            p = rtf.paragraphs[0] if i == 0 else rtf.add_paragraph()
-            p.text = f"• {sanitize_text(line)}"
-            p.font.name = "Arial"; p.font.size = Pt(18)
-            p.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-
-    add_version_badge(s, meta, prs)
-    return s
-
-def add_table_slide(prs, meta, slide, headers: List[str], rows: List[List[str]], synk_logo_path=None, client_logo_path=None):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_logos(s, synk_logo_path, client_logo_path, prs.slide_width, prs.slide_height)
-
-    # header
-    hdr = s.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9.0), Inches(0.6))
-    hp = hdr.text_frame.paragraphs[0]
-    hp.text = sanitize_text(slide.get("title",""))
-    hp.font.name = "Arial"; hp.font.size = Pt(28); hp.font.bold = True
-    hp.font.color.rgb = hex_to_rgb(meta["style"]["colors"]["text"])
-
-    # table (schöne Spaltenbreiten + rechtsbündiger Preis)
-    rows_count = max(1, len(rows)) + 1
-    cols = len(headers)
-    table = s.shapes.add_table(rows_count, cols, Inches(0.5), Inches(1.3), Inches(9.0), Inches(3.8)).table
-
-    # Spaltenbreiten (Position | Hinweis | Preis)
-    if cols == 3:
-        table.columns[0].width = Inches(4.6)
-        table.columns[1].width = Inches(2.6)
-        table.columns[2].width = Inches(1.8)
-
-    accent = hex_to_rgb(meta["style"]["colors"]["accent1"])
-    text_color = hex_to_rgb(meta["style"]["colors"]["text"])
+def _draw_table(s, op: Dict[str, Any]):
+    headers, rows = op["headers"], op["rows"]
+    table = s.shapes.add_table(max(1, len(rows)) + 1, len(headers), op["x"], op["y"], op["w"], op["h"]).table
+    for j, width in enumerate(op.get("columnWidths") or []):
+        table.columns[j].width = width
 
+    hs, cs = op["headerStyle"], op["cellStyle"]
     # Header
     for j, h in enumerate(headers):
         cell = table.cell(0, j)
-        cell.text = sanitize_text(h)
-        cell.fill.solid(); cell.fill.fore_color.rgb = accent
-        ph = cell.text_frame.paragraphs[0]
-        ph.font.name = "Arial"; ph.font.size = Pt(12); ph.font.bold = True
+        cell.text = h
+        cell.fill.solid(); cell.fill.fore_color.rgb = hex_to_rgb(hs["fill"])
+        _style_font(cell.text_frame.paragraphs[0].font, hs)
 
     # Datenzeilen
+    align = op.get("align") or []
     for i, r in enumerate(rows, start=1):
         for j, val in enumerate(r):
             cell = table.cell(i, j)
-            cell.text = sanitize_text("" if val is None else str(val))
+            cell.text = val
             p = cell.text_frame.paragraphs[0]
-            p.font.name = "Arial"; p.font.size = Pt(12)
-            p.font.color.rgb = text_color
-            # Preis-Spalte rechtsbündig
-            if cols >= 3 and j == cols - 1:
-                p.alignment = 2  # 0=left, 1=center, 2=right
-
-    # version badge
-    add_version_badge(s, meta, prs)
+            _style_font(p.font, cs)
+            if j < len(align) and align[j]:
+                p.alignment = _ALIGN[align[j]]
+
+def _draw_chart(s, op: Dict[str, Any]):
+    # chart XML + embedded workbook generated in bulk, see pptx_chart
+    with tracing.span("draw_chart", {"chart.type": op["chartType"], "chart.points": chart_points({"ops": [op]})}):
+        pptx_chart.add_chart(s.shapes, op)
+
+def _draw_background(s, op: Dict[str, Any]):
+    fill = s.background.fill
+    fill.solid()
+    fill.fore_color.rgb = hex_to_rgb(op["color"])
+
+def _draw_placeholder(s, op: Dict[str, Any]):
+    # Text only – font, size, colour and bullets stay as the template defines them
+    try:
+        tf = s.placeholders[op["idx"]].text_frame
+    except KeyError:
+        return
+    for i, para in enumerate(op["paragraphs"]):
+        p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
+        p.text = para["text"]
+
+_DRAW = {
+    "textbox": _draw_textbox,
+    "picture": _draw_picture,
+    "table": _draw_table,
+    "chart": _draw_chart,
+    "background": _draw_background,
+    "placeholder": _draw_placeholder,
+}
+
+def draw_ops(s, ops: List[Dict[str, Any]]):
+    for op in ops:
+        _DRAW[op["op"]](s, op)
     return s
 
-def build_pptx(deck: dict) -> bytes:
-    prs = Presentation()
-    prs.slide_width = Inches(10)
-    prs.slide_height = Inches(5.625)
-    meta = deck["meta"]
-
-    # inject builder version into meta for debugging / headers upstream
-    meta["builder_version"] = BUILDER_VERSION
-
-    # logos
-    synk_logo_path = meta.get("style", {}).get("logo")
-    if synk_logo_path and not os.path.exists(synk_logo_path):
-        for ext in ['.png', '.PNG', '.jpg', '.JPG', '.jpeg', '.JPEG']:
-            base_name = os.path.splitext(synk_logo_path)[0]
-            test_path = base_name + ext
-            if os.path.exists(test_path):
-                synk_logo_path = test_path
-                break
-
-    client_logo_path = meta.get("style", {}).get("clientLogo")
-    if client_logo_path and not os.path.exists(client_logo_path):
-        for ext in ['.png', '.PNG', '.jpg', '.JPG', '.jpeg', '.JPEG']:
-            base_name = os.path.splitext(client_logo_path)[0]
-            test_path = base_name + ext
-            if os.path.exists(test_path):
-                client_logo_path = test_path
-                break
-
-    # Slides
-    for sl in deck["slides"]:
-        t = sl.get("type","")
-        if t == "title":
-            add_title_slide(prs, meta, sl)
-
-        elif t == "agenda":
-            # Map 'items' → content
-            sl2 = dict(sl)
-            if "content" not in sl2:
-                sl2["content"] = sl.get("items") or sl.get("bullets") or []
-            add_text_slide(prs, meta, sl2, synk_logo_path=synk_logo_path, client_logo_path=client_logo_path)
-
-        elif t in ["context","need","understanding","vision","approach","principles",
-                   "architecture","transfer","digital","coaching","target_group","impact",
-                   "about_synk","references","expertise","partners","next_steps","contact"]:
-            # Normalize text/bullets/items/contact/members → content
-            add_text_slide(prs, meta, sl, synk_logo_path=synk_logo_path, client_logo_path=client_logo_path)
-
-        elif t == "modules_overview":
-            headers = ["Modul","Dauer","Fokus"]
-            rows = []
-            for m in (sl.get("modules") or []):
-                rows.append([m.get("title",""), m.get("duration",""), m.get("focus","")])
-            add_table_slide(prs, meta, sl, headers, rows or [["—","—","—"]], synk_logo_path=synk_logo_path, client_logo_path=client_logo_path)
-
-        elif t == "module_detail":
-            add_text_slide(prs, meta, sl, header="Modul", synk_logo_path=synk_logo_path, client_logo_path=client_logo_path)
-
-        elif t == "team":
-            # Linke Spalte: optionaler Intro-Text
-            left_lines = []
-            if isinstance(sl.get("text"), str) and sl["text"].strip():
-                left_lines.append(sl["text"])
-
-            # Rechte Spalte: Members/Trainers als Liste
-            lines = _normalize_content_from_slide(sl)  # holt members/trainers + evtl. text/bullets/items
-            if not lines:
-                lines = ["tbd"]
-
-            add_two_col_text_slide(
-                prs, meta, f"Team - {sl.get('title','')}",
-                left_lines=left_lines,
-                right_lines=lines,
-                synk_logo_path=synk_logo_path,
-                client_logo_path=client_logo_path
-            )
-
-        elif t == "investment":
-            # Prefer structured items [{label,value,note}], fallback zu 'content'
-            items = sl.get("items")
-            headers = ["Position","Hinweis","Preis"]
-            rows = []
-            if isinstance(items, list) and items and isinstance(items[0], dict):
-                for it in items:
-                    rows.append([
-                        it.get("label",""),
-                        it.get("note",""),
-                        it.get("value","")
-                    ])
-            else:
-                content = sl.get("content") or []
-                for c in content:
-                    if isinstance(c, str) and "–" in c:
-                        left,right = c.split("–",1)
-                        rows.append([left.strip(), "", right.strip()])
-                    else:
-                        rows.append([str(c), "", ""])
-            add_table_slide(prs, meta, sl, headers, rows or [["—","","—"]],
-                            synk_logo_path=synk_logo_path, client_logo_path=client_logo_path)
+def _drop_unfilled_placeholders(s, ops: List[Dict[str, Any]]):
+    """Layout placeholders no op wrote to would show "Click to add ..." – remove them."""
+    filled = {op["idx"] for op in ops if op["op"] == "placeholder"}
+    for ph in list(s.placeholders):
+        if ph.placeholder_format.idx not in filled:
+            ph._element.getparent().remove(ph._element)
+
+def add_plan_slide(prs, ops: List[Dict[str, Any]], layout: Optional[str] = None):
+    slide_layout = (pptx_package.find_layout(prs, layout or "Blank")
+                    or pptx_package.find_layout(prs, "Blank") or prs.slide_layouts[0])
+    s = prs.slides.add_slide(slide_layout)
+    draw_ops(s, ops)
+    if slide_layout.placeholders:
+        _drop_unfilled_placeholders(s, ops)
+    return s
+
+def add_plan_layout(prs, name: str, ops: List[Dict[str, Any]]):
+    """Derives layout `name` from Blank and draws `ops` onto it (shared by all slides using it)."""
+    with tracing.span("draw_layout", {"layout.name": name, "layout.ops": len(ops)}):
+        layout = pptx_package.add_layout(prs, name)
+        draw_ops(SimpleNamespace(shapes=pptx_package.layout_shapes(layout), background=layout.background), ops)
+    return layout
 
+@lru_cache(maxsize=1)
+def base_template() -> bytes:
+    """
+    Default template stripped to the Blank layout (no other layouts, thumbnail or
+    printer settings). Built once per process; every render starts from these bytes.
+    """
+    prs = pptx_package.slim_package(Presentation(), keep_layouts=("Blank",))
+    data = _save(prs)
+    logger.info(f"Built slim base template ({len(data)} bytes)")
+    return data
+
+def _apply_properties(prs, props: Dict[str, Any]):
+    """Core properties from the plan only – nothing from the template or the clock."""
+    cp = prs.core_properties
+    cp.title = props.get("title", "")
+    cp.author = props.get("author", "")
+    cp.subject = props.get("subject", "")
+    cp.last_modified_by = "PPTX Maker"
+    cp.comments = f"builder {BUILDER_VERSION}"
+    cp.revision = 1
+    timestamp = datetime.fromisoformat(props["timestamp"])
+    cp.created = timestamp
+    cp.modified = timestamp
+
+def _template_bytes(plan: Dict[str, Any]) -> bytes:
+    """Bytes the presentation for `plan` starts from: master template or slim default."""
+    if not plan.get("template"):
+        return base_template()
+    template = master_template.load()
+    if template is None:
+        logger.warning("Plan was compiled for a master template that is no longer configured")
+        return base_template()
+    if template.fingerprint != plan["template"]:
+        logger.warning(f"Master template changed since the plan was compiled, using {template.fingerprint}")
+    return template.data
+
+def new_presentation(plan: Dict[str, Any]):
+    prs = Presentation(io.BytesIO(_template_bytes(plan)))
+    prs.slide_width = plan["slideWidth"]
+    prs.slide_height = plan["slideHeight"]
+    if plan.get("properties"):
+        _apply_properties(prs, plan["properties"])
+    return prs
+
+# on_slide(index, slide_plan, seconds) – called after each slide is drawn (profiling, progress)
+SlideCallback = Callable[[int, Dict[str, Any], float], None]
+
+def add_library_slides(prs, path: str, memo: Dict[int, object]) -> int:
+    """Splices all slides of a library file into `prs` (parts copied, nothing drawn)."""
+    src = slide_library.load(path)
+    for src_slide in src.slides:
+        pptx_package.copy_slide(prs, src_slide, memo=memo)
+    metrics.incr("library.slides", len(src.slides))
+    return len(src.slides)
+
+def _add_slide(prs, slide_plan: Dict[str, Any], memo: Dict[int, object]):
+    with tracing.span("draw_slide") as sp:
+        if sp.recording:
+            sp.set_attributes(slide_attributes(slide_plan))
+            sp.set_attribute("slide.number", len(prs.slides) + 1)
+        if slide_plan.get("library"):
+            add_library_slides(prs, slide_plan["library"], memo)
+        else:
+            add_plan_slide(prs, slide_plan["ops"], slide_plan.get("layout"))
+
+def _render_presentation(plan: Dict[str, Any], on_slide: Optional[SlideCallback] = None):
+    prs = new_presentation(plan)
+    for name, ops in plan.get("layouts", {}).items():
+        add_plan_layout(prs, name, ops)
+    # shared by all library slides of this render: layouts/images copied once
+    memo: Dict[int, object] = {}
+    if on_slide is None:
+        for i, slide_plan in enumerate(plan["slides"]):
+            deadline.check(f"slide {i + 1}")
+            _add_slide(prs, slide_plan, memo)
+        return prs
+    for i, slide_plan in enumerate(plan["slides"]):
+        deadline.check(f"slide {i + 1}")
+        started = time.perf_counter()
+        _add_slide(prs, slide_plan, memo)
+        on_slide(i, slide_plan, time.perf_counter() - started)
+    return prs
+
+def _deterministic() -> bool:
+    return os.getenv("PPTX_DETERMINISTIC_OUTPUT", "1").lower() not in ("0", "false", "no")
+
+def _save(prs, timestamp: Optional[str] = None) -> bytes:
+    """Serializes `prs`; with a plan timestamp the zip is byte-for-byte reproducible."""
+    # last chance to skip the most expensive step for a request nobody waits for
+    deadline.check("save")
+    deterministic = bool(timestamp) and _deterministic()
+    with tracing.span("save", {"pptx.deterministic": deterministic}) as sp:
+        bio = io.BytesIO()
+        if deterministic:
+            pptx_package.save_deterministic(prs, bio, datetime.fromisoformat(timestamp))
         else:
-            # Unknown types render as simple text slide using normalized content
-            add_text_slide(prs, meta, sl, synk_logo_path=synk_logo_path, client_logo_path=client_logo_path)
+            prs.save(bio)
+        bio.seek(0)
+        data = bio.read()
+        sp.set_attribute("pptx.bytes", len(data))
+        return data
+
+# ---- Parallel execution (process pool, one package assembled at the end) ----
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _parallel_workers(slide_count: int) -> int:
+    """Worker count for a deck of `slide_count` slides (0/1 = serial)."""
+    workers = int(os.getenv("PPTX_PARALLEL_WORKERS", "0"))
+    min_slides = int(os.getenv("PPTX_PARALLEL_MIN_SLIDES", "100"))
+    if workers < 2 or slide_count < max(2, min_slides):
+        return 0
+    return min(workers, slide_count)
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: forking a threaded uvicorn worker is not safe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        metrics.set_gauge("build.parallel_workers", workers)
+        return _pool
+
+def _plan_images(plan: Dict[str, Any]) -> Dict[str, bytes]:
+    """Inline logos referenced by the plan; worker processes do not share logo_store."""
+    images = {}
+    op_lists = list(plan.get("layouts", {}).values()) + [sl["ops"] for sl in plan["slides"]]
+    for ops in op_lists:
+        for op in ops:
+            ref = op.get("image") if op["op"] == "picture" else None
+            if ref and logo_store.is_logo_ref(ref) and ref not in images:
+                data = logo_store.get_logo(ref)
+                if data is not None:
+                    images[ref] = data
+    return images
+
+def _execute_chunk(plan: Dict[str, Any], images: Dict[str, bytes]) -> bytes:
+    """Runs in a pool process: renders a slice of the plan into its own package."""
+    for ref, data in images.items():
+        logo_store.preload(ref, data)
+    return _save(_render_presentation(plan))
+
+def _execute_parallel(plan: Dict[str, Any], workers: int):
+    slides = plan["slides"]
+    size = -(-len(slides) // workers)
+    chunks = [dict(plan, slides=slides[i:i + size]) for i in range(0, len(slides), size)]
+    images = _plan_images(plan)
+
+    pool = _get_pool(workers)
+    futures = [pool.submit(_execute_chunk, chunk, images) for chunk in chunks[1:]]
+    # first chunk renders here and becomes the target package
+    prs = _render_presentation(chunks[0])
+    try:
+        for i, future in enumerate(futures, start=2):
+            pptx_package.append_slides(prs, Presentation(io.BytesIO(deadline.wait_future(future, f"chunk {i}"))))
+    except deadline.RenderCancelled:
+        for future in futures:
+            future.cancel()  # chunks already running in the pool finish there
+        raise
+    return prs
+
+def execute_plan(plan: Dict[str, Any], on_slide: Optional[SlideCallback] = None) -> bytes:
+    """
+    Stage 2: render plan → PPTX bytes.
+    Large decks are split across a process pool when PPTX_PARALLEL_WORKERS is set
+    (not with `on_slide`: slides drawn in other processes cannot report back).
+    """
+    prs = None
+    with memtrack.stage("build"), tracing.span("execute", {"deck.slides": len(plan["slides"])}) as sp:
+        workers = 0 if on_slide else _parallel_workers(len(plan["slides"]))
+        sp.set_attribute("build.parallel_workers", workers)
+        if workers:
+            try:
+                prs = _execute_parallel(plan, workers)
+                metrics.incr("build.parallel_renders")
+            except deadline.RenderCancelled:
+                raise
+            except Exception:
+                logger.exception("Parallel render failed, falling back to serial")
+                metrics.incr("build.parallel_failures")
+        if prs is None:
+            prs = _render_presentation(plan, on_slide)
+    with memtrack.stage("save"):
+        return _save(prs, plan.get("properties", {}).get("timestamp"))
+
+# ---- Slide helpers (plan + draw one slide onto an existing presentation) ----
+
+def add_logos(slide, synk_logo, client_logo, slide_width=None, slide_height=None):
+    # synk_logo / client_logo: file path or "sha256:" reference (see resolve_logo)
+    draw_ops(slide, plan_logos(resolve_logo(synk_logo), resolve_logo(client_logo)))
+
+def add_version_badge(slide, meta, prs=None):
+    """Small version tag in bottom-right corner as visual proof of the deployed builder."""
+    draw_ops(slide, plan_version_badge(meta))
+
+def add_title_slide(prs, meta, slide):
+    return add_plan_slide(prs, plan_title_slide(meta, slide))
+
+def add_text_slide(prs, meta, slide, header="", synk_logo_path=None, client_logo_path=None):
+    return add_plan_slide(prs, plan_text_slide(meta, slide, header=header,
+                                               synk_logo=resolve_logo(synk_logo_path),
+                                               client_logo=resolve_logo(client_logo_path)))
 
-    bio = io.BytesIO()
-    prs.save(bio)
-    bio.seek(0)
-    return bio.read()
+def add_two_col_text_slide(prs, meta, title: str, left_lines, right_lines,
+                           left_width_in=4.3, gap_in=0.4, synk_logo_path=None, client_logo_path=None):
+    return add_plan_slide(prs, plan_two_col_text_slide(meta, title, left_lines, right_lines,
+                                                       left_width_in=left_width_in, gap_in=gap_in,
+                                                       synk_logo=resolve_logo(synk_logo_path),
+                                                       client_logo=resolve_logo(client_logo_path)))
+
+def add_table_slide(prs, meta, slide, headers: List[str], rows: List[List[str]], synk_logo_path=None, client_logo_path=None):
+    return add_plan_slide(prs, plan_table_slide(meta, slide, headers, rows,
+                                                synk_logo=resolve_logo(synk_logo_path),
+                                                client_logo=resolve_logo(client_logo_path)))
+
+def build_pptx(deck: dict, on_slide: Optional[SlideCallback] = None) -> bytes:
+    """Deck (frozen deck_model.Deck or plain dict) → PPTX bytes. `deck` is not modified."""
+    # stages timed separately so the expensive one shows up on its own in /metrics
+    t0 = time.perf_counter()
+    with memtrack.stage("build"):
+        plan = compile_deck(deck)
+    t1 = time.perf_counter()
+    data = execute_plan(plan, on_slide)
+    metrics.observe("build.compile_seconds", t1 - t0)
+    metrics.observe("build.execute_seconds", time.perf_counter() - t1)
+    return data
+
+PptxSource = Union[bytes, str]  # package bytes or path to a .pptx (e.g. a render cache entry)
+
+def merge_decks(sources: List[PptxSource]) -> Tuple[bytes, int]:
+    """
+    Concatenates rendered PPTX packages without re-rendering: slides of every
+    further source are copied into the first one at part level (images deduplicated,
+    rels renumbered, differing layouts brought along). Document properties come
+    from the first source. Returns (pptx_bytes, slide_count).
+    """
+    if not sources:
+        raise ValueError("Nothing to merge")
+    t0 = time.perf_counter()
+    with memtrack.stage("merge"):
+        prs = Presentation(sources[0] if isinstance(sources[0], str) else io.BytesIO(sources[0]))
+        for i, src in enumerate(sources[1:], start=2):
+            deadline.check(f"part {i}")
+            pptx_package.append_slides(prs, Presentation(src if isinstance(src, str) else io.BytesIO(src)))
+    modified = prs.core_properties.modified
+    with memtrack.stage("save"):
+        data = _save(prs, modified.isoformat() if modified else None)
+    metrics.observe("merge.seconds", time.perf_counter() - t0)
+    return data, len(prs.slides)
+
+def _slide_positions(plan: Dict[str, Any]) -> List[int]:
+    """Index of the first rendered slide of every plan slide (library slides expand to several)."""
+    positions, n = [], 0
+    for slide_plan in plan["slides"]:
+        positions.append(n)
+        n += len(slide_library.load(slide_plan["library"]).slides) if slide_plan.get("library") else 1
+    return positions
+
+def _render_variant(plan: Dict[str, Any], base_plan: Dict[str, Any], base_prs) -> Tuple[Any, int]:
+    """
+    Renders `plan`, copying every slide whose plan equals the base plan's slide at
+    the same position from `base_prs` instead of drawing it. Returns (prs, reused).
+    """
+    prs = new_presentation(plan)
+    for name, ops in plan.get("layouts", {}).items():
+        add_plan_layout(prs, name, ops)
+    base_slides = list(base_prs.slides)
+    positions = _slide_positions(base_plan)
+    memo: Dict[int, object] = {}
+    layouts: Dict[Optional[str], object] = {}
+    reused = 0
+    for i, slide_plan in enumerate(plan["slides"]):
+        deadline.check(f"slide {i + 1}")
+        base = base_plan["slides"][i] if i < len(base_plan["slides"]) else None
+        if base is None or slide_plan.get("library") or not (slide_plan is base or slide_plan == base):
+            _add_slide(prs, slide_plan, memo)
+            continue
+        name = slide_plan.get("layout")
+        if name not in layouts:
+            layouts[name] = (pptx_package.find_layout(prs, name or "Blank")
+                             or pptx_package.find_layout(prs, "Blank") or prs.slide_layouts[0])
+        # this variant's own layout (e.g. its Branded layout with the variant's logos)
+        pptx_package.copy_slide(prs, base_slides[positions[i]], layout=layouts[name], memo=memo)
+        reused += 1
+    return prs, reused
+
+def execute_variants(plans: Iterable[Dict[str, Any]]) -> Iterator[Tuple[bytes, int]]:
+    """
+    Stage 2 for several variants of one deck: the first plan is drawn normally and
+    kept; slides of the following plans that did not change against it are copied
+    at part level, only changed slides are drawn. Yields (pptx_bytes, reused_slides)
+    per plan, as soon as each variant is saved.
+    """
+    base_plan = base_prs = None
+    for plan in plans:
+        timestamp = plan.get("properties", {}).get("timestamp")
+        if base_prs is not None and plan.get("template") == base_plan.get("template"):
+            with memtrack.stage("build"):
+                prs, reused = _render_variant(plan, base_plan, base_prs)
+        else:
+            with memtrack.stage("build"):
+                prs, reused = _render_presentation(plan), 0
+            if base_prs is None:
+                base_plan, base_prs = plan, prs
+        with memtrack.stage("save"):
+            data = _save(prs, timestamp)
+        metrics.incr("variants.slides_reused", reused)
+        yield data, reused
 
 def build_base64(deck: dict, filename: str) -> dict:
     data = build_pptx(deck)
@@ -0,0 +1,237 @@
+"""
+Native charts for PPTX Maker (plan op "chart": bar, line and pie).
+
+python-pptx's ChartData creates a Category object per category, formats every
+data point through its XML writer classes and writes the embedded workbook cell
+by cell through xlsxwriter – for series with thousands of points that is most
+of the slide's render time. Here both parts come straight from the plan's lists:
+
+    - chart XML: the category cache is rendered once and shared by all series,
+      each series' number cache is a single str.join over its values
+    - embedded workbook: a minimal SpreadsheetML package (one sheet, inline
+      strings, no styles) built row-wise with str.join; zip entries carry a
+      fixed timestamp, so deterministic output stays byte-for-byte reproducible
+
+ChartSource quacks like a python-pptx ChartData (xml_bytes(), xlsx_blob), so the
+chart part, its workbook part and the graphic frame are still created and
+related by python-pptx (shapes.add_chart).
+"""
+import io
+import re
+import zipfile
+from typing import Any, Dict, Optional, Sequence
+
+from pptx.enum.chart import XL_CHART_TYPE
+
+CHART_TYPES = {
+    "bar": XL_CHART_TYPE.COLUMN_CLUSTERED,
+    "line": XL_CHART_TYPE.LINE,
+    "pie": XL_CHART_TYPE.PIE,
+}
+
+SHEET = "Sheet1"
+
+# XML 1.0 forbids most control characters; sanitize_text keeps them
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
+# 1980-01-01: earliest zip timestamp, same for every render
+_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+_CHART_NS = ('xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" '
+             'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+             'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"')
+_SHEET_NS = ('xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+             'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"')
+
+_WORKBOOK_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook {_SHEET_NS}><sheets><sheet name="{SHEET}" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'),
+}
+
+# fixed axis ids: python-pptx uses random ones, which would break reproducible output
+_CAT_AX, _VAL_AX = 50010, 50020
+
+
+def _esc(text: Any) -> str:
+    return _CONTROL_RE.sub("", str(text)).translate(_ESCAPES)
+
+
+def _num(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+def column_letter(index: int) -> str:
+    """Spreadsheet column of 0-based `index` (0 → A, 26 → AA)."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _solid(color: str) -> str:
+    return f'<a:solidFill><a:srgbClr val="{color.lstrip("#").upper()}"/></a:solidFill>'
+
+
+class ChartSource:
+    """
+    Chart data of one plan op in the shape python-pptx's ChartPart.new expects.
+
+    `categories` are strings, `series` [{"name": str, "values": [float | None]}]
+    with one value per category (None = gap), `colors` the palette series (or pie
+    slices) cycle through.
+    """
+
+    def __init__(self, chart_type: str, categories: Sequence[str], series: Sequence[Dict[str, Any]],
+                 colors: Sequence[str], font: str = "Arial", size: int = 12,
+                 text_color: Optional[str] = None, legend: bool = True):
+        if chart_type not in CHART_TYPES:
+            raise ValueError(f"Unknown chart type {chart_type!r}")
+        self.chart_type = chart_type
+        self.categories = list(categories)
+        # a pie shows one series
+        self.series = list(series[:1] if chart_type == "pie" else series)
+        self.colors = list(colors) or ["#4472C4"]
+        self.font, self.size, self.text_color = font, size, text_color
+        self.legend = legend
+
+    # ---- chart part ----
+
+    def _category_ref(self) -> str:
+        n = len(self.categories)
+        pts = "".join([f'<c:pt idx="{i}"><c:v>{_esc(c)}</c:v></c:pt>' for i, c in enumerate(self.categories)])
+        return (f'<c:cat><c:strRef><c:f>{SHEET}!$A$2:$A${n + 1}</c:f>'
+                f'<c:strCache><c:ptCount val="{n}"/>{pts}</c:strCache></c:strRef></c:cat>')
+
+    def _value_ref(self, col: str, values: Sequence[Optional[float]]) -> str:
+        n = len(self.categories)
+        pts = "".join([f'<c:pt idx="{i}"><c:v>{_num(v)}</c:v></c:pt>'
+                       for i, v in enumerate(values[:n]) if v is not None])
+        return (f'<c:val><c:numRef><c:f>{SHEET}!${col}$2:${col}${n + 1}</c:f>'
+                f'<c:numCache><c:formatCode>General</c:formatCode><c:ptCount val="{n}"/>{pts}'
+                f'</c:numCache></c:numRef></c:val>')
+
+    def _series_xml(self, cat: str) -> str:
+        out = []
+        for i, s in enumerate(self.series):
+            col = column_letter(i + 1)
+            color = self.colors[i % len(self.colors)]
+            head = (f'<c:ser><c:idx val="{i}"/><c:order val="{i}"/>'
+                    f'<c:tx><c:strRef><c:f>{SHEET}!${col}$1</c:f><c:strCache><c:ptCount val="1"/>'
+                    f'<c:pt idx="0"><c:v>{_esc(s["name"])}</c:v></c:pt></c:strCache></c:strRef></c:tx>')
+            if self.chart_type == "bar":
+                body = f'<c:spPr>{_solid(color)}</c:spPr><c:invertIfNegative val="0"/>'
+            elif self.chart_type == "line":
+                body = (f'<c:spPr><a:ln w="28575" cap="rnd">{_solid(color)}<a:round/></a:ln></c:spPr>'
+                        '<c:marker><c:symbol val="none"/></c:marker>')
+            else:
+                body = "".join([f'<c:dPt><c:idx val="{j}"/><c:bubble3D val="0"/><c:spPr>'
+                                f'{_solid(self.colors[j % len(self.colors)])}</c:spPr></c:dPt>'
+                                for j in range(len(self.categories))])
+            tail = '<c:smooth val="0"/></c:ser>' if self.chart_type == "line" else "</c:ser>"
+            out.append(head + body + cat + self._value_ref(col, s["values"]) + tail)
+        return "".join(out)
+
+    def _plot_xml(self) -> str:
+        series = self._series_xml(self._category_ref())
+        axes = f'<c:axId val="{_CAT_AX}"/><c:axId val="{_VAL_AX}"/>'
+        if self.chart_type == "bar":
+            return (f'<c:barChart><c:barDir val="col"/><c:grouping val="clustered"/><c:varyColors val="0"/>'
+                    f'{series}<c:gapWidth val="80"/>{axes}</c:barChart>')
+        if self.chart_type == "line":
+            return (f'<c:lineChart><c:grouping val="standard"/><c:varyColors val="0"/>'
+                    f'{series}<c:marker val="1"/>{axes}</c:lineChart>')
+        return f'<c:pieChart><c:varyColors val="1"/>{series}<c:firstSliceAng val="0"/></c:pieChart>'
+
+    def _axes_xml(self) -> str:
+        if self.chart_type == "pie":
+            return ""
+        common = ('<c:scaling><c:orientation val="minMax"/></c:scaling><c:delete val="0"/>')
+        ticks = ('<c:majorTickMark val="out"/><c:minorTickMark val="none"/><c:tickLblPos val="nextTo"/>')
+        return (f'<c:catAx><c:axId val="{_CAT_AX}"/>{common}<c:axPos val="b"/>'
+                f'<c:numFmt formatCode="General" sourceLinked="1"/>{ticks}<c:crossAx val="{_VAL_AX}"/>'
+                '<c:crosses val="autoZero"/><c:auto val="1"/><c:lblAlgn val="ctr"/><c:lblOffset val="100"/>'
+                '<c:noMultiLvlLbl val="0"/></c:catAx>'
+                f'<c:valAx><c:axId val="{_VAL_AX}"/>{common}<c:axPos val="l"/>'
+                f'<c:majorGridlines><c:spPr><a:ln w="6350">{_solid("#D9D9D9")}</a:ln></c:spPr></c:majorGridlines>'
+                f'<c:numFmt formatCode="General" sourceLinked="1"/>{ticks}<c:crossAx val="{_CAT_AX}"/>'
+                '<c:crosses val="autoZero"/><c:crossBetween val="between"/></c:valAx>')
+
+    def _text_xml(self) -> str:
+        fill = _solid(self.text_color) if self.text_color else ""
+        return (f'<c:txPr><a:bodyPr/><a:lstStyle/><a:p><a:pPr><a:defRPr sz="{int(self.size * 100)}">'
+                f'{fill}<a:latin typeface="{_esc(self.font)}"/></a:defRPr></a:pPr>'
+                '<a:endParaRPr lang="en-US"/></a:p></c:txPr>')
+
+    def xml_bytes(self, chart_type=None) -> bytes:
+        """Chart part XML (`chart_type` is the python-pptx enum add_chart passes through – ignored)."""
+        legend = ('<c:legend><c:legendPos val="b"/><c:overlay val="0"/></c:legend>'
+                  if self.legend else "")
+        xml = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<c:chartSpace {_CHART_NS}>'
+               '<c:date1904 val="0"/><c:roundedCorners val="0"/>'
+               f'<c:chart><c:autoTitleDeleted val="1"/><c:plotArea><c:layout/>{self._plot_xml()}'
+               f'{self._axes_xml()}</c:plotArea>{legend}<c:plotVisOnly val="1"/>'
+               f'<c:dispBlanksAs val="gap"/></c:chart>{self._text_xml()}</c:chartSpace>')
+        return xml.encode("utf-8")
+
+    # ---- embedded workbook ----
+
+    def _sheet_xml(self) -> str:
+        cols = [column_letter(i + 1) for i in range(len(self.series))]
+        header = "".join([f'<c r="{col}1" t="inlineStr"><is><t>{_esc(s["name"])}</t></is></c>'
+                          for col, s in zip(cols, self.series)])
+        columns = [s["values"] for s in self.series]
+        rows = [f'<row r="1">{header}</row>']
+        for i, category in enumerate(self.categories):
+            r = i + 2
+            cells = "".join([f'<c r="{col}{r}"><v>{_num(values[i])}</v></c>'
+                             for col, values in zip(cols, columns) if i < len(values) and values[i] is not None])
+            rows.append(f'<row r="{r}"><c r="A{r}" t="inlineStr"><is><t>{_esc(category)}</t></is></c>{cells}</row>')
+        return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet {_SHEET_NS}>'
+                f'<sheetData>{"".join(rows)}</sheetData></worksheet>')
+
+    @property
+    def xlsx_blob(self) -> bytes:
+        """Embedded workbook holding the chart data (opened by "Edit Data" in PowerPoint)."""
+        bio = io.BytesIO()
+        with zipfile.ZipFile(bio, "w", zipfile.ZIP_DEFLATED) as z:
+            for name, xml in list(_WORKBOOK_PARTS.items()) + [("xl/worksheets/sheet1.xml", self._sheet_xml())]:
+                # level 1: a third of the default's time for a sheet of numbers, ~10% larger
+                z.writestr(zipfile.ZipInfo(name, _ZIP_DATE), xml, compress_type=zipfile.ZIP_DEFLATED, compresslevel=1)
+        return bio.getvalue()
+
+
+def add_chart(shapes, op: Dict[str, Any]):
+    """Draws a plan "chart" op onto `shapes` as a native (editable) chart; returns the graphic frame."""
+    source = ChartSource(op["chartType"], op["categories"], op["series"], op.get("colors") or [],
+                         font=op.get("font", "Arial"), size=op.get("size", 12),
+                         text_color=op.get("textColor"), legend=op.get("legend", True))
+    return shapes.add_chart(CHART_TYPES[source.chart_type], op["x"], op["y"], op["w"], op["h"], source)
+
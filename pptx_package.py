@@ -0,0 +1,313 @@
+"""
+Package-level slide assembly for PPTX Maker.
+
+Copies already rendered slides from one presentation package into another at the
+OPC part / XML level – no re-rendering:
+
+    - slide XML is deep-copied, relationship ids are renumbered in the copy
+    - images are deduplicated by content hash (python-pptx get_or_add_image_part)
+    - other related parts (charts, embedded workbooks, media) are cloned with
+      fresh partnames, recursively
+    - slide ids, presentation rels and [Content_Types].xml are maintained by
+      python-pptx when the target package is saved
+
+Slides whose layout differs from the target's layout of the same name (e.g. a
+"Branded" layout with another client's logo) bring a copy of their layout along.
+
+Also derives new slide layouts from existing ones (add_layout), e.g. a branded
+layout that carries logos once instead of on every slide, strips a package
+down to what the builder uses (slim_package) and writes packages byte-for-byte
+reproducibly (save_deterministic).
+"""
+import copy
+import hashlib
+import io
+import logging
+import re
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from lxml import etree
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.package import PartFactory, XmlPart
+from pptx.opc.serialized import PackageWriter, _ZipPkgWriter
+from pptx.oxml.ns import qn
+from pptx.parts.slide import SlideLayoutPart
+from pptx.shapes.shapetree import SlideShapes
+
+logger = logging.getLogger(__name__)
+
+_R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PARTNAME_NUM_RE = re.compile(r"\d+(\.\w+)$")
+
+
+def find_layout(prs, name: str):
+    """Slide layout with the given name (of any slide master), or None."""
+    for master in prs.slide_masters:
+        for layout in master.slide_layouts:
+            if layout.name == name:
+                return layout
+    return None
+
+
+_RID_VALUE_RE = re.compile(rb'"(rId\d+)"')
+
+
+def _layout_signature(layout) -> str:
+    """
+    Content hash of a layout: shapes and background with rIds replaced by the
+    hash of what they point to. Independent of the layout's name, rId numbering
+    and slide master, so an imported copy matches its source.
+    """
+    targets = {}
+    for rId, rel in layout.part.rels.items():
+        if rel.reltype == RT.SLIDE_MASTER:
+            continue
+        target = rel.target_ref if rel.is_external else hashlib.sha1(rel.target_part.blob).hexdigest()
+        targets[rId.encode("ascii")] = f'"{rel.reltype}:{target}"'.encode("utf-8")
+    h = hashlib.sha1()
+    root = layout.part._element
+    for child in root:
+        for el in (list(child) if child is root.cSld else [child]):
+            xml = etree.tostring(el)
+            h.update(_RID_VALUE_RE.sub(lambda m: targets.get(m.group(1), m.group(0)), xml))
+    return h.hexdigest()
+
+
+def _target_layout(dst_prs, src_layout, memo: Dict[int, object]):
+    """
+    Layout in `dst_prs` that a slide using `src_layout` should be attached to:
+    a layout of the same name (or an imported copy of it) with identical content,
+    otherwise a new copy of `src_layout` (e.g. a "Branded" layout carrying
+    another client's logo).
+    """
+    signature = _layout_signature(src_layout)
+    for master in dst_prs.slide_masters:
+        for layout in master.slide_layouts:
+            if (layout.name == src_layout.name or layout.name.startswith(src_layout.name + " (")) \
+                    and _layout_signature(layout) == signature:
+                return layout
+    layout = _import_layout(dst_prs, src_layout, memo)
+    logger.info(f"Imported layout '{src_layout.name}' as '{layout.name}'")
+    return layout
+
+
+def _unique_layout_name(prs, name: str) -> str:
+    names = {l.name for m in prs.slide_masters for l in m.slide_layouts}
+    n = 2
+    candidate = name
+    while candidate in names:
+        candidate = f"{name} ({n})"
+        n += 1
+    return candidate
+
+
+def _next_layout_id(prs) -> int:
+    """Next free id for a <p:sldLayoutId> (shared id space with <p:sldMasterId>, >= 2^31)."""
+    ids = [2147483647]
+    ids.extend(int(m.get("id")) for m in prs.part._element.xpath("./p:sldMasterIdLst/p:sldMasterId"))
+    for master in prs.slide_masters:
+        ids.extend(int(l.get("id")) for l in master.part._element.xpath("./p:sldLayoutIdLst/p:sldLayoutId"))
+    return max(ids) + 1
+
+
+def add_layout(prs, name: str, base=None):
+    """
+    Adds a copy of layout `base` (default: "Blank") named `name` to the base
+    layout's slide master and returns it. Shapes can be drawn onto it via
+    layout_shapes().
+    """
+    base = base or find_layout(prs, "Blank") or prs.slide_layouts[0]
+    package = base.part.package
+    partname = package.next_partname("/ppt/slideLayouts/slideLayout%d.xml")
+    part = SlideLayoutPart(partname, CT.PML_SLIDE_LAYOUT, package, copy.deepcopy(base.part._element))
+    part._element.cSld.name = name
+    # same targets as the base layout (slide master, images), only rIds may differ
+    mapping = {}
+    for rId, rel in list(base.part.rels.items()):
+        target = rel.target_ref if rel.is_external else rel.target_part
+        new_rId = part.relate_to(target, rel.reltype, is_external=rel.is_external)
+        if new_rId != rId:
+            mapping[rId] = new_rId
+    _rewrite_rids(part._element, mapping)
+    _register_layout(prs, base.slide_master.part, part)
+    return part.slide_layout
+
+
+def _register_layout(prs, master_part, part) -> None:
+    layout_id = _next_layout_id(prs)
+    entry = master_part._element.get_or_add_sldLayoutIdLst()._add_sldLayoutId()
+    entry.set("id", str(layout_id))
+    entry.set(qn("r:id"), master_part.relate_to(part, RT.SLIDE_LAYOUT))
+
+
+def _import_layout(dst_prs, src_layout, memo: Dict[int, object]):
+    """
+    Copies `src_layout` (from another presentation) under the first slide master
+    of `dst_prs`. Images are deduplicated, the source master is not copied.
+    """
+    master_part = dst_prs.slide_masters[0].part
+    package = master_part.package
+    partname = package.next_partname("/ppt/slideLayouts/slideLayout%d.xml")
+    part = SlideLayoutPart(partname, CT.PML_SLIDE_LAYOUT, package, copy.deepcopy(src_layout.part._element))
+    part._element.cSld.name = _unique_layout_name(dst_prs, src_layout.name)
+    part.relate_to(master_part, RT.SLIDE_MASTER)
+    _copy_rels(src_layout.part, part, package, memo, skip=(RT.SLIDE_MASTER,))
+    _register_layout(dst_prs, master_part, part)
+    return part.slide_layout
+
+
+def slim_package(prs, keep_layouts: Iterable[str] = ("Blank",)):
+    """
+    Removes unused slide layouts (all not named in `keep_layouts` and not used by
+    a slide), the thumbnail and printer settings from `prs`. Parts no longer
+    related to anything are not written on save.
+    """
+    keep = set(keep_layouts)
+    for master in prs.slide_masters:
+        for layout in list(master.slide_layouts):
+            if layout.name not in keep and not layout.used_by_slides:
+                master.slide_layouts.remove(layout)
+    package = prs.part.package
+    for rId, rel in list(package._rels.items()):
+        if rel.reltype == RT.THUMBNAIL:
+            package.drop_rel(rId)
+    for rId, rel in list(prs.part.rels.items()):
+        if rel.reltype == RT.PRINTER_SETTINGS:
+            prs.part.drop_rel(rId)
+    return prs
+
+
+def layout_shapes(layout) -> SlideShapes:
+    """Shape collection of `layout` with the add_textbox/add_picture/... API of a slide."""
+    return SlideShapes(layout.shapes._spTree, layout)
+
+
+def _rewrite_rids(element, mapping: Dict[str, str]) -> None:
+    """Replaces r:id / r:embed / r:link / ... attribute values according to `mapping`."""
+    if not mapping:
+        return
+    for el in element.iter():
+        for attr, value in el.attrib.items():
+            if attr.startswith(_R_NS) and value in mapping:
+                el.set(attr, mapping[value])
+
+
+def _clone_part(src_part, dst_package, memo: Dict[int, object]):
+    """Copies a non-image part (chart, workbook, media, ...) into `dst_package`."""
+    cloned = memo.get(id(src_part))
+    if cloned is not None:
+        return cloned
+    tmpl = _PARTNAME_NUM_RE.sub(r"%d\1", str(src_part.partname))
+    partname = dst_package.next_partname(tmpl) if "%d" in tmpl else src_part.partname
+    cloned = PartFactory(partname, src_part.content_type, dst_package, src_part.blob)
+    memo[id(src_part)] = cloned
+    _copy_rels(src_part, cloned, dst_package, memo)
+    return cloned
+
+
+def _copy_rels(src_part, dst_part, dst_package, memo: Dict[int, object],
+               skip: Iterable[str] = ()) -> Dict[str, str]:
+    """
+    Recreates the relationships of `src_part` on `dst_part` and rewrites the
+    rIds in `dst_part`'s XML. Returns the old → new rId mapping.
+    """
+    mapping = {}
+    for rId, rel in list(src_part.rels.items()):
+        if rel.reltype in skip:
+            continue
+        if rel.is_external:
+            new_rId = dst_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        elif rel.reltype == RT.IMAGE:
+            # dedupe by SHA1 against the target package once per source image
+            image_part = memo.get(id(rel.target_part))
+            if image_part is None:
+                image_part = dst_package.get_or_add_image_part(io.BytesIO(rel.target_part.blob))
+                memo[id(rel.target_part)] = image_part
+            new_rId = dst_part.relate_to(image_part, RT.IMAGE)
+        else:
+            new_rId = dst_part.relate_to(_clone_part(rel.target_part, dst_package, memo), rel.reltype)
+        if new_rId != rId:
+            mapping[rId] = new_rId
+    if isinstance(dst_part, XmlPart):
+        _rewrite_rids(dst_part._element, mapping)
+    return mapping
+
+
+def copy_slide(dst_prs, src_slide, layout=None, memo: Optional[Dict[int, object]] = None):
+    """
+    Appends a copy of `src_slide` (from another presentation) to `dst_prs`.
+    Notes slides are not copied.
+    """
+    if memo is None:
+        memo = {}
+    if layout is None:
+        src_layout = src_slide.slide_layout
+        layout = memo.get(id(src_layout))
+        if layout is None:
+            layout = memo[id(src_layout)] = _target_layout(dst_prs, src_layout, memo)
+    dst_slide = dst_prs.slides.add_slide(layout)
+    dst_part = dst_slide.part
+    dst_part._element = copy.deepcopy(src_slide.part._element)
+    dst_part.__dict__.pop("slide", None)  # drop lazyproperty cache bound to the replaced element
+    _copy_rels(src_slide.part, dst_part, dst_part.package, memo,
+               skip=(RT.SLIDE_LAYOUT, RT.NOTES_SLIDE))
+    return dst_part.slide
+
+
+def append_slides(dst_prs, src_prs, indices: Optional[Iterable[int]] = None) -> int:
+    """
+    Appends slides of `src_prs` (all, or those at `indices`) to `dst_prs`.
+    Returns the number of slides copied.
+    """
+    slides = list(src_prs.slides)
+    if indices is not None:
+        slides = [slides[i] for i in indices]
+    memo: Dict[int, object] = {}
+    for src_slide in slides:
+        copy_slide(dst_prs, src_slide, memo=memo)
+    return len(slides)
+
+
+# ---- Deterministic save ----
+
+class _FixedTimeZipWriter(_ZipPkgWriter):
+    """Zip writer that stamps every entry with the same date_time."""
+
+    def __init__(self, pkg_file, date_time: Tuple[int, int, int, int, int, int]):
+        super().__init__(pkg_file)
+        self._date_time = date_time
+
+    def write(self, pack_uri, blob):
+        info = zipfile.ZipInfo(pack_uri.membername, date_time=self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o600 << 16  # what writestr(name, ...) would set
+        self._zipf.writestr(info, blob)
+
+
+class _DeterministicPackageWriter(PackageWriter):
+    """PackageWriter with fixed entry timestamps and parts ordered by partname."""
+
+    def __init__(self, pkg_file, pkg_rels, parts, date_time):
+        super().__init__(pkg_file, pkg_rels, sorted(parts, key=lambda p: str(p.partname)))
+        self._date_time = date_time
+
+    def _write(self):
+        with _FixedTimeZipWriter(self._pkg_file, self._date_time) as phys_writer:
+            self._write_content_types_stream(phys_writer)
+            self._write_pkg_rels(phys_writer)
+            self._write_parts(phys_writer)
+
+
+def save_deterministic(prs, pkg_file, timestamp: datetime) -> None:
+    """
+    Saves `prs` like prs.save(), but reproducibly: all zip entries carry
+    `timestamp` (not the wall clock) and parts are written in partname order,
+    independent of how the package was assembled. Core properties are left to
+    the caller.
+    """
+    date_time = (max(1980, timestamp.year), timestamp.month, timestamp.day,
+                 timestamp.hour, timestamp.minute, timestamp.second)
+    package = prs.part.package
+    _DeterministicPackageWriter(pkg_file, package._rels, tuple(package.iter_parts()), date_time)._write()
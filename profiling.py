@@ -0,0 +1,106 @@
+"""
+On-demand render profiling for PPTX Maker (admin only).
+
+POST /render/profile runs the sanitizer and build_pptx under cProfile and
+returns the hottest functions plus a timing breakdown per slide type – for the
+one customer deck that is slow in production and nowhere else.
+
+Disabled unless PPTX_PROFILING_ENABLED=1 *and* PPTX_ADMIN_TOKEN is set; callers
+must send the token in X-PPTX-Admin-Token. When disabled the endpoint answers
+404 and nothing else in the render path changes, so there is no overhead.
+"""
+import cProfile
+import hmac
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SORT_KEYS = ("cumulative", "tottime", "calls")
+
+# cProfile cannot run in two threads of one process at the same time
+_profile_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return (os.getenv("PPTX_PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+            and bool(os.getenv("PPTX_ADMIN_TOKEN")))
+
+
+def authorized(token: Optional[str]) -> bool:
+    expected = os.getenv("PPTX_ADMIN_TOKEN", "")
+    return bool(expected) and bool(token) and hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+
+class SlideTimer:
+    """on_slide callback for the builder: collects draw time per slide type."""
+
+    def __init__(self):
+        self.by_type: Dict[str, Dict[str, float]] = {}
+        self.slowest: List[Tuple[float, str, str]] = []
+
+    def __call__(self, index: int, slide_plan: Dict[str, Any], seconds: float) -> None:
+        t = self.by_type.setdefault(slide_plan.get("type") or "unknown", {"count": 0, "seconds": 0.0, "max": 0.0})
+        t["count"] += 1
+        t["seconds"] += seconds
+        t["max"] = max(t["max"], seconds)
+        self.slowest.append((seconds, str(slide_plan.get("id")), slide_plan.get("type") or "unknown"))
+
+    def summary(self, slowest: int = 5) -> Dict[str, Any]:
+        types = {
+            name: {"count": int(t["count"]), "seconds": round(t["seconds"], 6),
+                   "avg": round(t["seconds"] / t["count"], 6), "max": round(t["max"], 6)}
+            for name, t in sorted(self.by_type.items(), key=lambda kv: -kv[1]["seconds"])
+        }
+        top = sorted(self.slowest, reverse=True)[:slowest]
+        return {
+            "slide_types": types,
+            "slowest_slides": [{"id": i, "type": t, "seconds": round(s, 6)} for s, i, t in top],
+        }
+
+
+def top_functions(profile: cProfile.Profile, limit: int = 25, sort: str = "cumulative") -> List[Dict[str, Any]]:
+    """Hottest functions of `profile`, sorted by `sort` (one of SORT_KEYS)."""
+    stats = pstats.Stats(profile)
+    key = {"cumulative": 3, "tottime": 2, "calls": 1}[sort]
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append((nc, tt, ct, f"{_short_path(filename)}:{line}({name})", cc))
+    rows.sort(key=lambda r: r[key - 1], reverse=True)
+    return [
+        {"function": fn, "calls": nc, "primitive_calls": cc,
+         "tottime": round(tt, 6), "cumtime": round(ct, 6)}
+        for nc, tt, ct, fn, cc in rows[:limit]
+    ]
+
+
+def _short_path(filename: str) -> str:
+    """site-packages/pptx/... and repo files without the machine-specific prefix."""
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    here = os.path.dirname(os.path.abspath(__file__)) + os.sep
+    return filename[len(here):] if filename.startswith(here) else filename
+
+
+def profile_stages(stages: List[Tuple[str, Callable[[Any], Any]]],
+                   value: Any = None) -> Tuple[List[Any], Dict[str, float], cProfile.Profile]:
+    """
+    Runs the (name, fn) stages in order under one profiler; each fn gets the
+    previous stage's result (the first one gets `value`).
+    Returns (results, seconds per stage, profile).
+    """
+    profile = cProfile.Profile()
+    results, seconds = [], {}
+    with _profile_lock:
+        for name, fn in stages:
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                value = fn(value)
+                results.append(value)
+            finally:
+                profile.disable()
+                seconds[name] = round(time.perf_counter() - started, 6)
+    return results, seconds, profile
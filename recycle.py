@@ -0,0 +1,166 @@
+"""
+Worker recycling for PPTX Maker.
+
+uvicorn workers grow in RSS over thousands of renders (lxml trees live in
+libxml2's heap, fragmentation keeps freed pages resident) until the container
+gets OOM-killed. Instead, each worker watches itself:
+
+    - after every render its RSS and render count are recorded (/metrics:
+      worker.rss_bytes, worker.rss_peak_bytes, worker.renders)
+    - above PPTX_WORKER_MAX_RSS_MB, or after PPTX_WORKER_MAX_RENDERS renders
+      (plus up to 10% jitter, so workers started together do not all recycle
+      at once), the worker starts draining: it answers with "Connection: close",
+      reports "draining" on GET / and sends itself SIGTERM
+    - uvicorn treats SIGTERM as graceful shutdown: it stops accepting
+      connections, lets in-flight requests finish, then exits, and the
+      supervisor (`uvicorn --workers N` / gunicorn) starts a fresh worker
+
+With a single worker and no supervisor the process exits and the container
+runtime has to restart it – run at least two workers when recycling is on.
+Both limits are off by default.
+
+A worker's /metrics die with it, so every recycle is also reported where it
+outlives the process: one structured log line ("worker.recycle {json}") and,
+with PPTX_RECYCLE_LOG set, one JSON line appended to that file (shared by all
+workers; /metrics reads the total back from it).
+"""
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import memtrack
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# max. extra renders (fraction of the limit) before recycling, drawn once per worker
+_JITTER = 0.1
+
+_lock = threading.Lock()
+_renders = 0
+_peak_rss = 0
+_draining: Optional[str] = None
+_jitter = random.random() * _JITTER
+
+
+def max_rss_bytes() -> int:
+    return int(float(os.getenv("PPTX_WORKER_MAX_RSS_MB", "0")) * 1024 * 1024)
+
+
+def max_renders() -> int:
+    limit = int(os.getenv("PPTX_WORKER_MAX_RENDERS", "0"))
+    return limit + int(limit * _jitter) if limit > 0 else 0
+
+
+def _recycle_log() -> Optional[str]:
+    return os.getenv("PPTX_RECYCLE_LOG") or None
+
+
+def _record(event: Dict[str, Any]) -> None:
+    """Reports a recycle outside this process: log line plus PPTX_RECYCLE_LOG."""
+    line = json.dumps(event, sort_keys=True)
+    logger.warning(f"worker.recycle {line}")
+    path = _recycle_log()
+    if not path:
+        return
+    try:
+        # one write() per event with O_APPEND: lines of concurrent workers do not interleave
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, (line + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.warning(f"Could not append to recycle log {path}: {e}")
+
+
+def history() -> List[Dict[str, Any]]:
+    """Recycle events of all workers from PPTX_RECYCLE_LOG (oldest first, empty if unset)."""
+    path = _recycle_log()
+    if not path:
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return []
+    events = []
+    for line in lines:
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue  # torn line after a crash
+    return events
+
+
+def _terminate() -> None:
+    """Graceful shutdown of this worker (uvicorn / gunicorn handle SIGTERM)."""
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def draining() -> Optional[str]:
+    """Reason this worker is being recycled, None while it serves normally."""
+    return _draining
+
+
+def note_render() -> None:
+    """Called after each render: records RSS and starts recycling once a limit is hit."""
+    global _renders, _peak_rss, _draining
+    rss = memtrack.rss_bytes()
+    with _lock:
+        _renders += 1
+        if rss is not None:
+            _peak_rss = max(_peak_rss, rss)
+        renders = _renders
+        metrics.set_gauge("worker.renders", renders)
+        if rss is not None:
+            metrics.set_gauge("worker.rss_bytes", rss)
+            metrics.set_gauge("worker.rss_peak_bytes", _peak_rss)
+        if _draining is not None:
+            return
+        rss_limit, render_limit = max_rss_bytes(), max_renders()
+        if rss_limit and rss is not None and rss > rss_limit:
+            _draining = f"rss {rss // (1024 * 1024)} MB > {rss_limit // (1024 * 1024)} MB"
+        elif render_limit and renders >= render_limit:
+            _draining = f"{renders} renders"
+        else:
+            return
+        peak_rss = _peak_rss
+    metrics.incr("worker.recycles")
+    _record({"time": round(time.time(), 3), "pid": os.getpid(), "reason": _draining,
+             "renders": renders, "rss_bytes": rss, "rss_peak_bytes": peak_rss})
+    _terminate()
+
+
+def status() -> Dict[str, Any]:
+    """Worker section of /metrics."""
+    rss = memtrack.rss_bytes()
+    with _lock:
+        result = {
+            "pid": os.getpid(),
+            "renders": _renders,
+            "rss_bytes": rss,
+            "rss_peak_bytes": max(_peak_rss, rss or 0),
+            "max_rss_bytes": max_rss_bytes() or None,
+            "max_renders": max_renders() or None,
+            "draining": _draining,
+        }
+    if _recycle_log():
+        events = history()
+        result["recycles"] = len(events)
+        result["last_recycle"] = events[-1] if events else None
+    return result
+
+
+def reset() -> None:
+    """Forget counters and draining state (tests)."""
+    global _renders, _peak_rss, _draining
+    with _lock:
+        _renders = 0
+        _peak_rss = 0
+        _draining = None
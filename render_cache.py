@@ -0,0 +1,211 @@
+"""
+Shared on-disk render cache for PPTX Maker.
+
+Content-addressed store: sanitized-deck hash -> PPTX file. All uvicorn workers
+on a host point at the same directory, so a retry hits the cache no matter
+which worker it lands on.
+
+    - writes are atomic (temp file in the same directory + os.replace)
+    - hits are served from disk (streamed from the opened file, or mmap for base64)
+    - eviction keeps the directory under a size budget, least recently
+      accessed files first (access time is set explicitly on every hit)
+    - puts do not scan the directory: each worker tracks the total in memory
+      and only walks it when that estimate passes the budget, or at most every
+      _RESCAN_SECONDS to pick up what other workers wrote; eviction frees down
+      to _LOW_WATERMARK of the budget so a full cache is not walked on every put
+
+Enable with PPTX_RENDER_CACHE_DIR; budget via PPTX_RENDER_CACHE_MAX_MB (default 512).
+"""
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import logo_store
+import master_template
+import metrics
+import slide_library
+from deck_model import Deck, canonical_digest
+from render_plan import BUILDER_VERSION, resolve_logo
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = ".pptx"
+_RESCAN_SECONDS = 60.0
+_LOW_WATERMARK = 0.9
+
+
+def deck_hash(deck: Dict[str, Any]) -> str:
+    """
+    Canonical SHA-256 of a sanitized deck.
+
+    Includes the builder version, a fingerprint (size + mtime) of logo files
+    referenced by path, of library slides and of the master template (plus its
+    layout mapping), so changed assets or a new builder never hit stale entries.
+    """
+    h = hashlib.sha256()
+    h.update(BUILDER_VERSION.encode("utf-8"))
+    # frozen decks hash their content once, plain dicts every time
+    h.update((deck.digest() if isinstance(deck, Deck) else canonical_digest(deck)).encode("ascii"))
+    style = deck.get("meta", {}).get("style", {})
+    for key in ("logo", "clientLogo"):
+        value = style.get(key)
+        if not value or logo_store.is_logo_ref(value) or logo_store.is_inline_logo(value):
+            continue
+        path = resolve_logo(value)
+        if isinstance(path, str):
+            st = os.stat(path)
+            h.update(f"|{key}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    for path in slide_library.deck_paths(deck):
+        h.update(f"|library:{slide_library.fingerprint(path)}".encode("utf-8"))
+    template = master_template.fingerprint()
+    if template:
+        h.update(f"|template:{template}:{os.getenv('PPTX_TEMPLATE_LAYOUTS', '')}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class DiskRenderCache:
+    """Content-addressed PPTX store below `directory`, bounded by `max_bytes`."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+        # estimated directory size and when it was last measured (None: not yet)
+        self._bytes: Optional[int] = None
+        self._scanned = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + _SUFFIX)
+
+    def get_path(self, key: str, count: bool = True) -> Optional[str]:
+        """
+        Path of the cached PPTX for `key` (refreshing its access time) or None.
+        Only render lookups `count` towards render_cache.hits/misses; downloads
+        and merge inputs pass count=False so hit_ratio measures render reuse.
+        """
+        path = self.path_for(key)
+        try:
+            st = os.stat(path)
+            os.utime(path, (time.time(), st.st_mtime))
+        except FileNotFoundError:
+            if count:
+                metrics.incr("render_cache.misses")
+            return None
+        if count:
+            metrics.incr("render_cache.hits")
+        return path
+
+    @contextmanager
+    def open_mmap(self, path: str) -> Iterator[mmap.mmap]:
+        """Read-only memory map of a cached file (no copy into the Python heap)."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mm
+            finally:
+                mm.close()
+
+    def put(self, key: str, data: bytes) -> str:
+        """Atomically stores `data` under `key` and enforces the size budget."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        metrics.incr("render_cache.writes")
+        with self._evict_lock:
+            if self._bytes is not None:
+                self._bytes += len(data) - replaced
+            rescan = (self._bytes is None or self._bytes > self.max_bytes
+                      or time.monotonic() - self._scanned > _RESCAN_SECONDS)
+        if rescan:
+            self.evict()
+        return path
+
+    def _entries(self):
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # removed by another worker
+                yield path, st
+
+    def evict(self) -> int:
+        """
+        Measures the directory and, if it exceeds the budget, deletes least
+        recently accessed files until it is down to _LOW_WATERMARK of it.
+        """
+        with self._evict_lock:
+            entries = list(self._entries())
+            total = sum(st.st_size for _, st in entries)
+            self._bytes, self._scanned = total, time.monotonic()
+            if total <= self.max_bytes:
+                return 0
+            target = int(self.max_bytes * _LOW_WATERMARK)
+            removed = 0
+            for path, st in sorted(entries, key=lambda e: e[1].st_atime):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= st.st_size
+                removed += 1
+            self._bytes = total
+            metrics.incr("render_cache.evictions", removed)
+            logger.info(f"Render cache evicted {removed} file(s), {total} bytes left")
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        entries = list(self._entries())
+        return {
+            "directory": self.directory,
+            "entries": len(entries),
+            "bytes": sum(st.st_size for _, st in entries),
+            "max_bytes": self.max_bytes,
+            "hits": metrics.counter("render_cache.hits"),
+            "misses": metrics.counter("render_cache.misses"),
+            "hit_ratio": metrics.ratio("render_cache.hits", "render_cache.misses"),
+        }
+
+
+_cache: Optional[DiskRenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[DiskRenderCache]:
+    """Process-wide cache configured from the environment, or None when disabled."""
+    global _cache
+    directory = os.getenv("PPTX_RENDER_CACHE_DIR")
+    if not directory:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.directory != os.path.abspath(directory):
+            max_mb = float(os.getenv("PPTX_RENDER_CACHE_MAX_MB", "512"))
+            _cache = DiskRenderCache(directory, int(max_mb * 1024 * 1024))
+            logger.info(f"Render cache enabled at {_cache.directory} ({max_mb:g} MB)")
+        return _cache
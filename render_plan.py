@@ -0,0 +1,666 @@
+"""
+Render Plan for PPTX Maker – stage 1 of the builder.
+
+Compiles a deck into a flat, JSON-serializable list of draw operations per slide
+with resolved geometry (EMU) and styles. Stage 2 (pptx_builder.execute_plan)
+turns the plan into PPTX XML without making any decisions of its own.
+
+Plan format:
+    {
+      "version": BUILDER_VERSION,
+      "slideWidth": 9144000, "slideHeight": 5143500,
+      "properties": {"title": "...", "author": "...", "subject": "<customer>",
+                     "timestamp": "2025-10-14T00:00:00"},
+      "layouts": {"Branded": [<picture / textbox ops drawn once onto the layout>]},
+      "slides": [
+        {"id": "1", "type": "context", "layout": "Branded", "ops": [
+            {"op": "picture",    "image": "<path or sha256: ref>", "x": ..., "y": ..., "h": ...},
+            {"op": "textbox",    "x": ..., "y": ..., "w": ..., "h": ..., "wrap": true,
+                                 "paragraphs": [{"text": "...", "font": "Arial", "size": 28,
+                                                 "bold": true, "color": "#011533"}]},
+            {"op": "table",      "x": ..., "y": ..., "w": ..., "h": ..., "columnWidths": [...],
+                                 "headers": [...], "rows": [[...]], "headerStyle": {...},
+                                 "cellStyle": {...}, "align": [null, null, "right"]},
+            {"op": "chart",      "chartType": "bar" | "line" | "pie", "x": ..., "y": ..., "w": ..., "h": ...,
+                                 "categories": [...], "series": [{"name": "...", "values": [1.5, null]}],
+                                 "colors": [...], "font": "Arial", "size": 12, "textColor": "#011533",
+                                 "legend": true},
+            {"op": "background", "color": "#06206F"}
+        ]}
+      ]
+    }
+
+Logos and version badge of content slides live in the "Branded" layout, so each
+deck carries them once instead of once per slide. Slides without "layout" use Blank.
+
+With a corporate master template (master_template, PPTX_TEMPLATE_PATH) the plan
+also carries "template": <fingerprint>, every slide names one of the template's
+layouts and text goes into its placeholders instead of textboxes:
+            {"op": "placeholder", "idx": 0, "paragraphs": [{"text": "..."}]}
+Placeholders of a slide's layout that no op fills are removed by the executor.
+
+Library slides (slide_library) are not drawn; the executor copies the slides of
+the referenced file:
+        {"id": "9", "type": "library", "ref": "about_synk", "library": "<path>", "ops": []}
+
+Plans are plain dicts/lists/str/int, so they can be cached, diffed (plan_to_json)
+and inspected via POST /render/plan without building a PPTX.
+"""
+import json
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pptx.util import Inches
+
+import logo_store
+import master_template
+import slide_library
+import tracing
+
+# ---- Proof flag / version tag ----
+BUILDER_VERSION = "v2-2025-10-16"
+
+SLIDE_WIDTH = int(Inches(10))
+SLIDE_HEIGHT = int(Inches(5.625))
+
+# Layout holding logos + version badge for all content slides of a deck
+BRANDED_LAYOUT = "Branded"
+
+# Document timestamp when meta.date is missing or unreadable (same as the sanitizer default)
+DEFAULT_DECK_DATE = datetime(2025, 1, 1)
+
+TEXT_SLIDE_TYPES = {
+    "context", "need", "understanding", "vision", "approach", "principles",
+    "architecture", "transfer", "digital", "coaching", "target_group", "impact",
+    "about_synk", "references", "expertise", "partners", "next_steps", "contact"
+}
+
+
+def _emu(inches: float) -> int:
+    return int(Inches(inches))
+
+
+def sanitize_text(text: str) -> str:
+    if text is None:
+        return ""
+    # Replace common problematic Unicode characters
+    replacements = {
+        '\u2013': '-',  # En dash
+        '\u2014': '-',  # Em dash
+        '\u2018': "'",  # Left single quotation mark
+        '\u2019': "'",  # Right single quotation mark
+        '\u201C': '"',  # Left double quotation mark
+        '\u201D': '"',  # Right double quotation mark
+        '\u2026': '...',  # Horizontal ellipsis
+        '\u00A0': ' ',  # Non-breaking space
+    }
+    for u, a in replacements.items():
+        text = text.replace(u, a)
+    text = unicodedata.normalize('NFKD', text)
+    # keep latin-1 safe (avoid odd glyphs)
+    return text.encode('ascii', 'ignore').decode('ascii')
+
+
+def resolve_logo(value) -> Optional[str]:
+    """
+    Resolves a logo field to something the executor can load: an existing file
+    path or a "sha256:" reference into logo_store. Returns None if unusable.
+    """
+    if not value:
+        return None
+    if logo_store.is_logo_ref(value):
+        return value if logo_store.has_logo(value) else None
+    if logo_store.is_inline_logo(value):
+        # deck did not go through the sanitizer (e.g. generate_pptx.py)
+        try:
+            return logo_store.store_logo(value)
+        except logo_store.LogoError:
+            return None
+    return logo_store.server_file(value)
+
+
+def deck_timestamp(value) -> datetime:
+    """
+    Document timestamp from meta.date ("2025-10-14", "2025-10-14T09:30:00",
+    "14.10.2025"). Never the current time, so identical decks save identically.
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            return datetime.fromisoformat(value[:19]).replace(tzinfo=None)
+        except ValueError:
+            pass
+        m = re.match(r'^(\d{1,2})\.(\d{1,2})\.(\d{4})$', value)
+        if m:
+            try:
+                return datetime(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+            except ValueError:
+                pass
+    return DEFAULT_DECK_DATE
+
+
+def plan_properties(meta: dict) -> Dict[str, Any]:
+    """Normalized document properties (docProps/core.xml) for the deck."""
+    return {
+        "title": str(meta.get("deckTitle") or ""),
+        "author": str(meta.get("author") or ""),
+        "subject": str(meta.get("customer") or ""),
+        "timestamp": deck_timestamp(meta.get("date")).isoformat(),
+    }
+
+
+# ---- Op constructors ----
+
+def _para(text: str, size: int, color: Optional[str], bold: bool = False) -> Dict[str, Any]:
+    p = {"text": text, "font": "Arial", "size": size}
+    if bold:
+        p["bold"] = True
+    if color:
+        p["color"] = color
+    return p
+
+
+def _textbox(x: int, y: int, w: int, h: int, paragraphs: List[Dict[str, Any]],
+             wrap: bool = False) -> Dict[str, Any]:
+    op = {"op": "textbox", "x": x, "y": y, "w": w, "h": h, "paragraphs": paragraphs}
+    if wrap:
+        op["wrap"] = True
+    return op
+
+
+def _placeholder(idx: int, texts: List[str]) -> Dict[str, Any]:
+    """Text for placeholder `idx` of the slide layout – styled by the template, not by us."""
+    return {"op": "placeholder", "idx": idx, "paragraphs": [{"text": t} for t in texts]}
+
+
+def plan_logos(synk_logo: Optional[str], client_logo: Optional[str],
+               frame: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    ops = []
+    slide_width, slide_height = frame or (SLIDE_WIDTH, SLIDE_HEIGHT)
+    logo_height = _emu(0.4)
+    # SYNK logo - bottom right corner
+    if synk_logo:
+        logo_width = _emu(1.2)
+        ops.append({"op": "picture", "image": synk_logo,
+                    "x": slide_width - logo_width - _emu(0.3),
+                    "y": slide_height - logo_height - _emu(0.2), "h": logo_height})
+    # Client logo - bottom left corner
+    if client_logo:
+        ops.append({"op": "picture", "image": client_logo,
+                    "x": _emu(0.3),
+                    "y": slide_height - logo_height - _emu(0.2), "h": logo_height})
+    return ops
+
+
+def plan_version_badge(meta: dict, frame: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    """Small version tag in bottom-right corner as visual proof of the deployed builder."""
+    try:
+        text = f"builder {meta.get('builder_version') or BUILDER_VERSION}"
+        # use accent color to be visible but subtle
+        color = meta["style"]["colors"]["accent1"]
+    except Exception:
+        # never fail the render just because of a badge
+        return []
+    # place small, unobtrusive text in bottom-right
+    slide_width, slide_height = frame or (SLIDE_WIDTH, SLIDE_HEIGHT)
+    return [_textbox(slide_width - _emu(2.6), slide_height - _emu(0.55), _emu(2.3), _emu(0.4),
+                     [_para(sanitize_text(text), 9, color)])]
+
+
+def _header(text: str, meta: dict, wrap: bool = False,
+            placeholders: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    if placeholders and "title" in placeholders:
+        return _placeholder(placeholders["title"], [sanitize_text(text)])
+    return _textbox(_emu(0.5), _emu(0.5), _emu(9.0), _emu(0.6),
+                    [_para(sanitize_text(text), 28, meta["style"]["colors"]["text"], bold=True)],
+                    wrap=wrap)
+
+
+def _normalize_content_from_slide(slide: dict, content: Any = None) -> List[str]:
+    """
+    Builds a flat list of strings to render as paragraphs from various schema variants.
+    Priority:
+      - 'content' if present (string or list)
+      - else 'text' (+ optional 'bullets' or 'items')
+      - else 'items' / 'bullets'
+      - for team: 'members'/'trainers' dicts → lines
+      - for contact: 'contact' dict → lines
+    """
+    out: List[str] = []
+
+    # Explicit content wins (`content` overrides slide["content"])
+    c = slide.get("content") if content is None else content
+    if c not in (None, "", []):
+        if isinstance(c, str):
+            out.append(c)
+        elif isinstance(c, list):
+            out.extend([str(x) for x in c if x is not None])
+        return [sanitize_text(x) for x in out]
+
+    # Contact block
+    if "contact" in slide and isinstance(slide["contact"], dict):
+        c = slide["contact"]
+        line1 = " - ".join([x for x in [c.get("name"), c.get("role")] if x])
+        line2 = c.get("email")
+        line3 = c.get("phone")
+        for ln in [line1, line2, line3]:
+            if ln:
+                out.append(ln)
+
+    # Team members / trainers
+    members = []
+    if isinstance(slide.get("members"), list):
+        members = slide["members"]
+    elif isinstance(slide.get("trainers"), list):
+        members = slide["trainers"]
+    if members:
+        for m in members:
+            if isinstance(m, dict):
+                name = m.get("name","")
+                role = m.get("role")
+                focus = m.get("focus")
+                parts = [name]
+                if role:  parts.append(role)
+                if focus: parts.append(f"({focus})")
+                out.append(" – ".join([p for p in parts if p]))
+            else:
+                out.append(str(m))
+
+    # Base text + bullets/items
+    base_text = slide.get("text")
+    if isinstance(base_text, str) and base_text.strip():
+        out.insert(0, base_text)  # lead paragraph first
+
+    for key in ("bullets", "items"):
+        lst = slide.get(key)
+        if isinstance(lst, list) and lst:
+            for x in lst:
+                if isinstance(x, str):
+                    out.append(x)
+                elif isinstance(x, dict):
+                    # e.g., investment items with label/value/note
+                    label = x.get("label")
+                    value = x.get("value")
+                    note  = x.get("note")
+                    if label or value or note:
+                        triple = " – ".join([t for t in [label, value, note] if t])
+                        out.append(triple)
+
+    out = [sanitize_text(x) for x in out if x is not None]
+    return out
+
+
+def plan_branded_layout(meta: dict, synk_logo: Optional[str], client_logo: Optional[str]) -> List[Dict[str, Any]]:
+    """Ops drawn once onto the branded layout: logos below, version badge on top."""
+    return plan_logos(synk_logo, client_logo) + plan_version_badge(meta)
+
+
+# ---- Slide planners ----
+
+def plan_title_slide(meta: dict, slide: dict, placeholders: Optional[Dict[str, int]] = None,
+                     frame: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    if placeholders and "title" in placeholders:
+        # template title layout: its own background, fonts and positions
+        ops = [_placeholder(placeholders["title"], [sanitize_text(slide.get("title",""))])]
+        subtitle = sanitize_text(slide.get("subtitle") or (meta.get("deckSubtitle") or ""))
+        sub_idx = placeholders.get("subtitle", placeholders.get("body"))
+        if subtitle and sub_idx is not None:
+            ops.append(_placeholder(sub_idx, [subtitle]))
+        return ops + plan_version_badge(meta, frame)
+    ops = [
+        # background (primary)
+        {"op": "background", "color": meta["style"]["colors"]["primary"]},
+        # title
+        _textbox(_emu(1), _emu(1.7), SLIDE_WIDTH - _emu(2), _emu(1.2),
+                 [_para(sanitize_text(slide.get("title","")), 44, "#FFFFFF", bold=True)], wrap=True),
+        # subtitle
+        _textbox(_emu(1), _emu(2.7), SLIDE_WIDTH - _emu(2), _emu(0.8),
+                 [_para(sanitize_text(slide.get("subtitle") or (meta.get("deckSubtitle") or "")), 20, "#FFFFFF")],
+                 wrap=True),
+    ]
+    # version badge
+    return ops + plan_version_badge(meta)
+
+
+def plan_text_slide(meta: dict, slide: dict, header: str = "",
+                    synk_logo: Optional[str] = None, client_logo: Optional[str] = None,
+                    badge: bool = True, placeholders: Optional[Dict[str, int]] = None,
+                    frame: Optional[Tuple[int, int]] = None, content: Any = None) -> List[Dict[str, Any]]:
+    ops = plan_logos(synk_logo, client_logo, frame)
+    text_color = meta["style"]["colors"]["text"]
+
+    # header
+    title_text = slide.get("title","")
+    if header:
+        title_text = f"{header} - {title_text}" if title_text else header
+    ops.append(_header(title_text, meta, wrap=True, placeholders=placeholders))
+
+    # body: Lead (erster Eintrag, normaler Absatz) + Bullets (alle restlichen Einträge)
+    content_list = _normalize_content_from_slide(slide, content)
+    if placeholders and "body" in placeholders:
+        # Bullets/Einrückung kommen aus dem Template-Placeholder
+        ops.append(_placeholder(placeholders["body"], content_list))
+        return ops + (plan_version_badge(meta, frame) if badge else [])
+    paragraphs = []
+    if content_list:
+        paragraphs.append(_para(content_list[0], 20, text_color))
+        paragraphs.extend(_para(f"• {item}", 18, text_color) for item in content_list[1:])
+    ops.append(_textbox(_emu(0.5), _emu(1.3), _emu(9.0), _emu(3.8), paragraphs, wrap=True))
+
+    # version badge (even if empty)
+    return ops + (plan_version_badge(meta, frame) if badge else [])
+
+
+def plan_two_col_text_slide(meta: dict, title: str, left_lines, right_lines,
+                            left_width_in=4.3, gap_in=0.4,
+                            synk_logo: Optional[str] = None, client_logo: Optional[str] = None,
+                            badge: bool = True, placeholders: Optional[Dict[str, int]] = None,
+                            frame: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    ops = plan_logos(synk_logo, client_logo, frame)
+    text_color = meta["style"]["colors"]["text"]
+
+    # Header
+    ops.append(_header(title, meta, placeholders=placeholders))
+
+    if placeholders and "body" in placeholders and "body2" in placeholders:
+        ops.append(_placeholder(placeholders["body"], [sanitize_text(line) for line in (left_lines or [])]))
+        ops.append(_placeholder(placeholders["body2"], [sanitize_text(line) for line in (right_lines or [])]))
+        return ops + (plan_version_badge(meta, frame) if badge else [])
+
+    # Spalten-Geometrie
+    left = _emu(0.5); top = _emu(1.3); height = _emu(3.8)
+    left_w = _emu(left_width_in)
+    right_w = _emu(9.0 - left_width_in - gap_in)
+    right = left + left_w + _emu(gap_in)
+
+    # Linke Spalte (Lead + Bullets)
+    left_paras = []
+    if left_lines:
+        left_paras.append(_para(sanitize_text(left_lines[0]), 20, text_color))
+        left_paras.extend(_para(f"• {sanitize_text(line)}", 18, text_color) for line in left_lines[1:])
+    ops.append(_textbox(left, top, left_w, height, left_paras, wrap=True))
+
+    # Rechte Spalte (nur Bullets)
+    right_paras = [_para(f"• {sanitize_text(line)}", 18, text_color) for line in (right_lines or [])]
+    ops.append(_textbox(right, top, right_w, height, right_paras, wrap=True))
+
+    return ops + (plan_version_badge(meta, frame) if badge else [])
+
+
+def plan_table_slide(meta: dict, slide: dict, headers: List[str], rows: List[List[str]],
+                     synk_logo: Optional[str] = None, client_logo: Optional[str] = None,
+                     badge: bool = True, placeholders: Optional[Dict[str, int]] = None,
+                     frame: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    ops = plan_logos(synk_logo, client_logo, frame)
+
+    # header
+    ops.append(_header(slide.get("title",""), meta, placeholders=placeholders))
+
+    # table (schöne Spaltenbreiten + rechtsbündiger Preis)
+    cols = len(headers)
+    ops.append({
+        "op": "table",
+        "x": _emu(0.5), "y": _emu(1.3), "w": _emu(9.0), "h": _emu(3.8),
+        # Spaltenbreiten (Position | Hinweis | Preis)
+        "columnWidths": [_emu(4.6), _emu(2.6), _emu(1.8)] if cols == 3 else None,
+        "headers": [sanitize_text(h) for h in headers],
+        "rows": [[sanitize_text("" if val is None else str(val)) for val in r] for r in rows],
+        "headerStyle": {"font": "Arial", "size": 12, "bold": True,
+                        "fill": meta["style"]["colors"]["accent1"]},
+        "cellStyle": {"font": "Arial", "size": 12, "color": meta["style"]["colors"]["text"]},
+        # Preis-Spalte rechtsbündig
+        "align": [("right" if cols >= 3 and j == cols - 1 else None) for j in range(cols)],
+    })
+
+    # version badge
+    return ops + (plan_version_badge(meta, frame) if badge else [])
+
+
+def plan_chart_slide(meta: dict, slide: dict, synk_logo: Optional[str] = None,
+                     client_logo: Optional[str] = None, badge: bool = True,
+                     placeholders: Optional[Dict[str, int]] = None,
+                     frame: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    """Native chart from a sanitized chart slide (chartType, categories, series)."""
+    ops = plan_logos(synk_logo, client_logo, frame)
+    ops.append(_header(slide.get("title",""), meta, placeholders=placeholders))
+
+    colors = meta["style"]["colors"]
+    series = slide.get("series") or []
+    ops.append({
+        "op": "chart",
+        "chartType": slide.get("chartType", "bar"),
+        "x": _emu(0.5), "y": _emu(1.3), "w": _emu(9.0), "h": _emu(3.8),
+        # thousands of categories: skip the NFKD pass for plain ASCII labels
+        "categories": [c if c.isascii() else sanitize_text(c) for c in slide.get("categories") or []],
+        "series": [{"name": sanitize_text(s["name"]), "values": list(s["values"])} for s in series],
+        "colors": [colors[k] for k in ("primary", "accent1", "accent2", "text") if colors.get(k)],
+        "font": "Arial", "size": 12, "textColor": colors["text"],
+        # one series explains itself through the title, pie slices need their labels
+        "legend": len(series) > 1 or slide.get("chartType") == "pie",
+    })
+    return ops + (plan_version_badge(meta, frame) if badge else [])
+
+
+def slide_kind(slide_type: str) -> str:
+    """Planner used for a slide type: "title", "text", "two_column", "table" or "chart"."""
+    if slide_type == "title":
+        return "title"
+    if slide_type == "chart":
+        return "chart"
+    if slide_type in ("modules_overview", "investment"):
+        return "table"
+    if slide_type == "team":
+        return "two_column"
+    return "text"
+
+
+def plan_slide(meta: dict, sl: dict, synk_logo: Optional[str] = None,
+               client_logo: Optional[str] = None, layout: Optional[str] = None,
+               template: Optional["master_template.MasterTemplate"] = None) -> Dict[str, Any]:
+    """
+    Decides what goes on one slide. Returns {"id", "type", "ops"} (+ "layout").
+    With `layout`, content slides get logos and badge from that layout instead of own shapes.
+    With `template`, the slide uses the template layout mapped to its type and fills
+    that layout's placeholders.
+    """
+    with tracing.span("plan_slide") as sp:
+        planned = _plan_slide(meta, sl, synk_logo, client_logo, layout, template)
+        if sp.recording:
+            sp.set_attributes(slide_attributes(planned))
+            if planned["type"] not in ("title", "library", "chart") and not _table_rows(planned):
+                sp.set_attribute("slide.bullets", len(_normalize_content_from_slide(sl)))
+        return planned
+
+
+def _table_rows(slide_plan: Dict[str, Any]) -> int:
+    return sum(len(op["rows"]) for op in slide_plan.get("ops", ()) if op["op"] == "table")
+
+
+def chart_points(slide_plan: Dict[str, Any]) -> int:
+    """Data points of the slide's charts (a pie shows its first series only)."""
+    return sum(len(op["categories"]) * (1 if op["chartType"] == "pie" else len(op["series"]))
+               for op in slide_plan.get("ops", ()) if op["op"] == "chart")
+
+
+def slide_attributes(slide_plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Trace attributes of a planned slide (type, layout, op / paragraph / table row / chart point counts)."""
+    ops = slide_plan.get("ops", ())
+    return {
+        "slide.id": slide_plan.get("id"),
+        "slide.type": slide_plan.get("type"),
+        "slide.layout": slide_plan.get("layout"),
+        "slide.library": bool(slide_plan.get("library")),
+        "slide.ops": len(ops),
+        "slide.paragraphs": sum(len(op["paragraphs"]) for op in ops if "paragraphs" in op),
+        "slide.rows": _table_rows(slide_plan),
+        "slide.points": chart_points(slide_plan),
+    }
+
+
+def _plan_slide(meta: dict, sl: dict, synk_logo: Optional[str], client_logo: Optional[str],
+                layout: Optional[str], template: Optional["master_template.MasterTemplate"]) -> Dict[str, Any]:
+    t = sl.get("type","")
+    if t == "library":
+        path = slide_library.resolve(sl.get("ref"), sl.get("theme") or meta.get("themeId"))
+        if path:
+            return {"id": sl.get("id"), "type": t, "ref": sl["ref"], "library": path, "ops": []}
+        # not in the library (yet): render as a normal slide of that type
+        t = sl["ref"] if sl.get("ref") in TEXT_SLIDE_TYPES else "text"
+        sl = dict(sl, type=t)
+    title_kw = {}
+    if template is not None:
+        mapped = template.layout_for(t, slide_kind(t))
+        layout = mapped or template.blank_layout
+        title_kw = {"placeholders": template.placeholders(mapped),
+                    "frame": (template.slide_width, template.slide_height)}
+        logos = {"synk_logo": synk_logo, "client_logo": client_logo, **title_kw}
+    elif layout:
+        logos = {"synk_logo": None, "client_logo": None, "badge": False}
+    else:
+        logos = {"synk_logo": synk_logo, "client_logo": client_logo}
+
+    if t == "title":
+        ops = plan_title_slide(meta, sl, **title_kw)
+
+    elif t == "agenda":
+        # Map 'items' → content (without copying the slide)
+        content = sl["content"] if "content" in sl else (sl.get("items") or sl.get("bullets") or [])
+        ops = plan_text_slide(meta, sl, content=content, **logos)
+
+    elif t in TEXT_SLIDE_TYPES:
+        # Normalize text/bullets/items/contact/members → content
+        ops = plan_text_slide(meta, sl, **logos)
+
+    elif t == "modules_overview":
+        headers = ["Modul","Dauer","Fokus"]
+        rows = []
+        for m in (sl.get("modules") or []):
+            rows.append([m.get("title",""), m.get("duration",""), m.get("focus","")])
+        ops = plan_table_slide(meta, sl, headers, rows or [["—","—","—"]], **logos)
+
+    elif t == "module_detail":
+        ops = plan_text_slide(meta, sl, header="Modul", **logos)
+
+    elif t == "team":
+        # Linke Spalte: optionaler Intro-Text
+        left_lines = []
+        if isinstance(sl.get("text"), str) and sl["text"].strip():
+            left_lines.append(sl["text"])
+
+        # Rechte Spalte: Members/Trainers als Liste
+        lines = _normalize_content_from_slide(sl)  # holt members/trainers + evtl. text/bullets/items
+        if not lines:
+            lines = ["tbd"]
+
+        ops = plan_two_col_text_slide(meta, f"Team - {sl.get('title','')}",
+                                      left_lines=left_lines, right_lines=lines, **logos)
+
+    elif t == "chart":
+        ops = plan_chart_slide(meta, sl, **logos)
+
+    elif t == "investment":
+        # Prefer structured items [{label,value,note}], fallback zu 'content'
+        items = sl.get("items")
+        headers = ["Position","Hinweis","Preis"]
+        rows = []
+        if isinstance(items, list) and items and isinstance(items[0], dict):
+            for it in items:
+                rows.append([
+                    it.get("label",""),
+                    it.get("note",""),
+                    it.get("value","")
+                ])
+        else:
+            content = sl.get("content") or []
+            for c in content:
+                if isinstance(c, str) and "–" in c:
+                    left,right = c.split("–",1)
+                    rows.append([left.strip(), "", right.strip()])
+                else:
+                    rows.append([str(c), "", ""])
+        ops = plan_table_slide(meta, sl, headers, rows or [["—","","—"]], **logos)
+
+    else:
+        # Unknown types render as simple text slide using normalized content
+        ops = plan_text_slide(meta, sl, **logos)
+
+    planned = {"id": sl.get("id"), "type": t, "ops": ops}
+    if layout and (t != "title" or template is not None):
+        planned["layout"] = layout
+    return planned
+
+
+def compile_deck(deck: dict, template: Optional["master_template.MasterTemplate"] = None,
+                 memo: Optional[Dict[Any, Any]] = None) -> Dict[str, Any]:
+    """
+    Stage 1: deck → render plan (no python-pptx objects involved).
+    `template` defaults to the configured master template (PPTX_TEMPLATE_PATH), if any.
+    `memo` (shared by several compile_deck calls, e.g. variants of one deck) reuses
+    slide plans of slide objects already planned with the same style object –
+    variants built from one frozen deck share their unchanged slides.
+    """
+    with tracing.span("compile", {"deck.slides": len(deck["slides"])}):
+        return _compile_deck(deck, template, memo)
+
+
+def _compile_deck(deck: dict, template: Optional["master_template.MasterTemplate"],
+                  memo: Optional[Dict[Any, Any]]) -> Dict[str, Any]:
+    meta = deck["meta"]
+
+    # logos (file paths or "sha256:" references)
+    synk_logo = resolve_logo(meta.get("style", {}).get("logo"))
+    client_logo = resolve_logo(meta.get("style", {}).get("clientLogo"))
+
+    if template is None:
+        template = master_template.load()
+    if template is not None:
+        # template layouts carry the branding, logos + badge are drawn per slide
+        branded, layout = [], None
+    else:
+        branded = plan_branded_layout(meta, synk_logo, client_logo)
+        layout = BRANDED_LAYOUT if branded else None
+
+    if memo is None:
+        slides = [plan_slide(meta, sl, synk_logo, client_logo, layout=layout, template=template)
+                  for sl in deck["slides"]]
+    else:
+        slides = _plan_slides_memoized(meta, deck["slides"], synk_logo, client_logo, layout, template, memo)
+
+    plan = {"version": BUILDER_VERSION}
+    if template is not None:
+        plan["template"] = template.fingerprint
+    plan.update({
+        "slideWidth": template.slide_width if template is not None else SLIDE_WIDTH,
+        "slideHeight": template.slide_height if template is not None else SLIDE_HEIGHT,
+        "properties": plan_properties(meta),
+        "layouts": {BRANDED_LAYOUT: branded} if branded else {},
+        "slides": slides,
+    })
+    return plan
+
+
+def _plan_slides_memoized(meta: dict, slides, synk_logo: Optional[str], client_logo: Optional[str],
+                          layout: Optional[str], template, memo: Dict[Any, Any]) -> List[Dict[str, Any]]:
+    style = meta.get("style")
+    fingerprint = template.fingerprint if template is not None else None
+    planned = []
+    for sl in slides:
+        # everything plan_slide reads besides the slide itself
+        key = (id(sl), id(style), meta.get("deckSubtitle"), meta.get("themeId"),
+               synk_logo, client_logo, layout, fingerprint)
+        hit = memo.get(key)
+        if hit is not None and hit[0] is sl and hit[1] is style:
+            planned.append(hit[2])
+            continue
+        slide_plan = plan_slide(meta, sl, synk_logo, client_logo, layout=layout, template=template)
+        # keep sl/style alive so their ids are not reused while the memo exists
+        memo[key] = (sl, style, slide_plan)
+        planned.append(slide_plan)
+    return planned
+
+
+def plan_to_json(plan: Dict[str, Any]) -> str:
+    """Stable, line-diffable JSON representation of a plan."""
+    return json.dumps(plan, indent=2, sort_keys=True, ensure_ascii=False)
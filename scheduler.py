@@ -0,0 +1,142 @@
+"""
+Cost-aware render scheduling for PPTX Maker.
+
+Without a scheduler every request starts rendering as soon as a threadpool
+thread is free, and all renders of a worker share the GIL: a 3-slide deck
+arriving behind three 150-slide decks finishes only after they do. Instead
+each render asks for a slot with its predicted cost (cost_model.estimate):
+
+    - "small" lane: PPTX_SCHED_SLOTS concurrent renders; waiting renders are
+      started shortest predicted job first
+    - "large" lane: decks predicted to take longer than
+      PPTX_SCHED_LARGE_SECONDS get their own PPTX_SCHED_LARGE_SLOTS, so they
+      never occupy the slots small decks need
+
+Waiting renders age: every second spent waiting counts as one second less of
+predicted cost, so a large job behind a stream of small ones still gets its
+turn. Waits poll the request deadline and give up with RenderCancelled.
+Cache hits and single-flight joiners never wait here – only actual builds.
+
+Scheduling caps concurrency, so it is opt-in: with PPTX_SCHED_SLOTS unset or
+0 renders start immediately, as many as the threadpool runs.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# how often waiting renders look at their deadline
+POLL_SECONDS = 0.1
+# predicted seconds a waiting render gains per second waited
+_AGING = 1.0
+
+# (predicted seconds, sequence number, enqueued at)
+Ticket = Tuple[float, int, float]
+
+
+class _Lane:
+    __slots__ = ("name", "active", "waiting")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.active = 0
+        self.waiting: List[Ticket] = []
+
+
+_cond = threading.Condition()
+_lanes: Dict[str, _Lane] = {"small": _Lane("small"), "large": _Lane("large")}
+_seq = itertools.count()
+
+
+def _env(name: str, default: str, cast: Callable[[str], Any]):
+    try:
+        return cast(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid {name}, using {default}")
+        return cast(default)
+
+
+def slots(lane: str) -> int:
+    if lane == "large":
+        return max(1, _env("PPTX_SCHED_LARGE_SLOTS", "1", int))
+    return _env("PPTX_SCHED_SLOTS", "0", int)
+
+
+def large_seconds() -> float:
+    return _env("PPTX_SCHED_LARGE_SECONDS", "1.0", float)
+
+
+def enabled() -> bool:
+    return slots("small") > 0
+
+
+def lane_for(seconds: float) -> str:
+    """Lane of a render predicted to take `seconds`."""
+    return "large" if seconds > large_seconds() else "small"
+
+
+def _next(lane: _Lane, now: float) -> Ticket:
+    """Waiting render to start next: lowest predicted cost after aging, then arrival order."""
+    return min(lane.waiting, key=lambda t: (t[0] - _AGING * (now - t[2]), t[1]))
+
+
+def _publish(lane: _Lane) -> None:
+    metrics.set_gauge(f"scheduler.{lane.name}.active", lane.active)
+    metrics.set_gauge(f"scheduler.{lane.name}.queued", len(lane.waiting))
+
+
+@contextmanager
+def slot(seconds: float, poll: Optional[Callable[[], None]] = None) -> Iterator[str]:
+    """
+    Holds a render slot for a render predicted to take `seconds`; yields the lane.
+    `poll` is called while waiting (e.g. deadline.check) and may raise to give up.
+    """
+    if not enabled():
+        yield "off"
+        return
+    lane = _lanes[lane_for(seconds)]
+    enqueued = time.monotonic()
+    ticket: Ticket = (seconds, next(_seq), enqueued)
+    with tracing.span("schedule", {"sched.lane": lane.name, "cost.predicted_seconds": seconds}), _cond:
+        lane.waiting.append(ticket)
+        try:
+            while lane.active >= slots(lane.name) or _next(lane, time.monotonic()) is not ticket:
+                _publish(lane)
+                _cond.wait(POLL_SECONDS)
+                if poll is not None:
+                    poll()
+        finally:
+            lane.waiting.remove(ticket)
+            # the next waiter may be eligible now (or we gave up)
+            _cond.notify_all()
+        lane.active += 1
+        _publish(lane)
+    waited = time.monotonic() - enqueued
+    metrics.incr(f"scheduler.{lane.name}.renders")
+    metrics.observe(f"scheduler.{lane.name}.wait_seconds", waited)
+    try:
+        yield lane.name
+    finally:
+        with _cond:
+            lane.active -= 1
+            _publish(lane)
+            _cond.notify_all()
+
+
+def status() -> Dict[str, Any]:
+    """Scheduler section of /metrics."""
+    with _cond:
+        return {
+            "enabled": enabled(),
+            "large_seconds": large_seconds(),
+            "lanes": {name: {"slots": slots(name), "active": lane.active, "queued": len(lane.waiting)}
+                      for name, lane in _lanes.items()},
+        }
@@ -0,0 +1,97 @@
+"""
+Single-flight execution for PPTX Maker.
+
+Concurrent calls with the same key (canonical deck hash) share one execution:
+the first caller runs the function, callers arriving while it runs wait for
+and receive its result (or its exception). Nothing is kept after the call
+finishes – that is the render cache's job.
+
+Power Automate retries and parallel flow branches often send byte-identical
+decks within the same second; with single-flight they cost one render.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent executions per key (thread-based, one per process)."""
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], poll: Optional[Callable[[], None]] = None,
+           retry_on: Tuple[Type[BaseException], ...] = ()) -> Tuple[Any, bool]:
+        """
+        Runs `fn` once for all concurrent callers with `key`.
+        Returns (result, shared) – shared is True for callers that joined another's call.
+
+        poll:     called periodically while waiting for another caller's run; an
+                  exception from it abandons the wait (e.g. the waiter's own deadline)
+        retry_on: errors of another caller's run that are that caller's business
+                  (e.g. its deadline) – waiters start a new run instead of failing
+        """
+        while True:
+            result = self._do(key, fn, poll, retry_on)
+            if result is not None:
+                return result
+
+    def _do(self, key, fn, poll, retry_on) -> Optional[Tuple[Any, bool]]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+            metrics.set_gauge(f"{self.name}.inflight", len(self._calls))
+
+        if not leader:
+            metrics.incr(f"{self.name}.joined")
+            if poll is None:
+                call.done.wait()
+            else:
+                while not call.done.wait(0.1):
+                    poll()
+            if call.error is not None:
+                if retry_on and isinstance(call.error, retry_on):
+                    metrics.incr(f"{self.name}.retried")
+                    return None
+                raise call.error
+            return call.result, True
+
+        metrics.incr(f"{self.name}.leaders")
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                metrics.set_gauge(f"{self.name}.inflight", len(self._calls))
+            if call.waiters:
+                logger.info(f"{self.name}: {call.waiters} request(s) shared render {key[:12]}")
+            call.done.set()
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,100 @@
+"""
+Pre-rendered boilerplate slides for PPTX Maker.
+
+Slides that are the same in almost every deck (about_synk, references, partners,
+expertise, contact) can live in a library of finished .pptx files instead of
+being rebuilt from text on every request:
+
+    PPTX_LIBRARY_DIR/
+        about_synk.pptx          # default version
+        acme/about_synk.pptx     # version for theme "acme" (meta.style.themeId)
+
+A deck references them with {"type": "library", "ref": "about_synk"} (optionally
+"theme": "<id>" to override the deck's theme). All slides of the file are spliced
+into the output at part level (pptx_package.copy_slide) – no drawing at all.
+Library files are parsed once per process and re-read when they change; a ref
+without a file falls back to a normal text slide.
+"""
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from pptx import Presentation
+
+logger = logging.getLogger(__name__)
+
+_NAME_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+def library_dir() -> Optional[str]:
+    return os.getenv("PPTX_LIBRARY_DIR") or None
+
+
+def is_valid_ref(ref: object) -> bool:
+    return isinstance(ref, str) and bool(_NAME_RE.match(ref))
+
+
+def resolve(ref: Any, theme: Any = None) -> Optional[str]:
+    """Path of the library file for `ref` (theme-specific first), or None."""
+    directory = library_dir()
+    if not directory or not is_valid_ref(ref):
+        return None
+    candidates = []
+    if is_valid_ref(theme):
+        candidates.append(os.path.join(directory, theme, ref + ".pptx"))
+    candidates.append(os.path.join(directory, ref + ".pptx"))
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _stat(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def fingerprint(path: str) -> str:
+    mtime_ns, size = _stat(path)
+    return f"{path}:{mtime_ns}:{size}"
+
+
+def deck_paths(deck: Dict[str, Any]) -> List[str]:
+    """Library files a sanitized deck splices in (in slide order)."""
+    if not library_dir():
+        return []
+    theme = deck.get("meta", {}).get("themeId")
+    paths = []
+    for sl in deck.get("slides", []):
+        if isinstance(sl, dict) and sl.get("type") == "library":
+            path = resolve(sl.get("ref"), sl.get("theme") or theme)
+            if path:
+                paths.append(path)
+    return paths
+
+
+_lock = threading.Lock()
+# path -> ((mtime_ns, size), Presentation)
+_loaded: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+
+def load(path: str):
+    """Parsed library file (shared, read-only), re-parsed when the file changes."""
+    current = _stat(path)
+    entry = _loaded.get(path)
+    if entry is not None and entry[0] == current:
+        return entry[1]
+    with _lock:
+        entry = _loaded.get(path)
+        if entry is None or entry[0] != current:
+            prs = Presentation(path)
+            entry = _loaded[path] = (current, prs)
+            logger.info(f"Loaded library file {path} ({len(prs.slides)} slide(s))")
+        return entry[1]
+
+
+def clear_cache() -> None:
+    with _lock:
+        _loaded.clear()
@@ -0,0 +1,166 @@
+"""
+Tests for native chart slides (type "chart": bar, line, pie).
+Runs in-process, no server needed.
+"""
+import io
+import re
+import sys
+import time
+import zipfile
+
+from pptx import Presentation
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE
+
+import cost_model
+import pptx_builder
+import pptx_chart
+import testutil
+from json_sanitizer import sanitize_chart, validate_and_sanitize
+from render_plan import compile_deck
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _payload(*slides):
+    return {"deck": {"meta": {"customer": "Charts", "deckTitle": "Impact", "date": "2025-10-14",
+                              "style": {"colors": {"primary": "#112233", "accent1": "#445566"}}},
+                     "slides": [{"id": "1", "type": "title", "title": "Impact"}] + list(slides)}}
+
+
+def _charts(data):
+    prs = Presentation(io.BytesIO(data))
+    return [sh.chart for sl in prs.slides for sh in sl.shapes if sh.has_chart]
+
+
+def _sheet(data, index=1):
+    """Cells of the embedded workbook of chart `index` as {"B2": "1.5", "A2": "Q1", ...}."""
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        xlsx = z.read(f"ppt/embeddings/Microsoft_Excel_Sheet{index}.xlsx")
+    with zipfile.ZipFile(io.BytesIO(xlsx)) as z:
+        xml = z.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    return dict(re.findall(r'<c r="([A-Z]+\d+)"[^>]*>(?:<is><t>|<v>)([^<]*)<', xml))
+
+
+def _cached_points(prs):
+    """(categories, values per series) from the chart XML caches (python-pptx's accessors are O(n) per point)."""
+    space = prs.slides[0].shapes[0].chart._chartSpace
+    categories = [v.text for v in space.xpath("./c:chart//c:ser[1]/c:cat//c:v")]
+    values = [[float(v.text) for v in ser.xpath("./c:val//c:v")] for ser in space.xpath("./c:chart//c:ser")]
+    return categories, values
+
+
+def test_sanitizer_normalizes_chart_data():
+    chart = sanitize_chart({"id": "x", "chartType": "Column", "categories": ["Q1", "Q2", None],
+                            "series": [{"name": "2024", "values": [1, "2.5", "n/a", 4]},
+                                       {"values": [float("nan"), 3]}]})
+    assert chart == {"chartType": "bar", "categories": ["Q1", "Q2", ""],
+                     "series": [{"name": "2024", "values": [1.0, 2.5, None]},
+                                {"name": "Series 2", "values": [None, 3.0, None]}]}
+    # shorthand: one series as a plain list, or top-level "values"
+    assert sanitize_chart({"chartType": "pie", "series": [60, 40]})["series"] == [
+        {"name": "Series 1", "values": [60.0, 40.0]}]
+    line = sanitize_chart({"title": "Trend", "chartType": "sparkline", "values": [1, 2, 3]})
+    assert line["chartType"] == "bar" and line["categories"] == ["1", "2", "3"]
+    assert line["series"][0]["name"] == "Trend"
+    assert sanitize_chart({"series": [{"values": ["x", None]}]}) is None
+
+    deck = validate_and_sanitize(_payload(
+        {"id": "2", "type": "chart", "title": "Big", "chartType": "line", "values": list(range(3000))},
+        {"id": "3", "type": "chart", "title": "Numbers as text", "content": ["Umsatz +12%"]}))
+    big, fallback = deck["slides"][1], deck["slides"][2]
+    # chart data is not cut to PPTX_MAX_ITEMS (500), only to PPTX_MAX_CHART_POINTS
+    assert len(big["categories"]) == len(big["series"][0]["values"]) == 3000
+    assert fallback["type"] == "text" and fallback["content"] == ["Umsatz +12%"]
+    with testutil.env(PPTX_MAX_CHART_POINTS=100):
+        deck = validate_and_sanitize(_payload({"id": "2", "type": "chart", "values": list(range(3000))}))
+        assert len(deck["slides"][1]["series"][0]["values"]) == 100
+    print("✓ Sanitizer normalizes chart data")
+
+
+def test_renders_native_editable_charts():
+    payload = _payload(
+        {"id": "2", "type": "chart", "title": "Umsatz", "categories": ["Q1", "Q2", "Q3"],
+         "series": [{"name": "2024", "values": [1, 2.5, None]}, {"name": "2025", "values": [2, 3, 4]}]},
+        {"id": "3", "type": "chart", "title": "Trend", "chartType": "line", "values": [5, 6, 7, 8]},
+        {"id": "4", "type": "chart", "title": "Mix <&>", "chartType": "pie", "categories": ["A & B", "C"],
+         "series": [{"name": "Anteil", "values": [60, 40]}, {"name": "ignored", "values": [1, 1]}]})
+    deck = validate_and_sanitize(payload)
+    plan = compile_deck(deck)
+    op = [o for o in plan["slides"][1]["ops"] if o["op"] == "chart"][0]
+    assert op["colors"][:2] == ["#112233", "#445566"] and op["legend"]
+
+    data = pptx_builder.build_pptx(deck)
+    bar, line, pie = _charts(data)
+    assert bar.chart_type == XL_CHART_TYPE.COLUMN_CLUSTERED
+    assert list(bar.plots[0].categories) == ["Q1", "Q2", "Q3"]
+    assert [s.name for s in bar.series] == ["2024", "2025"]
+    assert list(bar.series[0].values) == [1.0, 2.5, None] and list(bar.series[1].values) == [2.0, 3.0, 4.0]
+    assert line.chart_type == XL_CHART_TYPE.LINE and not line.has_legend
+    assert pie.chart_type == XL_CHART_TYPE.PIE and len(pie.series) == 1 and pie.has_legend
+    assert list(pie.plots[0].categories) == ["A & B", "C"]
+
+    # "Edit Data" opens a workbook holding the same numbers
+    cells = _sheet(data, 1)
+    assert (cells["A2"], cells["B1"], cells["B3"], cells["C4"]) == ("Q1", "2024", "2.5", "4")
+    assert "B4" not in cells  # gap stays empty
+    assert pptx_builder.build_pptx(deck) == data
+    print("✓ Bar, line and pie charts render as native charts")
+
+
+def test_bulk_chart_matches_python_pptx_and_is_faster():
+    n = 1000
+    categories = [f"Tag {i}" for i in range(n)]
+    series = [{"name": f"Serie {k}", "values": [float((i * 7 + k) % 97) for i in range(n)]} for k in range(3)]
+    op = {"op": "chart", "chartType": "line", "x": 0, "y": 0, "w": 8229600, "h": 3474720,
+          "categories": categories, "series": series, "colors": ["#06206F"]}
+
+    def render(draw):
+        prs = Presentation()
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        started = time.perf_counter()
+        draw(slide.shapes)
+        return prs, time.perf_counter() - started
+
+    def python_pptx(shapes):
+        chart_data = CategoryChartData()
+        chart_data.categories = categories
+        for s in series:
+            chart_data.add_series(s["name"], s["values"])
+        shapes.add_chart(XL_CHART_TYPE.LINE, 0, 0, 8229600, 3474720, chart_data)
+
+    reference, reference_seconds = render(python_pptx)
+    bulk, bulk_seconds = render(lambda shapes: pptx_chart.add_chart(shapes, op))
+    categories_cached, values_cached = _cached_points(bulk)
+    assert (categories_cached, values_cached) == _cached_points(reference)
+    assert categories_cached == categories and values_cached == [s["values"] for s in series]
+    # timing depends on the machine: only a coarse check here (typically 5x and more)
+    assert bulk_seconds * 2 < reference_seconds, (bulk_seconds, reference_seconds)
+
+    deck = validate_and_sanitize(_payload({"id": "2", "type": "chart", "chartType": "line",
+                                           "categories": categories, "series": series}))
+    assert cost_model.features(deck)["points"] == 3 * n
+    print(f"✓ Bulk chart: {bulk_seconds * 1000:.0f} ms vs. {reference_seconds * 1000:.0f} ms with ChartData")
+
+
+def test_merged_decks_keep_their_charts():
+    one = pptx_builder.build_pptx(validate_and_sanitize(_payload(
+        {"id": "2", "type": "chart", "title": "A", "values": [1, 2, 3]})))
+    two = pptx_builder.build_pptx(validate_and_sanitize(_payload(
+        {"id": "2", "type": "chart", "title": "B", "chartType": "pie", "values": [4, 5]})))
+    merged, slides = pptx_builder.merge_decks([one, two])
+    assert slides == 4
+    charts = _charts(merged)
+    assert [list(c.series[0].values) for c in charts] == [[1.0, 2.0, 3.0], [4.0, 5.0]]
+    assert _sheet(merged, 2)["B3"] == "5"
+    print("✓ Merged decks keep their charts and workbooks")
+
+
+if __name__ == "__main__":
+    test_sanitizer_normalizes_chart_data()
+    test_renders_native_editable_charts()
+    test_bulk_chart_matches_python_pptx_and_is_faster()
+    test_merged_decks_keep_their_charts()
+    print("\n✅ All tests passed!")
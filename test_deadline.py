@@ -0,0 +1,187 @@
+"""
+Tests for per-request render deadlines and cooperative cancellation.
+Runs in-process, no server needed.
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+
+from fastapi import HTTPException
+
+import app
+import deadline
+import metrics
+import testutil
+from deadline import Deadline, DeadlineMiddleware, RenderCancelled
+from json_sanitizer import validate_and_sanitize
+from pptx_builder import build_pptx
+from singleflight import SingleFlight
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Deadline", "deckTitle": "Too Late"},
+        "slides": [{"id": "1", "type": "title", "title": "Hello"}] + [
+            {"id": str(i), "type": "context", "title": f"Slide {i}", "content": ["a", "b"]}
+            for i in range(2, 21)
+        ]
+    }
+}
+
+
+def test_builder_stops_between_slides():
+    deck = validate_and_sanitize(PAYLOAD)
+    drawn = []
+    dl = Deadline(None)
+
+    def on_slide(i, slide_plan, seconds):
+        drawn.append(i)
+        if i == 2:
+            dl.cancel()  # client went away while slide 3 was drawn
+
+    before = metrics.counter("deadline.disconnected")
+    with deadline.use(dl):
+        try:
+            build_pptx(deck, on_slide=on_slide)
+            assert False, "cancelled render must not finish"
+        except RenderCancelled as e:
+            assert e.status_code == 499 and e.stage == "slide 4"
+    assert drawn == [0, 1, 2]
+    assert metrics.counter("deadline.disconnected") == before + 1
+
+    # without a deadline (scripts, tests, pool processes) nothing changes
+    assert build_pptx(deck)
+    print("✓ Builder stops between slides")
+
+
+def test_endpoints_answer_504_and_499():
+    for dl, status in ((Deadline(0.000001), 504), (Deadline(None), 499)):
+        if status == 499:
+            dl.cancel()
+        time.sleep(0.001)
+        for endpoint in (app.render_pptx, app.render_pptx_bytes):
+            with deadline.use(dl):
+                try:
+                    endpoint(PAYLOAD)
+                    assert False, "expired request must not render"
+                except HTTPException as e:
+                    assert e.status_code == status
+    assert deadline.from_header("50").remaining() <= 0.05
+    assert deadline.from_header("999999999").remaining() <= deadline.default_seconds()
+    assert deadline.from_header("soon").remaining() > 1
+    print("✓ Endpoints answer 504 / 499")
+
+
+def test_waiters_retry_after_leaders_deadline():
+    flight = SingleFlight("test_deadline_flight")
+    started, calls = threading.Event(), []
+
+    def leader_build():
+        calls.append("leader")
+        started.set()
+        time.sleep(0.2)
+        raise RenderCancelled("exceeded", "slide 1")
+
+    def waiter_build():
+        calls.append("waiter")
+        return b"done"
+
+    results = {}
+
+    def leader():
+        try:
+            flight.do("k", leader_build, poll=deadline.check, retry_on=(RenderCancelled,))
+        except RenderCancelled:
+            results["leader"] = "cancelled"
+
+    t = threading.Thread(target=leader)
+    t.start()
+    started.wait()
+    results["waiter"] = flight.do("k", waiter_build, poll=deadline.check, retry_on=(RenderCancelled,))
+    t.join()
+    assert results == {"leader": "cancelled", "waiter": (b"done", False)}
+    assert calls == ["leader", "waiter"]
+
+    # a waiter with its own (expired) deadline stops waiting
+    gate = threading.Event()
+    t = threading.Thread(target=lambda: flight.do("j", lambda: gate.wait(2)))
+    t.start()
+    time.sleep(0.05)
+    try:
+        with deadline.use(Deadline(0.2)):
+            flight.do("j", lambda: None, poll=deadline.check)
+        assert False, "waiter must give up"
+    except RenderCancelled:
+        pass
+    gate.set()
+    t.join()
+    print("✓ Waiters retry after another request's deadline")
+
+
+def test_middleware_cancels_on_disconnect():
+    seen = {}
+
+    async def inner(scope, receive, send):
+        message = await receive()
+        seen["body"] = json.loads(message["body"])
+        dl = deadline.current()
+        seen["remaining"] = dl.remaining()
+        for _ in range(50):
+            if dl.reason:
+                break
+            await asyncio.sleep(0.01)
+        seen["reason"] = dl.reason
+
+    async def run():
+        messages = [{"type": "http.request", "body": b'{"a":', "more_body": True},
+                    {"type": "http.request", "body": b' 1}', "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+
+        scope = {"type": "http", "method": "POST", "path": "/render",
+                 "headers": [(b"x-pptx-deadline-ms", b"3000")]}
+        await DeadlineMiddleware(inner)(scope, receive, None)
+
+    asyncio.run(run())
+    assert seen["body"] == {"a": 1}
+    assert 0 < seen["remaining"] <= 3
+    assert seen["reason"] == "disconnected"
+    print("✓ Middleware cancels on client disconnect")
+
+
+def test_middleware_caps_the_pre_read():
+    sent, pulled = [], []
+
+    async def inner(scope, receive, send):
+        raise AssertionError("app must not run for an oversized body")
+
+    async def receive():
+        pulled.append(1)
+        return {"type": "http.request", "body": b"x" * 400, "more_body": True}  # endless chunked body
+
+    async def send(message):
+        sent.append(message)
+
+    with testutil.env(PPTX_MAX_BODY_BYTES=1000):
+        scope = {"type": "http", "method": "POST", "path": "/render", "headers": []}
+        asyncio.run(DeadlineMiddleware(inner)(scope, receive, send))
+    assert sent[0]["status"] == 413 and len(pulled) == 3
+    print("✓ Middleware stops reading at the body limit")
+
+
+if __name__ == "__main__":
+    test_builder_stops_between_slides()
+    test_endpoints_answer_504_and_499()
+    test_waiters_retry_after_leaders_deadline()
+    test_middleware_cancels_on_disconnect()
+    test_middleware_caps_the_pre_read()
+    print("\n✅ All tests passed!")
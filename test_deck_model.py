@@ -0,0 +1,103 @@
+"""
+Tests for the immutable deck model shared by sanitizer and builder.
+Runs in-process, no server needed.
+"""
+import copy
+import json
+import pickle
+import sys
+import threading
+
+import render_cache
+from deck_model import Deck, FrozenError, freeze_deck, thaw
+from json_sanitizer import validate_and_sanitize
+from pptx_builder import build_pptx
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Frozen", "deckTitle": "Immutable"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b"]},
+            {"id": "3", "type": "investment", "title": "Invest",
+             "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]},
+        ]
+    }
+}
+
+
+def _raises(fn):
+    try:
+        fn()
+    except FrozenError:
+        return True
+    return False
+
+
+def test_sanitized_deck_is_immutable():
+    deck = validate_and_sanitize(PAYLOAD)
+    assert isinstance(deck, Deck)
+    assert _raises(lambda: deck["meta"].__setitem__("customer", "x"))
+    assert _raises(lambda: deck["meta"]["style"]["colors"].update(primary="#000000"))
+    assert _raises(lambda: deck["slides"].append({}))
+    assert _raises(lambda: deck["slides"][1]["items"].pop())
+    assert _raises(lambda: deck.setdefault("x", 1))
+    # still reads like plain JSON data
+    assert isinstance(deck["slides"], list) and isinstance(deck["slides"][0], dict)
+    assert json.loads(json.dumps(deck)) == thaw(deck)
+    assert copy.deepcopy(deck) is deck
+    restored = pickle.loads(pickle.dumps(deck))
+    assert isinstance(restored, Deck) and restored == deck
+    print("✓ Sanitized deck is immutable")
+
+
+def test_strings_are_interned():
+    a = validate_and_sanitize(json.loads(json.dumps(PAYLOAD)))
+    b = validate_and_sanitize(json.loads(json.dumps(PAYLOAD)))
+    assert a["slides"][1]["type"] is b["slides"][1]["type"]
+    assert a["meta"]["style"]["colors"]["primary"] is b["meta"]["style"]["colors"]["primary"]
+    assert a["slides"][2]["items"][0]["label"] is b["slides"][2]["items"][0]["label"]
+    print("✓ Repeated strings are interned")
+
+
+def test_builder_does_not_mutate_and_hash_is_cached():
+    plain = thaw(validate_and_sanitize(PAYLOAD))
+    before = json.dumps(plain, sort_keys=True)
+    build_pptx(plain)
+    assert json.dumps(plain, sort_keys=True) == before
+
+    deck = freeze_deck(plain)
+    assert render_cache.deck_hash(deck) == render_cache.deck_hash(plain)
+    assert deck._digest == deck.digest()
+    print("✓ Builder does not mutate its input, hash cached")
+
+
+def test_concurrent_renders_of_one_deck():
+    deck = validate_and_sanitize(PAYLOAD)
+    results, errors = [], []
+
+    def render():
+        try:
+            results.append(build_pptx(deck))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=render) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and len(set(results)) == 1
+    print("✓ One deck rendered concurrently")
+
+
+if __name__ == "__main__":
+    test_sanitized_deck_is_immutable()
+    test_strings_are_interned()
+    test_builder_does_not_mutate_and_hash_is_cached()
+    test_concurrent_renders_of_one_deck()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,91 @@
+"""
+Tests for deterministic PPTX output: identical input → identical bytes,
+across processes and independent of the wall clock.
+"""
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import time
+import zipfile
+
+from pptx import Presentation
+
+from json_sanitizer import validate_and_sanitize
+from pptx_builder import build_pptx
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "ACME", "deckTitle": "Stable", "author": "Jane Doe", "date": "2025-10-14"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello", "subtitle": "World"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b"]},
+            {"id": "3", "type": "investment", "title": "Invest",
+             "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]},
+        ]
+    }
+}
+
+_RENDER = (
+    "import hashlib, logging; logging.disable(logging.CRITICAL)\n"
+    "from test_deterministic import PAYLOAD\n"
+    "from json_sanitizer import validate_and_sanitize\n"
+    "from pptx_builder import build_pptx\n"
+    "print(hashlib.sha256(build_pptx(validate_and_sanitize(PAYLOAD))).hexdigest())\n"
+)
+
+
+def _render_in_subprocess():
+    out = subprocess.run([sys.executable, "-c", _RENDER], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True).stdout
+    return out.strip().splitlines()[-1]
+
+
+def test_identical_bytes_across_processes():
+    """Two processes, rendered more than one zip time tick (2 s) apart, produce the same bytes"""
+    first = _render_in_subprocess()
+    time.sleep(2.1)
+    second = _render_in_subprocess()
+    local = hashlib.sha256(build_pptx(validate_and_sanitize(PAYLOAD))).hexdigest()
+    assert first == second == local
+    print("✓ Identical bytes across processes")
+
+
+def test_timestamps_follow_meta_date():
+    """Zip entries and core properties carry meta.date, not the current time"""
+    data = build_pptx(validate_and_sanitize(PAYLOAD))
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        assert {i.date_time for i in z.infolist()} == {(2025, 10, 14, 0, 0, 0)}
+        names = z.namelist()
+    assert names[:2] == ["[Content_Types].xml", "_rels/.rels"]
+    parts = [n for n in names[2:] if not n.endswith(".rels")]
+    assert parts == sorted(parts)
+
+    cp = Presentation(io.BytesIO(data)).core_properties
+    assert cp.created == cp.modified and cp.created.date().isoformat() == "2025-10-14"
+    assert (cp.title, cp.author, cp.subject, cp.revision) == ("Stable", "Jane Doe", "ACME", 1)
+    assert cp.last_modified_by == "PPTX Maker"
+    print("✓ Timestamps follow meta.date")
+
+
+def test_different_date_changes_output():
+    """Another meta.date (also as DD.MM.YYYY) yields other bytes and its zip timestamps"""
+    payload = {"deck": dict(PAYLOAD["deck"], meta=dict(PAYLOAD["deck"]["meta"], date="14.11.2025"))}
+    a = build_pptx(validate_and_sanitize(PAYLOAD))
+    b = build_pptx(validate_and_sanitize(payload))
+    assert a != b
+    with zipfile.ZipFile(io.BytesIO(b)) as z:
+        assert z.infolist()[0].date_time == (2025, 11, 14, 0, 0, 0)
+    print("✓ meta.date drives the timestamp")
+
+
+if __name__ == "__main__":
+    test_identical_bytes_across_processes()
+    test_timestamps_follow_meta_date()
+    test_different_date_changes_output()
+    print("\n✅ All tests passed!")
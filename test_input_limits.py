@@ -0,0 +1,121 @@
+"""
+Tests for the input complexity limits (input_limits + sanitizer + app).
+Adversarial payloads must be cut or rejected in bounded time.
+Runs in-process, no server needed.
+"""
+import asyncio
+import sys
+import time
+
+from fastapi import HTTPException
+
+import app
+import input_limits
+import testutil
+from input_limits import InputLimitError, bound_value
+from json_sanitizer import validate_and_sanitize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _payload(slides, meta=None):
+    return {"deck": {"meta": meta or {"customer": "Limits"}, "slides": slides}}
+
+
+def _nested(levels):
+    value = "bottom"
+    for _ in range(levels):
+        value = [value]
+    return value
+
+
+def _status(payload):
+    try:
+        app.render_pptx(payload)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_long_strings_and_lists_are_cut():
+    started = time.perf_counter()
+    deck = validate_and_sanitize(_payload([
+        {"id": "1", "type": "context", "title": "x" * 5_000_000, "content": ["bullet"] * 1_000_000},
+    ]))
+    assert len(deck["slides"][0]["title"]) == 10000
+    assert len(deck["slides"][0]["content"]) == 500
+    assert app.render_pptx(_payload([{"id": "1", "type": "context", "content": ["y" * 5_000_000]}]))["file"]
+    assert time.perf_counter() - started < 15
+    # logos are bounded by logo_store, not cut here
+    logo = "data:image/png;base64," + "A" * 20000
+    assert bound_value({"clientLogo": logo})["clientLogo"] == logo
+    print("✓ Long strings and lists are cut")
+
+
+def test_adversarial_payloads_are_rejected_fast():
+    corpus = [
+        (_payload([{"id": str(i), "type": "text", "title": "t"} for i in range(10_000)]), 413),
+        (_payload([{"id": "1", "type": "text", "content": _nested(100_000)}]), 400),
+        (_payload([{"id": "1", "type": "text"}], meta={"style": _nested(50)}), 400),
+        (_payload([{"id": "1", "type": "table", "rows": [[str(c) for c in range(500)]] * 500}]), 413),
+        (_payload([{"id": "1", "type": "text", **{f"k{i}": i for i in range(250_000)}}]), 413),
+    ]
+    for payload, status in corpus:
+        started = time.perf_counter()
+        assert _status(payload) == status
+        assert time.perf_counter() - started < 5
+    with testutil.env(PPTX_MAX_SLIDES=2):
+        assert _status(_payload([{"id": str(i), "type": "text"} for i in range(3)])) == 413
+    try:
+        bound_value([[[[1]]]], depth=14)
+        assert False, "depth limit must apply"
+    except InputLimitError as e:
+        assert e.status_code == 400
+    print("✓ Adversarial payloads are rejected fast")
+
+
+def _post(chunks, headers=()):
+    """POST /render through the full ASGI stack; returns (status, body, bytes the app pulled)."""
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": "/render", "raw_path": b"/render", "root_path": "", "query_string": b"",
+             "server": ("testserver", 80), "client": ("127.0.0.1", 1234),
+             "headers": [(b"content-type", b"application/json")] + list(headers)}
+    pending = [{"type": "http.request", "body": c, "more_body": i < len(chunks) - 1} for i, c in enumerate(chunks)]
+    pulled, sent = [], []
+
+    async def receive():
+        if pending:
+            pulled.append(pending[0]["body"])
+            return pending.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app.app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body"), len(pulled)
+
+
+def test_body_size_middleware():
+    with testutil.env(PPTX_MAX_BODY_BYTES=1000):
+        assert input_limits.max_body_bytes() == 1000
+        # Content-Length over the limit: rejected before anything is read
+        status, body, pulled = _post([b"{}"], [(b"content-length", b"1001")])
+        assert status == 413 and b"1000 bytes" in body and pulled == 0
+        # chunked: counted while reading, the rest of the body is never pulled
+        status, body, pulled = _post([b" " * 400] * 10)
+        assert status == 413 and b"1000 bytes" in body and pulled == 3
+        # below the limit the request passes (an empty deck renders a default title slide)
+        status, _, pulled = _post([b'{"deck": ', b'{}}'])
+        assert status == 200 and pulled == 2
+    print("✓ Oversized bodies are rejected before parsing, with and without Content-Length")
+
+
+if __name__ == "__main__":
+    test_long_strings_and_lists_are_cut()
+    test_adversarial_payloads_are_rejected_fast()
+    test_body_size_middleware()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,62 @@
+"""
+Tests for the load-test harness helpers (corpus loading, statistics).
+Runs in-process, no server needed.
+"""
+import json
+import sys
+
+from loadtest import SAMPLE_PAYLOAD, load_corpus, percentile, summarize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_percentile_nearest_rank():
+    """p50/p95/p99 use nearest rank on the sorted samples"""
+    values = [float(v) for v in range(100, 0, -1)]  # 1..100, unsorted
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) is None
+    print("✓ Percentiles")
+
+
+def test_corpus_formats(tmp_path):
+    """Payloads, bare decks and requests.jsonl-style lines are accepted"""
+    (tmp_path / "one.json").write_text(json.dumps(SAMPLE_PAYLOAD), encoding="utf-8")
+    lines = [
+        {"request_id": "r1", "title": "t", "body": json.dumps(SAMPLE_PAYLOAD)},
+        SAMPLE_PAYLOAD["deck"],
+        {"request_id": "r2", "title": "t", "body": "just prose, no deck"},
+    ]
+    (tmp_path / "many.jsonl").write_text("\n".join(json.dumps(l) for l in lines) + "\n", encoding="utf-8")
+
+    payloads, skipped = load_corpus([str(tmp_path)])
+    assert len(payloads) == 3 and skipped == 1
+    assert all(p["deck"]["meta"]["deckTitle"] == "Load Test" for p in payloads)
+    print("✓ Corpus formats")
+
+
+def test_summarize_counts_errors():
+    """Non-2xx responses and transport errors count towards the error rate"""
+    samples = [{"latency": 0.1, "status": 200, "bytes": 10, "error": None}] * 8
+    samples += [{"latency": 0.5, "status": 500, "bytes": 0, "error": None},
+                {"latency": 2.0, "status": 0, "bytes": 0, "error": "TimeoutError: "}]
+    st = summarize(samples, elapsed=2.0)
+    assert st["requests"] == 10 and st["errors"] == 2 and st["error_rate"] == 0.2
+    assert st["throughput_rps"] == 5.0
+    assert st["latency_ms"]["p50"] == 100.0 and st["latency_ms"]["max"] == 2000.0
+    assert st["status"] == {"200": 8, "500": 1, "error": 1}
+    print("✓ Summary statistics")
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+    test_percentile_nearest_rank()
+    with tempfile.TemporaryDirectory() as d:
+        test_corpus_formats(pathlib.Path(d))
+    test_summarize_counts_errors()
+    print("\n✅ All tests passed!")
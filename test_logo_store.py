@@ -0,0 +1,152 @@
+"""
+Tests for inline logos (base64 / data URI / "sha256:" references).
+Runs in-process, no server needed.
+"""
+import base64
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import zipfile
+
+from PIL import Image
+
+import logo_store
+import testutil
+from json_sanitizer import validate_and_sanitize
+from pptx_builder import build_pptx
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _png_bytes(width=120, height=40, color=(255, 0, 0)):
+    bio = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def _payload(client_logo):
+    return {
+        "deck": {
+            "meta": {
+                "customer": "Logo Test",
+                "deckTitle": "Inline Logos",
+                "style": {"clientLogo": client_logo}
+            },
+            "slides": [
+                {"id": "1", "type": "title", "title": "Hello"},
+                {"id": "2", "type": "context", "title": "Context", "content": ["a", "b"]}
+            ]
+        }
+    }
+
+
+def _media_count(pptx_bytes):
+    with zipfile.ZipFile(io.BytesIO(pptx_bytes)) as z:
+        return len([n for n in z.namelist() if n.startswith("ppt/media/")])
+
+
+def test_data_uri_is_replaced_by_hash_ref():
+    """Data URI logos are decoded once and replaced by their content hash"""
+    logo_store.clear_cache()
+    raw = _png_bytes()
+    data_uri = "data:image/png;base64," + base64.b64encode(raw).decode("ascii")
+
+    deck = validate_and_sanitize(_payload(data_uri))
+    ref = deck["meta"]["style"]["clientLogo"]
+    assert ref == "sha256:" + hashlib.sha256(raw).hexdigest()
+    assert logo_store.has_logo(ref)
+    assert _media_count(build_pptx(deck)) == 1
+    print("✓ Data URI stored as", ref[:20])
+
+
+def test_raw_base64_and_ref_reuse():
+    """Raw base64 works, and the hash alone can be sent afterwards"""
+    logo_store.clear_cache()
+    raw = _png_bytes(color=(0, 128, 0))
+    ref = validate_and_sanitize(_payload(base64.b64encode(raw).decode("ascii")))["meta"]["style"]["clientLogo"]
+
+    deck = validate_and_sanitize(_payload(ref))
+    assert deck["meta"]["style"]["clientLogo"] == ref
+    assert _media_count(build_pptx(deck)) == 1
+    print("✓ Hash reference reused")
+
+
+def test_unknown_ref_is_rejected():
+    """Unknown hash references fail validation so the client resends the data"""
+    logo_store.clear_cache()
+    try:
+        validate_and_sanitize(_payload("sha256:" + "0" * 64))
+    except ValueError as e:
+        print(f"✓ Correctly rejected: {e}")
+        return
+    raise AssertionError("unknown logo reference was accepted")
+
+
+def test_invalid_inline_logo_is_dropped():
+    """Broken inline data renders without the logo instead of failing"""
+    logo_store.clear_cache()
+    bogus = "data:image/png;base64," + base64.b64encode(b"not an image" * 10).decode("ascii")
+    deck = validate_and_sanitize(_payload(bogus))
+    assert deck["meta"]["style"]["clientLogo"] == ""
+    print("✓ Invalid logo dropped")
+
+
+def test_large_logo_is_downscaled():
+    """Oversized logos are stored downscaled to LOGO_MAX_HEIGHT_PX"""
+    logo_store.clear_cache()
+    bio = io.BytesIO()
+    Image.effect_noise((900, 600), 64).save(bio, format="PNG")
+    ref = logo_store.store_logo(base64.b64encode(bio.getvalue()).decode("ascii"))
+    with Image.open(io.BytesIO(logo_store.get_logo(ref))) as img:
+        assert img.height == logo_store.LOGO_MAX_HEIGHT_PX
+    print("✓ Large logo downscaled")
+
+
+def test_long_path_without_extension_stays_a_path(tmp_path):
+    """A long extension-less path looks like base64 but is kept as a server-side file"""
+    logo_store.clear_cache()
+    directory = tmp_path / ("logos" + "x" * 60) / "customers"
+    directory.mkdir(parents=True)
+    (directory / "acme.png").write_bytes(_png_bytes())
+    path = str(directory / "acme")
+    assert len(path) >= logo_store._MIN_RAW_BASE64_LEN and not os.path.splitext(path)[1]
+    assert not logo_store.is_inline_logo(path)
+
+    deck = validate_and_sanitize(_payload(path))
+    assert deck["meta"]["style"]["clientLogo"] == path
+    assert _media_count(build_pptx(deck)) == 1
+    print("✓ Long path without extension kept")
+
+
+def test_refs_are_shared_through_logo_dir(tmp_path):
+    """With PPTX_LOGO_DIR a ref stored by one worker resolves in another"""
+    with testutil.env(PPTX_LOGO_DIR=tmp_path):
+        logo_store.clear_cache()
+        raw = _png_bytes(color=(0, 0, 255))
+        ref = logo_store.store_logo(base64.b64encode(raw).decode("ascii"))
+        assert [n for n in os.listdir(tmp_path) if n.endswith(".tmp")] == []
+
+        logo_store.clear_cache()  # another worker / a restart
+        deck = validate_and_sanitize(_payload(ref))
+        assert deck["meta"]["style"]["clientLogo"] == ref
+        assert _media_count(build_pptx(deck)) == 1
+    logo_store.clear_cache()
+    assert not logo_store.has_logo(ref)
+    print("✓ Ref shared through PPTX_LOGO_DIR")
+
+
+if __name__ == "__main__":
+    import pathlib
+    test_data_uri_is_replaced_by_hash_ref()
+    test_raw_base64_and_ref_reuse()
+    test_unknown_ref_is_rejected()
+    test_invalid_inline_logo_is_dropped()
+    test_large_logo_is_downscaled()
+    for test in (test_long_path_without_extension_stays_a_path, test_refs_are_shared_through_logo_dir):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("ALL TESTS COMPLETED")
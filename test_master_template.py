@@ -0,0 +1,119 @@
+"""
+Tests for building decks on a corporate master template (PPTX_TEMPLATE_PATH).
+Runs in-process, no server needed.
+"""
+import io
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from pptx import Presentation
+from pptx.util import Inches
+
+import master_template
+import render_cache
+import testutil
+from json_sanitizer import validate_and_sanitize
+from pptx_builder import build_pptx, compile_deck
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Corp", "deckTitle": "On Brand", "date": "2025-10-14"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello", "subtitle": "World"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b", "c"]},
+            {"id": "3", "type": "team", "title": "Crew", "text": "Intro", "members": [{"name": "Ann"}]},
+            {"id": "4", "type": "investment", "title": "Invest",
+             "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]},
+        ]
+    }
+}
+
+
+def _write_template(path, width_in=13.333):
+    """python-pptx default layouts, 16:9, with one sample slide that must not end up in decks"""
+    prs = Presentation()
+    prs.slide_width = Inches(width_in)
+    prs.slide_height = Inches(7.5)
+    sample = prs.slides.add_slide(prs.slide_layouts[0])
+    sample.shapes.title.text = "SAMPLE SLIDE"
+    prs.save(path)
+
+
+@contextmanager
+def _template(**env):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corporate.pptx")
+        _write_template(path)
+        with testutil.env(**env, PPTX_TEMPLATE_PATH=path):
+            master_template.clear_cache()
+            try:
+                yield path
+            finally:
+                master_template.clear_cache()
+
+
+def test_placeholders_filled_on_mapped_layouts():
+    with _template():
+        data = build_pptx(validate_and_sanitize(PAYLOAD))
+    prs = Presentation(io.BytesIO(data))
+    assert prs.slide_width == Inches(13.333)
+    assert len(prs.slides) == 4
+    assert [s.slide_layout.name for s in prs.slides] == ["Title Slide", "Title and Content", "Two Content", "Title Only"]
+
+    texts = [[sh.text_frame.text for sh in s.placeholders] for s in prs.slides]
+    assert texts[0] == ["Hello", "World"]
+    assert texts[1] == ["Agenda", "a\nb\nc"]
+    assert texts[2][0] == "Team - Crew" and texts[2][1] == "Intro"
+    assert texts[3] == ["Invest"]
+    assert all(t for slide in texts for t in slide), "unfilled placeholders must be removed"
+    assert any(sh.has_table for sh in prs.slides[3].shapes)
+    assert "SAMPLE SLIDE" not in str([sh.text_frame.text for s in prs.slides for sh in s.shapes if sh.has_text_frame])
+    print("✓ Placeholders filled on mapped layouts")
+
+
+def test_layout_mapping_and_fallback():
+    """Custom mapping by slide type; unknown layout names fall back to Blank drawing"""
+    mapping = '{"agenda": "Section Header", "investment": "Does Not Exist", "table": "Nope"}'
+    with _template(PPTX_TEMPLATE_LAYOUTS=mapping):
+        plan = compile_deck(validate_and_sanitize(PAYLOAD))
+        data = build_pptx(validate_and_sanitize(PAYLOAD))
+    layouts = [sl["layout"] for sl in plan["slides"]]
+    assert layouts == ["Title Slide", "Section Header", "Two Content", "Blank"]
+    assert plan["layouts"] == {}
+    assert not [op for op in plan["slides"][3]["ops"] if op["op"] == "placeholder"]
+    prs = Presentation(io.BytesIO(data))
+    assert prs.slides[1].slide_layout.name == "Section Header"
+    assert prs.slides[3].shapes[0].text_frame.text == "Invest"
+    print("✓ Layout mapping and fallback")
+
+
+def test_template_reloaded_when_file_changes():
+    deck = validate_and_sanitize(PAYLOAD)
+    plain_hash = render_cache.deck_hash(deck)
+    with _template() as path:
+        first = master_template.load()
+        assert master_template.load() is first
+        templated_hash = render_cache.deck_hash(deck)
+
+        _write_template(path, width_in=10)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        second = master_template.load()
+        assert second is not first and second.slide_width == Inches(10)
+        assert render_cache.deck_hash(deck) not in (plain_hash, templated_hash)
+    assert plain_hash != templated_hash
+    assert "template" not in compile_deck(deck)
+    print("✓ Template reloaded when the file changes")
+
+
+if __name__ == "__main__":
+    test_placeholders_filled_on_mapped_layouts()
+    test_layout_mapping_and_fallback()
+    test_template_reloaded_when_file_changes()
+    print("\n✅ All tests passed!")
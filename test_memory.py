@@ -0,0 +1,100 @@
+"""
+Memory tests: per-request accounting and peak-memory budgets for a 200-slide
+reference deck. Runs in-process (RSS check in a fresh subprocess), no server needed.
+"""
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+import memtrack
+import metrics
+import testutil
+from json_sanitizer import validate_and_sanitize
+from pptx_builder import build_pptx
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Budgets for the reference deck. Measured: ~0.9 MB Python heap peak,
+# ~15 MB RSS growth in a fresh process. Raise only with a reason in the commit.
+PEAK_BUDGET_BYTES = 4 * 1024 * 1024
+RSS_BUDGET_BYTES = 48 * 1024 * 1024
+
+_SLIDE_TYPES = [
+    {"type": "agenda", "title": "Agenda", "items": ["Ziele", "Vorgehen", "Zeitplan", "Budget"]},
+    {"type": "context", "title": "Kontext", "text": "Ausgangslage " * 20,
+     "bullets": ["Punkt %d" % i for i in range(6)]},
+    {"type": "modules_overview", "title": "Module",
+     "modules": [{"title": "Modul %d" % i, "duration": "2 Tage", "focus": "Fokus"} for i in range(6)]},
+    {"type": "team", "title": "Team", "text": "Intro",
+     "trainers": [{"name": "Name %d" % i, "role": "Rolle"} for i in range(4)]},
+    {"type": "investment", "title": "Investition",
+     "items": [{"label": "Pos %d" % i, "value": "1.000 EUR", "note": "einmalig"} for i in range(5)]},
+]
+
+
+def reference_payload(n=200):
+    slides = [{"id": "1", "type": "title", "title": "Referenz", "subtitle": f"{n} Folien"}]
+    slides += [dict(_SLIDE_TYPES[i % len(_SLIDE_TYPES)], id=str(i + 2)) for i in range(n - 1)]
+    return {"deck": {"meta": {"deckTitle": "Referenz", "customer": "Memory"}, "slides": slides}}
+
+
+def test_reference_deck_peak_memory():
+    """Python heap peak of the 200-slide reference deck stays within budget"""
+    payload = reference_payload()
+    with memtrack.track_request(force=True) as mem:
+        with memtrack.stage("sanitize"):
+            deck = validate_and_sanitize(payload)
+        build_pptx(deck)
+    assert set(mem.stages) == {"sanitize", "build", "save"}
+    assert 0 < mem.peak_bytes < PEAK_BUDGET_BYTES, mem.as_dict()
+    print(f"✓ Peak {mem.peak_bytes / 1024 / 1024:.2f} MB (budget {PEAK_BUDGET_BYTES / 1024 / 1024:.0f} MB)")
+
+
+def test_reference_deck_rss_in_fresh_process():
+    """RSS growth of a first render (incl. lxml trees) stays within budget"""
+    if not os.path.exists("/proc/self/status"):
+        print("⚠ Skipped: no /proc")
+        return
+    code = (
+        "import json, logging, sys; logging.disable(logging.CRITICAL)\n"
+        "import memtrack, test_memory\n"
+        "from json_sanitizer import validate_and_sanitize\n"
+        "from pptx_builder import build_pptx\n"
+        "before = memtrack.rss_bytes()\n"
+        "build_pptx(validate_and_sanitize(test_memory.reference_payload()))\n"
+        "print(json.dumps(memtrack.rss_bytes() - before))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, check=True).stdout
+    delta = json.loads(out.strip().splitlines()[-1])
+    assert delta < RSS_BUDGET_BYTES, delta
+    print(f"✓ RSS +{delta / 1024 / 1024:.1f} MB (budget {RSS_BUDGET_BYTES / 1024 / 1024:.0f} MB)")
+
+
+def test_memory_header_and_metrics():
+    """With PPTX_MEMORY_TRACKING=1 the bytes endpoint reports per-stage memory"""
+    import app
+    try:
+        with testutil.env(PPTX_MEMORY_TRACKING=1):
+            response = app.render_pptx_bytes(reference_payload(5))
+    finally:
+        tracemalloc.stop()
+    fields = dict(kv.split("=") for kv in response.headers["x-pptx-memory"].split(";"))
+    assert {"sanitize", "build", "save", "peak"} <= set(fields)
+    assert int(fields["peak"]) == max(int(fields[s]) for s in ("sanitize", "build", "save"))
+    assert metrics.snapshot()["timings"]["memory.build.peak_bytes"]["count"] >= 1
+
+    untracked = app.render_pptx_bytes(reference_payload(2))
+    assert "x-pptx-memory" not in untracked.headers
+    print("✓ Memory header and metrics")
+
+
+if __name__ == "__main__":
+    test_reference_deck_peak_memory()
+    test_reference_deck_rss_in_fresh_process()
+    test_memory_header_and_metrics()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,115 @@
+"""
+Tests for merging rendered PPTX packages (POST /merge, /merge/bytes).
+Runs in-process, no server needed.
+"""
+import base64
+import io
+import sys
+import tempfile
+import zipfile
+
+from fastapi import HTTPException
+from PIL import Image
+from pptx import Presentation
+
+import app
+import metrics
+import testutil
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _logo(color):
+    bio = io.BytesIO()
+    Image.new("RGB", (90, 30), color).save(bio, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode("ascii")
+
+
+def _payload(customer, color, slides=2):
+    return {
+        "deck": {
+            "meta": {"customer": customer, "deckTitle": "Part", "date": "2025-10-14",
+                     "style": {"clientLogo": _logo(color)}},
+            "slides": [{"id": "1", "type": "title", "title": customer}] + [
+                {"id": str(i), "type": "context", "title": f"{customer} {i}", "content": ["a", "b"]}
+                for i in range(2, slides + 1)
+            ]
+        }
+    }
+
+
+def _status(fn, payload):
+    try:
+        fn(payload)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def _media(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return [n for n in z.namelist() if n.startswith("ppt/media/")]
+
+
+def test_merge_uploads_keeps_each_decks_layout():
+    main = app.render_pptx(_payload("Main", (255, 0, 0), slides=3))["file"]
+    appendix = app.render_pptx(_payload("Appendix", (0, 0, 255)))["file"]
+    result = app.merge_pptx({"parts": [{"file": main}, {"file": appendix}, {"file": appendix}],
+                             "filename": "Proposal"})
+    data = base64.b64decode(result["file"])
+    assert result["filename"] == "Proposal.pptx"
+    assert result["_meta"]["slides"] == 7 and result["_meta"]["parts"] == 3
+
+    prs = Presentation(io.BytesIO(data))
+    titles = [s.shapes[0].text_frame.text for s in prs.slides]
+    assert titles == ["Main", "Main 2", "Main 3", "Appendix", "Appendix 2", "Appendix", "Appendix 2"]
+    # appendix slides keep their own branded layout (other logo), imported once
+    layouts = [s.slide_layout.name for s in prs.slides]
+    assert layouts[1:3] == ["Branded", "Branded"]
+    assert layouts[4] == layouts[6] == "Branded (2)"
+    # one image per distinct logo, no matter how often a part is merged
+    assert len(_media(data)) == 2
+    print("✓ Uploads merged, layouts and images deduplicated")
+
+
+def test_merge_by_render_id():
+    with tempfile.TemporaryDirectory() as tmp, testutil.env(PPTX_RENDER_CACHE_DIR=tmp):
+        first = app.render_pptx(_payload("One", (0, 128, 0)))["_meta"]["renderId"]
+        second = app.render_pptx_bytes(_payload("Two", (0, 128, 0))).headers["x-pptx-render-id"]
+        parts = {"parts": [{"renderId": first}, {"renderId": second.upper()}]}
+        lookups = (metrics.counter("render_cache.hits"), metrics.counter("render_cache.misses"))
+
+        merged = app.merge_pptx_bytes(parts)
+        assert merged.headers["x-pptx-cache"] == "miss"
+        assert merged.headers["x-pptx-slides"] == "4"
+        again = app.merge_pptx(parts)
+        assert again["_meta"]["cache"] == "hit"
+        assert base64.b64decode(again["file"]) == merged.body
+        # merged output has a render id of its own and can be merged again
+        nested = app.merge_pptx({"parts": [{"renderId": again["_meta"]["renderId"]}, {"renderId": first}]})
+        assert nested["_meta"]["slides"] == 6
+        app.download_render(first)
+        # merge inputs, merge keys and downloads are not render lookups: hit_ratio stays about renders
+        assert (metrics.counter("render_cache.hits"), metrics.counter("render_cache.misses")) == lookups
+
+        assert _status(app.merge_pptx, {"parts": [{"renderId": "0" * 64}]}) == 404
+        assert _status(app.merge_pptx, {"parts": [{"renderId": "../../etc/passwd"}]}) == 400
+    assert _status(app.merge_pptx, {"parts": [{"renderId": first}]}) == 400
+    print("✓ Merge by render id")
+
+
+def test_invalid_parts_rejected():
+    for payload in ({}, {"parts": []}, {"parts": ["x"]}, {"parts": [{"file": "%%%"}]},
+                    {"parts": [{"file": base64.b64encode(b"not a zip").decode()}]},
+                    {"parts": [{"other": 1}]}):
+        assert _status(app.merge_pptx, payload) == 400, payload
+    print("✓ Invalid parts rejected")
+
+
+if __name__ == "__main__":
+    test_merge_uploads_keeps_each_decks_layout()
+    test_merge_by_render_id()
+    test_invalid_parts_rejected()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,114 @@
+"""
+Tests for parallel rendering and package assembly (pptx_package).
+Runs in-process, no server needed.
+"""
+import base64
+import io
+import sys
+import zipfile
+from contextlib import contextmanager
+
+from pptx import Presentation
+
+import metrics
+import pptx_builder
+import pptx_package
+import test_logo_store
+import test_slide_library
+import testutil
+from render_plan import compile_deck
+from json_sanitizer import validate_and_sanitize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+SLIDE_TEMPLATES = [
+    {"type": "agenda", "title": "Agenda", "items": ["a", "b", "c"]},
+    {"type": "investment", "title": "Invest",
+     "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]},
+    {"type": "team", "title": "Team", "trainers": [{"name": "J", "role": "R"}]},
+]
+
+
+def _deck(n):
+    slides = [{"id": "1", "type": "title", "title": "Hello", "subtitle": "World"}]
+    for i in range(2, n + 1):
+        slides.append(dict(SLIDE_TEMPLATES[i % len(SLIDE_TEMPLATES)], id=str(i)))
+    return validate_and_sanitize({"deck": {"meta": {"customer": "Par", "deckTitle": "Parallel"},
+                                           "slides": slides}})
+
+
+@contextmanager
+def _parallel(workers=2):
+    with testutil.env(PPTX_PARALLEL_WORKERS=workers, PPTX_PARALLEL_MIN_SLIDES=2):
+        yield
+
+
+def _parts(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def test_append_slides_copies_content():
+    """append_slides copies slide XML into another package"""
+    plan = compile_deck(_deck(4))
+    src = pptx_builder._render_presentation(dict(plan, slides=plan["slides"][2:]))
+    dst = pptx_builder._render_presentation(dict(plan, slides=plan["slides"][:2]))
+    assert pptx_package.append_slides(dst, src) == 2
+    prs = Presentation(io.BytesIO(pptx_builder._save(dst)))
+    assert len(prs.slides) == 4
+    texts = [sh.text_frame.text for sh in prs.slides[3].shapes if sh.has_text_frame]
+    assert "Invest" in texts
+    print("✓ append_slides copies slides")
+
+
+def test_parallel_matches_serial():
+    """Parallel rendering produces the same package parts as a serial render"""
+    deck = _deck(12)
+    plan = compile_deck(deck)
+    serial = pptx_builder.execute_plan(plan)
+
+    with _parallel(2):
+        before = metrics.counter("build.parallel_renders")
+        parallel = pptx_builder.execute_plan(plan)
+        assert metrics.counter("build.parallel_renders") == before + 1  # no serial fallback
+        assert metrics.snapshot()["gauges"]["build.parallel_workers"] == 2
+
+    a, b = _parts(serial), _parts(parallel)
+    assert sorted(a) == sorted(b)
+    assert [n for n in a if a[n] != b[n]] == []
+    assert serial == parallel  # deterministic save: same bytes, not just same parts
+    print("✓ Parallel render matches serial")
+
+
+def test_parallel_matches_serial_with_logos_and_library_slides():
+    """Inline logos and library slides in pool chunks give the same bytes as a serial render"""
+    logo = base64.b64encode(test_logo_store._png_bytes(color=(0, 90, 160))).decode("ascii")
+    slides = [{"id": "1", "type": "title", "title": "Hello"},
+              {"id": "2", "type": "library", "ref": "about_synk"}]
+    slides += [dict(SLIDE_TEMPLATES[i % len(SLIDE_TEMPLATES)], id=str(i)) for i in range(3, 10)]
+    slides += [{"id": "10", "type": "library", "ref": "about_synk"},
+               {"id": "11", "type": "context", "title": "Context", "content": ["a", "b"]}]
+    with test_slide_library._library():
+        deck = validate_and_sanitize({"deck": {"meta": {"customer": "Par", "deckTitle": "Assets",
+                                                        "style": {"clientLogo": logo}},
+                                               "slides": slides}})
+        plan = compile_deck(deck)
+        serial = pptx_builder.execute_plan(plan)
+        with _parallel(3):
+            before = metrics.counter("build.parallel_renders")
+            parallel = pptx_builder.execute_plan(plan)
+            assert metrics.counter("build.parallel_renders") == before + 1
+    assert len(Presentation(io.BytesIO(parallel)).slides) == 13  # two library slides each
+    assert any(n.startswith("ppt/media/") for n in _parts(parallel))
+    assert serial == parallel
+    print("✓ Parallel render with logos and library slides matches serial")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing parallel rendering...\n")
+    test_append_slides_copies_content()
+    test_parallel_matches_serial()
+    test_parallel_matches_serial_with_logos_and_library_slides()
+    print("\n✅ All tests passed!")
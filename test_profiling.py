@@ -0,0 +1,80 @@
+"""
+Tests for the admin-only render profiling endpoint.
+Runs in-process, no server needed.
+"""
+import base64
+import sys
+
+from fastapi import HTTPException
+
+import app
+import testutil
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Profile", "deckTitle": "Slow Deck"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b"]},
+            {"id": "3", "type": "investment", "title": "Invest",
+             "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]},
+            {"id": "4", "type": "investment", "title": "Invest 2",
+             "items": [{"label": "Plus", "value": "2.000 €", "note": "yearly"}]},
+        ]
+    }
+}
+
+
+def _status(**kwargs):
+    try:
+        app.render_profile(PAYLOAD, **kwargs)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_disabled_by_default():
+    """Without configuration the endpoint does not exist (404), even with a token"""
+    with testutil.env(PPTX_PROFILING_ENABLED=None, PPTX_ADMIN_TOKEN="s3cret"):
+        assert _status(x_pptx_admin_token="s3cret") == 404
+    with testutil.env(PPTX_PROFILING_ENABLED="1", PPTX_ADMIN_TOKEN=None):
+        assert _status(x_pptx_admin_token="") == 404
+    print("✓ Disabled by default")
+
+
+def test_requires_admin_token():
+    with testutil.env(PPTX_PROFILING_ENABLED="1", PPTX_ADMIN_TOKEN="s3cret"):
+        assert _status(x_pptx_admin_token=None) == 403
+        assert _status(x_pptx_admin_token="wrong") == 403
+        assert _status(x_pptx_admin_token="s3cret", sort="bogus") == 400
+    print("✓ Admin token required")
+
+
+def test_profile_report():
+    """Hottest functions, stage timings and per-slide-type breakdown"""
+    with testutil.env(PPTX_PROFILING_ENABLED="1", PPTX_ADMIN_TOKEN="s3cret"):
+        result = app.render_profile(PAYLOAD, x_pptx_admin_token="s3cret", top=10, sort="tottime")
+        with_file = app.render_profile(PAYLOAD, x_pptx_admin_token="s3cret", top=1, include_file=True)
+    profile = result["profile"]
+    assert set(profile["stages"]) == {"sanitize", "compile", "execute"}
+    assert len(profile["functions"]) == 10
+    tottimes = [f["tottime"] for f in profile["functions"]]
+    assert tottimes == sorted(tottimes, reverse=True)
+    assert profile["slide_types"]["investment"]["count"] == 2
+    assert {s["type"] for s in profile["slowest_slides"]} <= {"title", "agenda", "investment"}
+    assert "file" not in result
+
+    assert base64.b64decode(with_file["file"])[:2] == b"PK"
+    assert with_file["filename"] == "Profile - Slow Deck.pptx"
+    print("✓ Profile report")
+
+
+if __name__ == "__main__":
+    test_disabled_by_default()
+    test_requires_admin_token()
+    test_profile_report()
+    print("\n✅ All tests passed!")
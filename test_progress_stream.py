@@ -0,0 +1,121 @@
+"""
+Tests for progress streaming (POST /render/stream) and GET /renders/{id}.
+Runs in-process, no server needed.
+"""
+import base64
+import io
+import json
+import sys
+import tempfile
+import time
+
+from fastapi import HTTPException
+from pptx import Presentation
+
+import app
+import deadline
+import render_cache
+import testutil
+from json_sanitizer import validate_and_sanitize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Stream", "deckTitle": "Progress"},
+        "slides": [{"id": "1", "type": "title", "title": "Hello"}] + [
+            {"id": str(i), "type": "context", "title": f"Slide {i}", "content": ["a"]} for i in range(2, 6)
+        ]
+    }
+}
+
+
+def _ndjson(include_file=False):
+    deck = validate_and_sanitize(PAYLOAD)
+    chunks = list(app._progress_events(deck, "Stream - Progress.pptx", "ndjson", include_file))
+    return [json.loads(line) for chunk in chunks for line in chunk.decode("utf-8").splitlines()]
+
+
+def _sse(deck):
+    events = []
+    for chunk in app._progress_events(deck, "Stream - Progress.pptx", "sse", False):
+        for block in chunk.decode("utf-8").split("\n\n"):
+            if not block or block.startswith(":"):
+                continue
+            name, data = block.split("\n")
+            events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_ndjson_progress_and_file():
+    events = _ndjson()
+    names = [e["event"] for e in events]
+    assert names == ["sanitized"] + ["slide"] * 5 + ["saving", "done"]
+    assert events[0]["slides"] == 5
+    assert [e["index"] for e in events if e["event"] == "slide"] == [1, 2, 3, 4, 5]
+    assert events[1]["total"] == 5 and events[1]["type"] == "title"
+    done = events[-1]
+    assert done["filename"] == "Stream - Progress.pptx" and done["cache"] == "off"
+    assert "download" not in done
+    assert len(Presentation(io.BytesIO(base64.b64decode(done["file"]))).slides) == 5
+    print("✓ NDJSON progress ends with the file")
+
+
+def test_sse_download_reference_and_cache_hit():
+    with tempfile.TemporaryDirectory() as tmp, testutil.env(PPTX_RENDER_CACHE_DIR=tmp):
+        deck = validate_and_sanitize(PAYLOAD)
+        first = _sse(deck)
+        done = first[-1][1]
+        assert first[-1][0] == "done" and "file" not in done
+        assert done["download"].startswith(f"/renders/{done['renderId']}?filename=Stream")
+        response = app.download_render(done["renderId"], filename="Stream - Progress")
+        assert response.path == render_cache.get_cache().get_path(done["renderId"])
+        assert "Stream - Progress.pptx" in response.headers["content-disposition"]
+
+        # cached: no slides to draw, straight to done
+        second = _sse(deck)
+        assert [n for n, _ in second] == ["sanitized", "done"] and second[-1][1]["cache"] == "hit"
+        for bad, status in (("nothex", 400), ("0" * 64, 404)):
+            try:
+                app.download_render(bad)
+                assert False
+            except HTTPException as e:
+                assert e.status_code == status
+    print("✓ SSE download reference and cache hit")
+
+
+def test_heartbeats_errors_and_format():
+    old_render = app._render
+
+    def slow_render(deck, on_slide=None):
+        time.sleep(0.2)
+        raise deadline.RenderCancelled("exceeded", "slide 1")
+
+    app._render = slow_render
+    try:
+        with testutil.env(PPTX_STREAM_HEARTBEAT_SECONDS=0.02):
+            events = _ndjson()
+    finally:
+        app._render = old_render
+    assert events[0]["event"] == "sanitized" and events[1]["event"] == "heartbeat"
+    assert events[-1] == {"event": "error", "status": 504, "detail": "Render deadline exceeded (slide 1)"}
+
+    assert app._stream_format(None, "application/x-ndjson") == "ndjson"
+    assert app._stream_format(None, "text/event-stream") == "sse"
+    response = app.render_pptx_stream(PAYLOAD, format="ndjson")
+    assert response.media_type == "application/x-ndjson" and response.headers["x-accel-buffering"] == "no"
+    try:
+        app.render_pptx_stream(PAYLOAD, format="xml")
+        assert False
+    except HTTPException as e:
+        assert e.status_code == 400
+    print("✓ Heartbeats, error events and format selection")
+
+
+if __name__ == "__main__":
+    test_ndjson_progress_and_file()
+    test_sse_download_reference_and_cache_hit()
+    test_heartbeats_errors_and_format()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,141 @@
+"""
+Tests for worker recycling (RSS ceiling / max renders).
+The last test starts a real uvicorn server with two workers.
+"""
+import asyncio
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+import app
+import loadtest
+import recycle
+import testutil
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Recycle", "deckTitle": "Fresh Worker"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b"]},
+        ]
+    }
+}
+
+
+@contextmanager
+def _recycling(**env):
+    """Limits from `env`, no jitter, SIGTERM replaced by a recorder."""
+    old_terminate, old_jitter = recycle._terminate, recycle._jitter
+    calls = []
+    recycle._terminate, recycle._jitter = lambda: calls.append(recycle.draining()), 0.0
+    recycle.reset()
+    try:
+        with testutil.env(**env):
+            yield calls
+    finally:
+        recycle._terminate, recycle._jitter = old_terminate, old_jitter
+        recycle.reset()
+
+
+def test_recycles_after_max_renders():
+    with _recycling(PPTX_WORKER_MAX_RENDERS=3) as calls:
+        for i in range(2):
+            app.render_pptx(PAYLOAD)
+        assert not calls and app.root()["status"] == "ok"
+        app.render_pptx(PAYLOAD)
+        assert calls == ["3 renders"]
+        # still serves while draining, but only recycles once
+        app.render_pptx(PAYLOAD)
+        assert len(calls) == 1
+        assert app.root().status_code == 503
+        worker = app.get_metrics()["worker"]
+        assert worker["renders"] == 4 and worker["draining"] == "3 renders"
+        assert worker["pid"] == os.getpid() and worker["max_renders"] == 3
+    print("✓ Recycles after max renders")
+
+
+def test_recycles_above_rss_ceiling():
+    with _recycling(PPTX_WORKER_MAX_RSS_MB=1) as calls:
+        app.render_pptx(PAYLOAD)
+        assert len(calls) == 1 and calls[0].startswith("rss ")
+        assert app.get_metrics()["gauges"]["worker.rss_bytes"] > 1024 * 1024
+    with _recycling(PPTX_WORKER_MAX_RSS_MB=0, PPTX_WORKER_MAX_RENDERS=0) as calls:
+        for _ in range(3):
+            app.render_pptx(PAYLOAD)
+        assert not calls and app.get_metrics()["worker"]["max_rss_bytes"] is None
+    print("✓ Recycles above the RSS ceiling")
+
+
+def test_recycles_are_recorded_outside_the_worker(tmp_path):
+    events = tmp_path / "recycles.jsonl"
+    with _recycling(PPTX_WORKER_MAX_RENDERS=1, PPTX_RECYCLE_LOG=events) as calls:
+        assert app.get_metrics()["worker"]["recycles"] == 0
+        app.render_pptx(PAYLOAD)
+        assert calls == ["1 renders"]
+        recycle.reset()
+        app.render_pptx(PAYLOAD)  # "next worker"
+        worker = app.get_metrics()["worker"]
+        assert worker["recycles"] == 2 and worker["last_recycle"]["reason"] == "1 renders"
+    lines = [json.loads(line) for line in events.read_text(encoding="utf-8").splitlines()]
+    assert [e["pid"] for e in lines] == [os.getpid()] * 2 and lines[0]["renders"] == 1
+    assert lines[0]["rss_bytes"] is None or lines[0]["rss_peak_bytes"] >= lines[0]["rss_bytes"]
+    print("✓ Recycles recorded in PPTX_RECYCLE_LOG")
+
+
+def test_workers_are_replaced_without_failed_requests(tmp_path):
+    port = loadtest._free_port()
+    log = open(tmp_path / "server.log", "wb")
+    proc = loadtest.start_server(port, workers=2, log=log, env={
+        "PPTX_WORKER_MAX_RENDERS": "3", "PPTX_RECYCLE_LOG": str(tmp_path / "recycles.jsonl")})
+    body = json.dumps(PAYLOAD).encode("utf-8")
+
+    async def run():
+        await loadtest.wait_ready("127.0.0.1", port, proc=proc, timeout=60)
+        pids = set()
+
+        async def client(n):
+            c = loadtest.HttpClient("127.0.0.1", port, timeout=30)
+            statuses = []
+            try:
+                for _ in range(n):
+                    status, _, _ = await c.request("POST", "/render/bytes", body,
+                                                   {"Content-Type": "application/json"})
+                    statuses.append(status)
+                    pids.update(loadtest._process_tree(proc.pid))
+            finally:
+                await c.close()
+            return statuses
+
+        results = await asyncio.gather(*(client(6) for _ in range(3)))
+        return [s for r in results for s in r], pids
+
+    try:
+        statuses, pids = asyncio.run(run())
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        log.close()
+    assert statuses == [200] * 18
+    # master + 2 initial workers + at least one replacement
+    assert len(pids) >= 4, pids
+    # the dead workers' recycles are still on record
+    recycled = [json.loads(line)["pid"] for line in (tmp_path / "recycles.jsonl").read_text().splitlines()]
+    assert recycled and set(recycled) < pids, (recycled, pids)
+    assert b"worker.recycle {" in (tmp_path / "server.log").read_bytes()
+    print("✓ Workers are replaced without failed requests")
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    test_recycles_after_max_renders()
+    test_recycles_above_rss_ceiling()
+    for test in (test_recycles_are_recorded_outside_the_worker, test_workers_are_replaced_without_failed_requests):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("\n✅ All tests passed!")
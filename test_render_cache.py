@@ -0,0 +1,155 @@
+"""
+Tests for the shared on-disk render cache.
+Runs in-process, no server needed.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import metrics
+import render_cache
+import testutil
+from json_sanitizer import validate_and_sanitize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _body(response):
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+
+def _deck(title="Cache Test"):
+    return validate_and_sanitize({
+        "deck": {
+            "meta": {"customer": "Cache", "deckTitle": title},
+            "slides": [{"id": "1", "type": "title", "title": title}]
+        }
+    })
+
+
+def test_deck_hash_is_canonical():
+    """Key order does not change the hash, content does"""
+    a = {"meta": {"a": 1, "b": 2}, "slides": []}
+    b = {"slides": [], "meta": {"b": 2, "a": 1}}
+    assert render_cache.deck_hash(a) == render_cache.deck_hash(b)
+    assert render_cache.deck_hash(_deck("x")) != render_cache.deck_hash(_deck("y"))
+    print("✓ Canonical deck hash")
+
+
+def test_put_get_and_atomic_write():
+    """Stored files are found again and no temp files stay behind"""
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as d:
+        cache = render_cache.DiskRenderCache(d, 10 * 1024 * 1024)
+        key = render_cache.deck_hash(_deck())
+        assert cache.get_path(key) is None
+        cache.put(key, b"PK-fake-pptx")
+        path = cache.get_path(key)
+        with cache.open_mmap(path) as mm:
+            assert mm[:] == b"PK-fake-pptx"
+        leftovers = [f for _, _, files in os.walk(d) for f in files if f.endswith(".tmp")]
+        assert not leftovers
+        stats = cache.stats()
+        assert stats["entries"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+    print("✓ Atomic put / get / hit ratio")
+
+
+def test_lru_eviction_by_access_time():
+    """Least recently accessed entries are evicted first"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = render_cache.DiskRenderCache(d, 250)
+        keys = ["a" * 64, "b" * 64, "c" * 64]
+        cache.put(keys[0], b"x" * 100)
+        time.sleep(0.02)
+        cache.put(keys[1], b"x" * 100)
+        time.sleep(0.02)
+        assert cache.get_path(keys[0])  # touch a -> b is now the oldest
+        time.sleep(0.02)
+        cache.put(keys[2], b"x" * 100)
+        assert cache.get_path(keys[0]) and cache.get_path(keys[2])
+        assert cache.get_path(keys[1]) is None
+    print("✓ LRU eviction by access time")
+
+
+def test_puts_do_not_rescan_the_directory():
+    """Puts track the cache size in memory, the directory is only walked when over budget"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = render_cache.DiskRenderCache(d, 1000)
+        scans = []
+        entries = cache._entries
+        cache._entries = lambda: scans.append(1) or entries()
+        for i in range(8):
+            cache.put(f"{i:064x}", b"x" * 100)
+        assert len(scans) == 1  # first put measures the directory once
+        for i in range(8, 11):
+            cache.put(f"{i:064x}", b"x" * 100)
+        assert len(scans) == 2  # 1100 bytes > budget: evicted down to the low watermark
+        assert cache.stats()["bytes"] == 900
+        cache.put(f"{11:064x}", b"x" * 100)
+        assert len(scans) == 3  # only stats() walked again, the put fit into the headroom
+    print("✓ Puts do not rescan the cache directory")
+
+
+def test_bytes_endpoint_serves_hit_from_disk():
+    """Second identical request is streamed from the cache file"""
+    from fastapi.responses import StreamingResponse
+    import app
+
+    payload = {"deck": {"meta": {"customer": "Cache", "deckTitle": "Endpoint"},
+                        "slides": [{"id": "1", "type": "title", "title": "Hi"}]}}
+    with tempfile.TemporaryDirectory() as d, testutil.env(PPTX_RENDER_CACHE_DIR=d):
+        first = app.render_pptx_bytes(payload)
+        second = app.render_pptx_bytes(payload)
+        assert first.headers["X-PPTX-Cache"] == "miss"
+        assert second.headers["X-PPTX-Cache"] == "hit"
+        assert isinstance(second, StreamingResponse)
+        assert _body(second) == first.body
+        assert second.headers["content-length"] == str(len(first.body))
+        b64 = app.render_pptx(payload)
+        assert b64["_meta"]["cache"] == "hit"
+    print("✓ Cache hit served from disk")
+
+
+def test_entry_evicted_after_lookup_is_rendered_again():
+    """A cache entry deleted between lookup and read is rendered again instead of failing"""
+    import app
+
+    payload = {"deck": {"meta": {"customer": "Cache", "deckTitle": "Evicted"},
+                        "slides": [{"id": "1", "type": "title", "title": "Hi"}]}}
+    with tempfile.TemporaryDirectory() as d, testutil.env(PPTX_RENDER_CACHE_DIR=d):
+        expected = app.render_pptx_bytes(payload).body
+        cache = render_cache.get_cache()
+        lookup = cache.get_path
+
+        def evicted_right_after_lookup(key):
+            path = lookup(key)
+            if path:
+                os.unlink(path)
+            return path
+
+        cache.get_path = evicted_right_after_lookup
+        b64 = app.render_pptx(payload)
+        assert b64["_meta"]["cache"] == "miss" and b64["file"]
+        cache.get_path = lookup
+        app.render_pptx_bytes(payload)  # cached again
+        cache.get_path = evicted_right_after_lookup
+        response = app.render_pptx_bytes(payload)
+        assert response.headers["X-PPTX-Cache"] == "miss" and response.body == expected
+    print("✓ Evicted entry rendered again")
+
+
+if __name__ == "__main__":
+    test_deck_hash_is_canonical()
+    test_put_get_and_atomic_write()
+    test_lru_eviction_by_access_time()
+    test_puts_do_not_rescan_the_directory()
+    test_bytes_endpoint_serves_hit_from_disk()
+    test_entry_evicted_after_lookup_is_rendered_again()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,140 @@
+"""
+Tests for the compiled render plan (deck → draw ops → PPTX).
+Runs in-process, no server needed.
+"""
+import json
+import sys
+
+from pptx_builder import build_pptx, execute_plan
+from render_plan import compile_deck, plan_to_json
+from json_sanitizer import validate_and_sanitize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Plan", "deckTitle": "Plan Test"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello", "subtitle": "World"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b"]},
+            {"id": "3", "type": "team", "title": "Team", "trainers": [{"name": "J", "role": "R"}]},
+            {"id": "4", "type": "investment", "title": "Invest",
+             "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]}
+        ]
+    }
+}
+
+
+def test_plan_is_serializable_and_stable():
+    """Plans are plain JSON and compile deterministically"""
+    deck = validate_and_sanitize(PAYLOAD)
+    plan = compile_deck(deck)
+    assert json.loads(plan_to_json(plan)) == plan
+    assert plan_to_json(compile_deck(deck)) == plan_to_json(plan)
+    kinds = [[op["op"] for op in sl["ops"]] for sl in plan["slides"]]
+    assert kinds[0][0] == "background"
+    assert "table" in kinds[3]
+    table = plan["slides"][3]["ops"][1]
+    assert table["rows"][0][:2] == ["Basic", "once"]
+    assert table["align"] == [None, None, "right"]
+    print("✓ Plan serializable and stable")
+
+
+def test_executing_plan_matches_build():
+    """execute_plan(compile_deck(deck)) is what build_pptx produces"""
+    import io
+    import zipfile
+    deck = validate_and_sanitize(PAYLOAD)
+    direct = build_pptx(deck)
+    staged = execute_plan(compile_deck(deck))
+    with zipfile.ZipFile(io.BytesIO(direct)) as a, zipfile.ZipFile(io.BytesIO(staged)) as b:
+        slides = [n for n in a.namelist() if n.startswith("ppt/slides/")]
+        assert slides and all(a.read(n) == b.read(n) for n in slides)
+    print("✓ Plan executor matches build_pptx")
+
+
+def test_dry_run_endpoint():
+    """POST /render/plan returns the plan without building a PPTX"""
+    import app
+    result = app.render_plan_dry_run(PAYLOAD)
+    assert result["_meta"]["slides"] == 4
+    assert result["_meta"]["ops"] == sum(len(sl["ops"]) for sl in result["plan"]["slides"])
+    print("✓ Dry-run endpoint")
+
+
+def test_logos_live_in_branded_layout():
+    """Logos + badge are drawn once onto the Branded layout, not onto each slide"""
+    import base64
+    import copy
+    import io
+    from PIL import Image
+    from pptx import Presentation
+    bio = io.BytesIO()
+    Image.new("RGB", (120, 40), (255, 0, 0)).save(bio, format="PNG")
+    payload = copy.deepcopy(PAYLOAD)
+    payload["deck"]["meta"]["style"] = {"logo": "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode()}
+    deck = validate_and_sanitize(payload)
+
+    plan = compile_deck(deck)
+    assert [op["op"] for op in plan["layouts"]["Branded"]] == ["picture", "textbox"]
+    assert "layout" not in plan["slides"][0]
+    assert all(sl["layout"] == "Branded" for sl in plan["slides"][1:])
+    assert not any(op["op"] == "picture" for sl in plan["slides"] for op in sl["ops"])
+
+    prs = Presentation(io.BytesIO(build_pptx(deck)))
+    branded = prs.slide_layouts.get_by_name("Branded")
+    assert sum(1 for sh in branded.shapes if sh.shape_type == 13) == 1  # picture
+    assert len(branded.used_by_slides) == 3
+    assert all(len(s.part.rels) == 1 for s in prs.slides)  # layout only, no image rels
+    print("✓ Logos in branded layout")
+
+
+def test_slim_base_package_is_valid():
+    """Output only carries used layouts, and every part/relationship in it resolves"""
+    import io
+    import posixpath
+    import re
+    import zipfile
+    from pptx import Presentation
+    data = build_pptx(validate_and_sanitize(PAYLOAD))
+    z = zipfile.ZipFile(io.BytesIO(data))
+    names = set(z.namelist())
+    assert not any("thumbnail" in n or "printerSettings" in n for n in names)
+
+    # content type for every part, every internal relationship target exists
+    types = z.read("[Content_Types].xml").decode()
+    defaults = set(re.findall(r'Default Extension="(\w+)"', types))
+    overrides = set(re.findall(r'PartName="/([^"]+)"', types))
+    for n in names - {"[Content_Types].xml"}:
+        assert n in overrides or n.rsplit(".", 1)[-1] in defaults, n
+    assert overrides <= names
+    reached = set()
+    for rels in (n for n in names if n.endswith(".rels")):
+        base = posixpath.dirname(posixpath.dirname(rels))
+        for target, mode in re.findall(r'Target="([^"]+)"(?: TargetMode="(\w+)")?', z.read(rels).decode()):
+            if mode != "External":
+                path = posixpath.normpath(posixpath.join(base, target)).lstrip("/")
+                assert path in names, (rels, target)
+                reached.add(path)
+    assert names - reached - {"[Content_Types].xml"} == {n for n in names if n.endswith(".rels")}
+
+    # layout ids unique, presentation opens and can take more slides
+    master = z.read("ppt/slideMasters/slideMaster1.xml").decode()
+    ids = re.findall(r'<p:sldLayoutId id="(\d+)"', master)
+    assert len(ids) == len(set(ids)) == 2
+    prs = Presentation(io.BytesIO(data))
+    assert [l.name for l in prs.slide_layouts] == ["Blank", "Branded"]
+    prs.slides.add_slide(prs.slide_layouts[0])
+    prs.save(io.BytesIO())
+    print("✓ Slim base package valid")
+
+
+if __name__ == "__main__":
+    test_plan_is_serializable_and_stable()
+    test_executing_plan_matches_build()
+    test_dry_run_endpoint()
+    test_logos_live_in_branded_layout()
+    test_slim_base_package_is_valid()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,129 @@
+"""
+Tests for the preflight cost model and the cost-aware render scheduler.
+Runs in-process, no server needed.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import app
+import cost_model
+import deadline
+import metrics
+import scheduler
+import test_memory
+import testutil
+from json_sanitizer import validate_and_sanitize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_estimate_tracks_actual_cost():
+    small = validate_and_sanitize(test_memory.reference_payload(3))
+    large = validate_and_sanitize(test_memory.reference_payload(150))
+    x = cost_model.features(small)
+    # title + agenda (4 items) + context (text + 6 bullets)
+    assert (x["deck"], x["title"], x["text"], x["bullets"], x["rows"]) == (1, 1, 2, 11, 0)
+    assert cost_model.features(large)["rows"] > 0
+
+    metrics.reset()
+    for deck in (small, large):
+        predicted = cost_model.estimate(deck)
+        data = app._build(deck)
+        assert 0.8 < len(data) / predicted.bytes < 1.25, (len(data), predicted.bytes)
+    t = metrics.snapshot()["timings"]
+    assert t["cost.predicted_seconds"]["count"] == 2 and t["cost.actual_seconds"]["count"] == 2
+    # timing depends on the machine: only a coarse check here
+    assert 0.1 < t["cost.seconds_ratio"]["avg"] < 10
+    assert cost_model.estimate(large).seconds > 20 * cost_model.estimate(small).seconds
+    assert scheduler.lane_for(cost_model.estimate(small).seconds) == "small"
+
+    meta = app.render_plan_dry_run(test_memory.reference_payload(3))["_meta"]
+    assert meta["estimate"]["lane"] == "small" and meta["estimate"]["features"]["bullets"] == 11
+    print("✓ Estimate tracks actual cost")
+
+
+def test_fit_recovers_coefficients():
+    truth = {"deck": 0.01, "text": 0.003, "table": 0.006, "bullets": 0.0004, "rows": 0.0015}
+    rows = []
+    for n in (1, 5, 20, 80):
+        for bullets, table_rows in ((1, 0), (6, 3), (20, 30)):
+            rows.append(dict(dict.fromkeys(cost_model.FEATURES, 0.0), deck=1.0, text=n, table=n // 2,
+                             bullets=n * bullets, rows=(n // 2) * table_rows))
+    targets = [sum(truth.get(k, 0.0) * v for k, v in r.items()) for r in rows]
+    fitted = cost_model.fit(rows, targets)
+    for k, v in truth.items():
+        assert abs(fitted[k] - v) < 1e-6, (k, fitted[k], v)
+    assert fitted["title"] == fitted["logo_kb"] == 0.0
+    print("✓ Fit recovers known coefficients")
+
+
+def test_small_decks_first_and_large_lane():
+    order, threads = [], []
+    with testutil.env(PPTX_SCHED_SLOTS=1, PPTX_SCHED_LARGE_SECONDS=3):
+
+        def render(seconds):
+            with scheduler.slot(seconds) as lane:
+                order.append((seconds, lane))
+
+        with scheduler.slot(0.5):
+            for seconds in (2.0, 0.1, 1.0):
+                threads.append(threading.Thread(target=render, args=(seconds,)))
+                threads[-1].start()
+                while scheduler.status()["lanes"]["small"]["queued"] < len(threads):
+                    time.sleep(0.005)
+            # the small lane is busy, a large deck starts right away in its own lane
+            render(30.0)
+            assert order == [(30.0, "large")]
+        for t in threads:
+            t.join()
+    assert [s for s, _ in order[1:]] == [0.1, 1.0, 2.0]
+    status = scheduler.status()["lanes"]
+    assert status["small"]["active"] == status["small"]["queued"] == 0
+    assert metrics.snapshot()["timings"]["scheduler.small.wait_seconds"]["count"] >= 4
+    print("✓ Small decks first, large decks in their own lane")
+
+
+def test_waiting_render_gives_up_on_deadline():
+    dl = deadline.Deadline(0.2)
+    with testutil.env(PPTX_SCHED_SLOTS=1), scheduler.slot(0.01):
+        started = time.monotonic()
+        try:
+            with deadline.use(dl), scheduler.slot(0.01, poll=lambda: deadline.check("queued")):
+                raise AssertionError("must not get a slot")
+        except deadline.RenderCancelled as e:
+            assert e.stage == "queued" and e.status_code == 504
+        assert time.monotonic() - started < 2
+        assert scheduler.status()["lanes"]["small"]["queued"] == 0
+    with testutil.env(PPTX_SCHED_SLOTS=0), scheduler.slot(0.01) as lane:
+        assert lane == "off"
+    if "PPTX_SCHED_SLOTS" not in os.environ:
+        assert not scheduler.enabled()  # opt-in
+    print("✓ Queued render gives up at its deadline")
+
+
+def test_calibrate_writes_usable_model(tmp_path):
+    model = cost_model.calibrate(cost_model.benchmark_payloads()[:6], repeats=1)
+    assert model["samples"] == 6 and model["bytes"]["deck"] > 0
+    path = tmp_path / "cost-model.json"
+    path.write_text(json.dumps(model))
+    with testutil.env(PPTX_COST_MODEL=path):
+        assert cost_model.coefficients()["bytes"]["deck"] == model["bytes"]["deck"]
+    with testutil.env(PPTX_COST_MODEL=tmp_path / "missing.json"):
+        assert cost_model.coefficients() is cost_model.DEFAULT_COEFFICIENTS
+    print("✓ Calibration produces a loadable model")
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    test_estimate_tracks_actual_cost()
+    test_fit_recovers_coefficients()
+    test_small_decks_first_and_large_lane()
+    test_waiting_render_gives_up_on_deadline()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_calibrate_writes_usable_model(pathlib.Path(tmp))
+    print("\n✅ All tests passed!")
@@ -0,0 +1,111 @@
+"""
+Tests for single-flight deduplication of concurrent identical renders.
+Runs in-process, no server needed.
+"""
+import copy
+import sys
+import threading
+import time
+
+import app
+import metrics
+from singleflight import SingleFlight
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Flight", "deckTitle": "Retry Storm"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b"]},
+        ]
+    }
+}
+
+
+def _concurrently(n, fn):
+    results, errors = [None] * n, []
+    start = threading.Barrier(n)
+
+    def run(i):
+        start.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test_flight")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.3)
+        return b"result"
+
+    results, errors = _concurrently(5, lambda i: flight.do("same", slow))
+    assert not errors and len(calls) == 1
+    assert [r[0] for r in results] == [b"result"] * 5
+    assert sorted(r[1] for r in results) == [False, True, True, True, True]
+    assert flight.inflight() == 0
+    # finished calls are not cached
+    assert flight.do("same", lambda: b"again") == (b"again", False)
+    print("✓ Concurrent calls share one execution")
+
+
+def test_errors_reach_all_waiters():
+    flight = SingleFlight("test_flight")
+
+    def boom():
+        time.sleep(0.2)
+        raise RuntimeError("render failed")
+
+    results, errors = _concurrently(3, lambda i: flight.do("bad", boom))
+    assert len(errors) == 3 and all(str(e) == "render failed" for e in errors)
+    assert flight.inflight() == 0
+    print("✓ Errors reach all waiters")
+
+
+def test_identical_requests_render_once():
+    """Both endpoints join an in-flight build of the same deck"""
+    original = app.build_pptx
+    builds = []
+
+    def slow_build(deck, *args, **kwargs):
+        builds.append(1)
+        time.sleep(0.3)
+        return original(deck, *args, **kwargs)
+
+    joined_before = metrics.counter("singleflight.joined")
+    app.build_pptx = slow_build
+    try:
+        def request(i):
+            payload = copy.deepcopy(PAYLOAD)
+            if i % 2:
+                return app.render_pptx_bytes(payload).headers["x-pptx-cache"]
+            return app.render_pptx(payload)["_meta"]["cache"]
+        results, errors = _concurrently(4, request)
+    finally:
+        app.build_pptx = original
+    assert not errors and len(builds) == 1
+    assert sorted(results) == ["joined", "joined", "joined", "off"]
+    assert metrics.counter("singleflight.joined") == joined_before + 3
+    print("✓ Identical requests render once")
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_execution()
+    test_errors_reach_all_waiters()
+    test_identical_requests_render_once()
+    print("\n✅ All tests passed!")
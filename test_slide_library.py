@@ -0,0 +1,105 @@
+"""
+Tests for pre-rendered library slides ({"type": "library", "ref": ...}).
+Runs in-process, no server needed.
+"""
+import io
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from pptx import Presentation
+
+import render_cache
+import slide_library
+import testutil
+from json_sanitizer import validate_and_sanitize
+from pptx_builder import build_pptx, compile_deck
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _render(slides, customer="Library"):
+    return build_pptx(validate_and_sanitize({
+        "deck": {"meta": {"customer": customer, "deckTitle": "Boilerplate"}, "slides": slides}
+    }))
+
+
+def _texts(data):
+    return [[sh.text_frame.text for sh in s.shapes if sh.has_text_frame] for s in Presentation(io.BytesIO(data)).slides]
+
+
+@contextmanager
+def _library():
+    with tempfile.TemporaryDirectory() as tmp:
+        about = _render([
+            {"id": "a1", "type": "about_synk", "title": "About SYNK", "content": ["Since 2010", "Team of 40"]},
+            {"id": "a2", "type": "references", "title": "References", "content": ["ACME", "Globex"]},
+        ])
+        with open(os.path.join(tmp, "about_synk.pptx"), "wb") as f:
+            f.write(about)
+        os.makedirs(os.path.join(tmp, "acme"))
+        with open(os.path.join(tmp, "acme", "about_synk.pptx"), "wb") as f:
+            f.write(_render([{"id": "b1", "type": "about_synk", "title": "About SYNK for ACME", "content": ["x"]}]))
+        with testutil.env(PPTX_LIBRARY_DIR=tmp):
+            slide_library.clear_cache()
+            try:
+                yield tmp
+            finally:
+                slide_library.clear_cache()
+
+
+SLIDES = [
+    {"id": "1", "type": "title", "title": "Proposal"},
+    {"id": "2", "type": "library", "ref": "about_synk"},
+    {"id": "3", "type": "context", "title": "Context", "content": ["a"]},
+]
+
+
+def test_library_slides_are_spliced():
+    with _library():
+        plan = compile_deck(validate_and_sanitize({"deck": {"meta": {}, "slides": SLIDES}}))
+        data = _render(SLIDES)
+        themed = _render(SLIDES[:1] + [dict(SLIDES[1], theme="acme")])
+    assert plan["slides"][1]["ops"] == [] and plan["slides"][1]["library"].endswith("about_synk.pptx")
+    texts = _texts(data)
+    assert len(texts) == 4
+    assert texts[1][0] == "About SYNK" and texts[1][1] == "Since 2010\n• Team of 40"
+    assert texts[2][0] == "References"
+    assert texts[3][0] == "Context"
+    assert _texts(themed)[1][0] == "About SYNK for ACME"
+    print("✓ Library slides are spliced in")
+
+
+def test_missing_ref_falls_back_to_text_slide():
+    slides = [{"id": "1", "type": "library", "ref": "partners", "title": "Partners", "content": ["Initech"]},
+              {"id": "2", "type": "library", "ref": "../../etc/passwd"}]
+    deck = validate_and_sanitize({"deck": {"meta": {}, "slides": slides}})
+    assert deck["slides"][1]["type"] == "text"
+    with _library():
+        plan = compile_deck(deck)
+        data = build_pptx(deck)
+    assert plan["slides"][0]["type"] == "partners" and "library" not in plan["slides"][0]
+    assert _texts(data)[0][0] == "Partners"
+    print("✓ Missing refs fall back to text slides")
+
+
+def test_cache_key_follows_library_file():
+    deck = validate_and_sanitize({"deck": {"meta": {}, "slides": SLIDES}})
+    with _library() as tmp:
+        path = os.path.join(tmp, "about_synk.pptx")
+        assert slide_library.load(path) is slide_library.load(path)
+        before = render_cache.deck_hash(deck)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert render_cache.deck_hash(deck) != before
+    print("✓ Cache key follows the library file")
+
+
+if __name__ == "__main__":
+    test_library_slides_are_spliced()
+    test_missing_ref_falls_back_to_text_slide()
+    test_cache_key_follows_library_file()
+    print("\n✅ All tests passed!")
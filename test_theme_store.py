@@ -0,0 +1,134 @@
+"""
+Tests for the theme registry (POST /themes + meta.style.themeId).
+Runs in-process, no server needed.
+"""
+import base64
+import io
+import os
+import sys
+import tempfile
+
+from fastapi import HTTPException
+from PIL import Image
+
+import app
+import logo_store
+import theme_store
+import testutil
+from json_sanitizer import validate_and_sanitize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _data_uri(color=(0, 128, 0)):
+    bio = io.BytesIO()
+    Image.new("RGB", (90, 30), color).save(bio, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode("ascii")
+
+
+THEME = {
+    "id": "acme",
+    "font": "Calibri",
+    "colors": {"primary": "123456", "accent1": "#abc", "text": "not-a-colour"},
+    "clientLogo": _data_uri(),
+}
+
+
+def _deck(style):
+    return {
+        "deck": {
+            "meta": {"customer": "ACME", "deckTitle": "Themed", "style": style},
+            "slides": [
+                {"id": "1", "type": "title", "title": "Hello"},
+                {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b"]},
+            ]
+        }
+    }
+
+
+def test_register_and_render_by_id():
+    """A themed request gets the same compiled style as one sent inline"""
+    theme_store.clear_cache()
+    result = app.register_theme(dict(THEME))
+    style = result["style"]
+    assert result["themeId"] == "acme"
+    assert style["font"] == "Calibri"
+    assert style["colors"]["primary"] == "#123456"
+    assert style["colors"]["accent1"] == "#AABBCC"
+    assert style["colors"]["text"] == "#011533"
+    assert logo_store.is_logo_ref(style["clientLogo"])
+    assert result["logos"] == {"clientLogo": style["clientLogo"]}
+
+    themed = validate_and_sanitize(_deck({"themeId": "acme"}))
+    inline = validate_and_sanitize(_deck(dict(THEME)))
+    assert themed["meta"]["style"] == inline["meta"]["style"]
+    assert themed["meta"]["themeId"] == "acme" and "themeId" not in inline["meta"]
+    assert app.render_pptx(_deck({"themeId": "acme"}))["file"]
+    assert app.list_themes()["themes"] == ["acme"]
+    print("✓ Register once, render by id")
+
+
+def test_overrides_and_unknown_ids():
+    theme_store.clear_cache()
+    app.register_theme(dict(THEME))
+    deck = validate_and_sanitize(_deck({"themeId": "acme", "colors": {"accent2": "00ff00"}, "font": "Arial"}))
+    style = deck["meta"]["style"]
+    assert style["colors"]["accent2"] == "#00FF00" and style["colors"]["primary"] == "#123456"
+    assert style["font"] == "Arial"
+    # overrides never leak into the registered theme
+    assert theme_store.resolve("acme")["colors"]["accent2"] == "#966668"
+
+    for bad in ({"themeId": "missing"}, {"themeId": "../etc"}):
+        try:
+            app.render_pptx(_deck(bad))
+            assert False, "unknown theme must be rejected"
+        except HTTPException as e:
+            assert e.status_code == 400 and "themeId" in e.detail
+    for bad in ({"id": "../evil"}, {"font": "Arial"}, []):
+        try:
+            app.register_theme(bad)
+            assert False, "invalid theme must be rejected"
+        except HTTPException as e:
+            assert e.status_code == 400
+    try:
+        app.get_theme("missing")
+        assert False
+    except HTTPException as e:
+        assert e.status_code == 404
+    print("✓ Overrides and unknown ids")
+
+
+def test_persisted_themes_survive_restart():
+    """With PPTX_THEME_DIR a fresh worker (empty memory) loads the theme and its logo"""
+    with tempfile.TemporaryDirectory() as tmp, testutil.env(PPTX_THEME_DIR=tmp):
+        try:
+            theme_store.clear_cache()
+            ref = app.register_theme(dict(THEME))["style"]["clientLogo"]
+            assert os.path.exists(os.path.join(tmp, "acme.json"))
+
+            # simulate another worker process
+            theme_store.clear_cache()
+            logo_store.clear_cache()
+            assert not logo_store.has_logo(ref)
+            deck = validate_and_sanitize(_deck({"themeId": "acme"}))
+            assert deck["meta"]["style"]["clientLogo"] == ref
+            assert logo_store.has_logo(ref)
+            assert app.get_theme("acme")["style"]["font"] == "Calibri"
+
+            # re-registered elsewhere -> picked up via mtime
+            other = theme_store.Theme("acme", dict(deck["meta"]["style"], font="Verdana"), {})
+            theme_store._write(tmp, other)
+            os.utime(os.path.join(tmp, "acme.json"), ns=(1, 1))
+            assert theme_store.get("acme").style["font"] == "Verdana"
+        finally:
+            theme_store.clear_cache()
+    print("✓ Persisted themes survive a restart")
+
+
+if __name__ == "__main__":
+    test_register_and_render_by_id()
+    test_overrides_and_unknown_ids()
+    test_persisted_themes_survive_restart()
+    print("\n✅ All tests passed!")
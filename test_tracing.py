@@ -0,0 +1,167 @@
+"""
+Tests for span-level tracing (OTLP/JSON to a file or a collector).
+The last test starts a real uvicorn server and a stub OTLP collector.
+"""
+import asyncio
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import app
+import loadtest
+import tracing
+import testutil
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Trace", "deckTitle": "Spans"},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Hello"},
+            {"id": "2", "type": "agenda", "title": "Agenda", "items": ["a", "b", "c"]},
+            {"id": "3", "type": "investment", "title": "Invest",
+             "items": [{"label": "Basic", "value": "1.000 €"}, {"label": "Plus", "value": "2.000 €"}]},
+        ]
+    }
+}
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def _spans(requests):
+    """OTLP export requests → flat list of spans with plain attribute dicts."""
+    out = []
+    for req in requests:
+        for rs in req["resourceSpans"]:
+            for ss in rs["scopeSpans"]:
+                for sp in ss["spans"]:
+                    attrs = {a["key"]: next(iter(a["value"].values())) for a in sp["attributes"]}
+                    out.append(dict(sp, attributes=attrs))
+    return out
+
+
+def test_render_spans_in_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    with testutil.env(PPTX_TRACE_FILE=path, PPTX_TRACE_SAMPLE_RATE=1):
+        with tracing.trace("test") as root:
+            app.render_pptx(PAYLOAD)
+        assert tracing.flush()
+    spans = _spans(json.loads(line) for line in path.read_text().splitlines())
+    names = [sp["name"] for sp in spans]
+    for name, count in (("sanitize", 1), ("sanitize_slide", 3), ("compile", 1), ("plan_slide", 3),
+                        ("execute", 1), ("draw_slide", 3), ("save", 1), ("test", 1)):
+        assert names.count(name) == count, (name, names)
+    # every span belongs to the one trace and hangs off a span of it
+    ids = {sp["spanId"] for sp in spans}
+    assert {sp["traceId"] for sp in spans} == {root.trace_id}
+    assert all(sp.get("parentSpanId") in ids for sp in spans if sp["name"] != "test")
+    by_id = {sp["spanId"]: sp for sp in spans}
+    assert all(by_id[sp["parentSpanId"]]["name"] == "execute" for sp in spans if sp["name"] == "draw_slide")
+
+    plans = [sp["attributes"] for sp in spans if sp["name"] == "plan_slide"]
+    assert [p["slide.type"] for p in plans] == ["title", "agenda", "investment"]
+    assert plans[1]["slide.bullets"] == "3" and plans[2]["slide.rows"] == "2"
+    draws = [sp["attributes"] for sp in spans if sp["name"] == "draw_slide"]
+    assert [d["slide.number"] for d in draws] == ["1", "2", "3"]
+    save = next(sp for sp in spans if sp["name"] == "save")
+    assert int(save["attributes"]["pptx.bytes"]) > 0
+    assert int(save["startTimeUnixNano"]) <= int(save["endTimeUnixNano"])
+    print("✓ Render pipeline spans exported to file")
+
+
+def test_sampling(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    # no sink: never sampled
+    with testutil.env(PPTX_TRACE_SAMPLE_RATE=1, PPTX_TRACE_FILE="", PPTX_TRACE_OTLP_ENDPOINT=""):
+        assert not tracing.trace("x").recording
+    with testutil.env(PPTX_TRACE_FILE=path, PPTX_TRACE_SAMPLE_RATE=0):
+        with tracing.trace("unsampled") as root:
+            assert not root.recording and tracing.current() is None
+            app.render_pptx(PAYLOAD)
+        # the caller's sampling decision wins over the rate
+        with tracing.trace("remote", traceparent=TRACEPARENT) as remote:
+            assert remote.recording and remote.trace_id == "0af7651916cd43dd8448eb211c80319c"
+        with testutil.env(PPTX_TRACE_SAMPLE_RATE=1):
+            assert not tracing.trace("x", traceparent=TRACEPARENT[:-2] + "00").recording
+            assert tracing.trace("x", traceparent="garbage").recording
+        assert tracing.flush()
+    spans = _spans(json.loads(line) for line in path.read_text().splitlines())
+    assert [sp["name"] for sp in spans] == ["remote"]
+    assert spans[0]["parentSpanId"] == "b7ad6b7169203331"
+    print("✓ Sampling by rate and traceparent")
+
+
+class _Collector(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        assert self.path == "/v1/traces" and self.headers["Content-Type"] == "application/json"
+        self.received.append(json.loads(body))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_requests_exported_to_collector(tmp_path):
+    collector = HTTPServer(("127.0.0.1", 0), _Collector)
+    threading.Thread(target=collector.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{collector.server_port}/v1/traces"
+    port = loadtest._free_port()
+    log = open(tmp_path / "server.log", "wb")
+    proc = loadtest.start_server(port, workers=1, log=log,
+                                 env={"PPTX_TRACE_OTLP_ENDPOINT": endpoint, "PPTX_TRACE_SAMPLE_RATE": "1"})
+    body = json.dumps(PAYLOAD).encode("utf-8")
+
+    async def run():
+        await loadtest.wait_ready("127.0.0.1", port, proc=proc, timeout=60)
+        c = loadtest.HttpClient("127.0.0.1", port, timeout=30)
+        try:
+            rendered = await c.request("POST", "/render/bytes", body,
+                                       {"Content-Type": "application/json", "traceparent": TRACEPARENT})
+            rejected = await c.request("POST", "/render/bytes", b"{}", {"Content-Type": "application/json"})
+        finally:
+            await c.close()
+        return rendered, rejected
+
+    try:
+        (status, headers, _), (bad_status, bad_headers, _) = asyncio.run(run())
+        for _ in range(100):
+            if len({sp["traceId"] for sp in _spans(_Collector.received)}) >= 3:
+                break
+            threading.Event().wait(0.05)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        log.close()
+        collector.shutdown()
+    assert status == 200 and headers["x-pptx-trace-id"] == "0af7651916cd43dd8448eb211c80319c"
+    assert bad_status == 400 and bad_headers["x-pptx-trace-id"] != headers["x-pptx-trace-id"]
+
+    spans = _spans(_Collector.received)
+    trace = [sp for sp in spans if sp["traceId"] == headers["x-pptx-trace-id"]]
+    root = next(sp for sp in trace if sp["name"] == "POST /render/bytes")
+    assert root["parentSpanId"] == "b7ad6b7169203331" and root["kind"] == tracing.SPAN_KIND_SERVER
+    assert root["attributes"]["http.response.status_code"] == "200"
+    assert {"sanitize", "compile", "execute", "save"} <= {sp["name"] for sp in trace}
+    failed = [sp for sp in spans if sp["traceId"] == bad_headers["x-pptx-trace-id"]]
+    assert any(sp["name"] == "sanitize" and sp["status"]["code"] == tracing.STATUS_CODE_ERROR for sp in failed)
+    resource = _Collector.received[0]["resourceSpans"][0]["resource"]["attributes"]
+    assert {"key": "service.name", "value": {"stringValue": "pptx-maker"}} in resource
+    print("✓ HTTP requests exported to an OTLP collector")
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    for test in (test_render_spans_in_file, test_sampling, test_http_requests_exported_to_collector):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("\n✅ All tests passed!")
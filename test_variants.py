@@ -0,0 +1,119 @@
+"""
+Tests for multi-variant rendering (POST /render/variants).
+Runs in-process, no server needed.
+"""
+import base64
+import io
+import json
+import sys
+import zipfile
+
+from fastapi import HTTPException
+from PIL import Image
+from pptx import Presentation
+
+import app
+from json_sanitizer import sanitize_variant, validate_and_sanitize, variants_from_csv
+from pptx_builder import build_pptx
+from render_plan import compile_deck
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def _data_uri(color):
+    bio = io.BytesIO()
+    Image.new("RGB", (90, 30), color).save(bio, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode("ascii")
+
+
+PAYLOAD = {
+    "deck": {
+        "meta": {"customer": "Base", "deckTitle": "Proposal", "date": "2025-03-01",
+                 "style": {"clientLogo": _data_uri((200, 0, 0))}},
+        "slides": [
+            {"id": "1", "type": "title", "title": "Proposal"},
+            {"id": "2", "type": "context", "title": "Context", "content": ["a", "b"]},
+            {"id": "3", "type": "agenda", "title": "Agenda", "items": ["x", "y"]},
+            {"id": "4", "type": "investment", "title": "Invest",
+             "items": [{"label": "Basic", "value": "1.000 €", "note": "once"}]},
+        ]
+    }
+}
+
+
+def _archive(payload):
+    decks, filenames = app._variant_decks(payload)
+    return decks, zipfile.ZipFile(io.BytesIO(b"".join(app._variant_archive(decks, filenames))))
+
+
+def _texts(data):
+    return [[sh.text_frame.text for sh in s.shapes if sh.has_text_frame] for s in Presentation(io.BytesIO(data)).slides]
+
+
+def test_variants_share_unchanged_slides():
+    base = validate_and_sanitize(PAYLOAD)
+    a = sanitize_variant(base, {"customer": "ACME", "clientLogo": _data_uri((0, 0, 200))})
+    b = sanitize_variant(base, {"customer": "Globex", "slides.2.title": "Globex context"})
+    assert a["meta"]["customer"] == "ACME" and a["meta"]["deckTitle"] == "Proposal"
+    assert a["meta"]["style"]["clientLogo"] != base["meta"]["style"]["clientLogo"]
+    assert b["meta"]["style"] is base["meta"]["style"]
+    assert b["slides"][0] is base["slides"][0] and b["slides"][1]["title"] == "Globex context"
+
+    memo = {}
+    plan_a, plan_b = compile_deck(a, memo=memo), compile_deck(b, memo=memo)
+    assert plan_b["slides"][0] is compile_deck(base, memo=memo)["slides"][0]
+    assert plan_a["slides"][2] == plan_b["slides"][2]
+    assert plan_a == compile_deck(a) and plan_b == compile_deck(b)
+    print("✓ Variants share unchanged slides and plans")
+
+
+def test_archive_matches_single_renders():
+    variants = [
+        {"customer": "ACME", "clientLogo": _data_uri((0, 0, 200))},
+        {"customer": "Globex", "colors": {"primary": "#336699"}},
+        {"customer": "Initech", "slides": {"4": {"title": "Preis"}}, "filename": "initech"},
+        {"customer": "ACME"},
+    ]
+    decks, zf = _archive(dict(PAYLOAD, variants=variants))
+    names = zf.namelist()
+    assert names == ["ACME - Proposal.pptx", "Globex - Proposal.pptx", "initech.pptx",
+                     "ACME - Proposal (2).pptx", "manifest.json"]
+    manifest = json.loads(zf.read("manifest.json"))["variants"]
+    # only the changed slide is drawn for Initech, the rest is copied
+    assert manifest[0]["reusedSlides"] == 0 and manifest[2]["reusedSlides"] == 3
+    assert manifest[1]["reusedSlides"] < 4  # colours change the slides using them
+    for name, deck in zip(names, decks):
+        assert zf.read(name) == build_pptx(deck)
+    assert _texts(zf.read("initech.pptx"))[3][0] == "Preis"
+    print("✓ Archive entries equal single renders")
+
+
+def test_csv_mail_merge_and_errors():
+    text = "customer;colors.primary;slides.3.items\nACME;#112233;\"eins\nzwei\"\nGlobex;;\n"
+    variants = variants_from_csv(text)
+    assert variants == [{"customer": "ACME", "colors.primary": "#112233", "slides.3.items": ["eins", "zwei"]},
+                        {"customer": "Globex"}]
+    decks, zf = _archive(dict(PAYLOAD, csv=text))
+    assert decks[0]["meta"]["style"]["colors"]["primary"] == "#112233"
+    assert _texts(zf.read("ACME - Proposal.pptx"))[2][1] == "eins\n• zwei"
+
+    for bad in ({"variants": []}, {"variants": [{"slides.99.title": "x"}]},
+                {"variants": [{"unknown": 1}]}, {"variants": ["x"]}, {"csv": "customer\n"},
+                {"variants": [{"themeId": "missing"}]}):
+        try:
+            app.render_variants(dict(PAYLOAD, **bad))
+            assert False, f"{bad} must be rejected"
+        except HTTPException as e:
+            assert e.status_code == 400
+    response = app.render_variants(dict(PAYLOAD, variants=[{"customer": "ACME"}]))
+    assert response.media_type == "application/zip" and response.headers["x-pptx-variants"] == "1"
+    print("✓ CSV mail-merge and validation errors")
+
+
+if __name__ == "__main__":
+    test_variants_share_unchanged_slides()
+    test_archive_matches_single_renders()
+    test_csv_mail_merge_and_errors()
+    print("\n✅ All tests passed!")
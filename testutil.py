@@ -0,0 +1,24 @@
+"""
+Shared helpers for the test scripts (imported by the test_*.py files, no tests itself).
+"""
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def env(**values):
+    """Sets environment variables for the block (None unsets one), then restores the previous values."""
+    old = {k: os.environ.get(k) for k in values}
+    for k, v in values.items():
+        if v is None:
+            os.environ.pop(k, None)
+        else:
+            os.environ[k] = str(v)
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
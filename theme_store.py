@@ -0,0 +1,203 @@
+"""
+Theme Registry for PPTX Maker
+Named styles (font, colours, logos) registered once and referenced by id.
+
+    POST /themes   {"id": "acme", "font": "Arial", "colors": {...}, "logo": "data:image/png;base64,..."}
+    POST /render   {"deck": {"meta": {"style": {"themeId": "acme"}, ...}, ...}}
+
+A theme is validated by the sanitizer once at registration; what is stored here
+is the finished `meta.style` dict, so themed render requests skip colour and
+logo validation. Inline logos of a theme are pinned: their optimized bytes are
+kept with the theme and put back into logo_store should its LRU have evicted them.
+
+Per worker the registry is a bounded LRU. With PPTX_THEME_DIR set, themes are
+also written there as JSON (logos included), so every worker and restarts see
+them, and a theme re-registered by another worker is picked up via the file mtime.
+"""
+import base64
+import copy
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import logo_store
+
+logger = logging.getLogger(__name__)
+
+_ID_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+LOGO_KEYS = ("logo", "clientLogo")
+
+
+class ThemeError(ValueError):
+    """Raised for invalid theme ids or theme definitions."""
+
+
+class Theme:
+    """A registered theme: the compiled style plus the bytes of its inline logos."""
+
+    __slots__ = ("id", "style", "logos", "mtime_ns")
+
+    def __init__(self, theme_id: str, style: Dict[str, Any], logos: Dict[str, bytes], mtime_ns: int = 0):
+        self.id = theme_id
+        self.style = style
+        self.logos = logos
+        self.mtime_ns = mtime_ns
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"themeId": self.id, "style": copy.deepcopy(self.style)}
+
+
+def _max_items() -> int:
+    return int(os.getenv("PPTX_THEME_CACHE_MAX_ITEMS", "128"))
+
+
+def _theme_dir() -> Optional[str]:
+    return os.getenv("PPTX_THEME_DIR") or None
+
+
+_lock = threading.Lock()
+_themes: "OrderedDict[str, Theme]" = OrderedDict()
+
+
+def is_valid_id(theme_id: object) -> bool:
+    return isinstance(theme_id, str) and bool(_ID_RE.match(theme_id))
+
+
+def _path(directory: str, theme_id: str) -> str:
+    return os.path.join(directory, theme_id + ".json")
+
+
+def _cache_put(theme: Theme) -> None:
+    limit = max(1, _max_items())
+    with _lock:
+        _themes[theme.id] = theme
+        _themes.move_to_end(theme.id)
+        while len(_themes) > limit:
+            evicted, _ = _themes.popitem(last=False)
+            logger.info(f"Evicted theme '{evicted}' from registry")
+
+
+def _write(directory: str, theme: Theme) -> int:
+    """Atomically writes `theme` as JSON, returns the file's mtime_ns."""
+    os.makedirs(directory, exist_ok=True)
+    doc = {
+        "id": theme.id,
+        "style": theme.style,
+        "logos": {ref: base64.b64encode(data).decode("ascii") for ref, data in theme.logos.items()},
+    }
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, _path(directory, theme.id))
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return os.stat(_path(directory, theme.id)).st_mtime_ns
+
+
+def _load(directory: str, theme_id: str) -> Optional[Theme]:
+    path = _path(directory, theme_id)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        logos = {ref: base64.b64decode(data) for ref, data in (doc.get("logos") or {}).items()}
+        return Theme(theme_id, doc["style"], logos, mtime_ns)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Could not load theme '{theme_id}' from {path}: {e}")
+        return None
+
+
+def register(theme_id: str, style: Dict[str, Any]) -> Theme:
+    """
+    Stores an already sanitized style under `theme_id` (replacing an existing theme).
+
+    Raises:
+        ThemeError: If the id is invalid or an inline logo reference is not in logo_store
+    """
+    if not is_valid_id(theme_id):
+        raise ThemeError(f"Invalid theme id '{theme_id}' - use 1-64 letters, digits, '_', '-' or '.'")
+    style = copy.deepcopy(style)
+    style.pop("themeId", None)
+    logos = {}
+    for key in LOGO_KEYS:
+        ref = style.get(key)
+        if logo_store.is_logo_ref(ref):
+            data = logo_store.get_logo(ref)
+            if data is None:
+                raise ThemeError(f"Theme {key} '{ref}' is not known - send the logo as base64 or data URI")
+            logos[ref] = data
+
+    theme = Theme(theme_id, style, logos)
+    directory = _theme_dir()
+    if directory:
+        theme.mtime_ns = _write(directory, theme)
+    _cache_put(theme)
+    logger.info(f"Registered theme '{theme_id}' ({len(logos)} inline logo(s))")
+    return theme
+
+
+def get(theme_id: str) -> Optional[Theme]:
+    """The registered theme (from memory, or PPTX_THEME_DIR if newer there) or None."""
+    if not is_valid_id(theme_id):
+        return None
+    with _lock:
+        theme = _themes.get(theme_id)
+        if theme is not None:
+            _themes.move_to_end(theme_id)
+
+    directory = _theme_dir()
+    if directory:
+        try:
+            mtime_ns = os.stat(_path(directory, theme_id)).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns is not None and (theme is None or mtime_ns != theme.mtime_ns):
+            loaded = _load(directory, theme_id)
+            if loaded is not None:
+                theme = loaded
+                _cache_put(theme)
+    return theme
+
+
+def resolve(theme_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Copy of the theme's compiled style, ready for meta.style (or None if unknown).
+    Re-pins the theme's inline logos into logo_store.
+    """
+    theme = get(theme_id)
+    if theme is None:
+        return None
+    for ref, data in theme.logos.items():
+        if not logo_store.has_logo(ref):
+            logo_store.preload(ref, data)
+    style = theme.style
+    return {**style, "colors": dict(style.get("colors", {}))}
+
+
+def list_ids() -> List[str]:
+    ids = set()
+    with _lock:
+        ids.update(_themes)
+    directory = _theme_dir()
+    if directory and os.path.isdir(directory):
+        ids.update(name[:-5] for name in os.listdir(directory)
+                   if name.endswith(".json") and is_valid_id(name[:-5]))
+    return sorted(ids)
+
+
+def clear_cache() -> None:
+    with _lock:
+        _themes.clear()
@@ -0,0 +1,396 @@
+"""
+Span-level tracing for PPTX Maker.
+
+/metrics says that renders are slow, a trace says which slide or helper is:
+every sampled request gets a root span, and the pipeline opens child spans
+around its stages (sanitize, sanitize_slide, compile, plan_slide, execute,
+draw_slide, draw_layout, draw_picture, save) with attributes such as slide
+type, bullet and row counts.
+
+    with tracing.span("save") as sp:
+        data = ...
+        sp.set_attribute("pptx.bytes", len(data))
+
+The current span lives in a context variable, so spans opened in the
+threadpool (or a render thread started via contextvars.copy_context) are
+children of the request's root span without being passed around.
+
+Sampling is decided once per request (PPTX_TRACE_SAMPLE_RATE, 0..1; a W3C
+`traceparent` header from the caller decides instead when present). For an
+unsampled request span() is a context variable lookup returning a shared
+no-op object – tracing costs nothing measurable when it is off, which is
+the default.
+
+Finished traces are exported in OTLP/JSON (an ExportTraceServiceRequest,
+{"resourceSpans": [...]}) by a background thread, so exporting never delays
+a response:
+
+    - PPTX_TRACE_FILE: one JSON object per line appended to that file
+    - PPTX_TRACE_OTLP_ENDPOINT: POSTed to an OTLP/HTTP collector,
+      e.g. http://localhost:4318/v1/traces
+
+Without a sink nothing is sampled. Slides drawn in the parallel process pool
+(PPTX_PARALLEL_WORKERS) are covered by their "execute" span only.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "pptx-maker"
+TRACE_HEADER = "x-pptx-trace-id"
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_ERROR = 2
+
+# finished traces waiting for the exporter; beyond that they are dropped (counted)
+_QUEUE_SIZE = 1000
+# traces written / POSTed together
+_BATCH_SIZE = 64
+_EXPORT_TIMEOUT_SECONDS = 5.0
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def sample_rate() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.getenv("PPTX_TRACE_SAMPLE_RATE", "0"))))
+    except ValueError:
+        logger.warning("Invalid PPTX_TRACE_SAMPLE_RATE, tracing disabled")
+        return 0.0
+
+
+def _sinks() -> Tuple[Optional[str], Optional[str]]:
+    return os.getenv("PPTX_TRACE_FILE") or None, os.getenv("PPTX_TRACE_OTLP_ENDPOINT") or None
+
+
+def enabled() -> bool:
+    """True if traces have somewhere to go."""
+    file_path, endpoint = _sinks()
+    return bool(file_path or endpoint)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class _Trace:
+    """Spans of one sampled request; exported when its root span ends."""
+
+    __slots__ = ("trace_id", "spans", "exported")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.exported = False
+
+
+class Span:
+    """One timed operation. Use as context manager (via span()/trace()), not directly."""
+
+    __slots__ = ("_trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "error", "_root", "_token")
+
+    recording = True
+
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[str], kind: int,
+                 attributes: Optional[Mapping[str, Any]], root: bool = False):
+        self._trace = trace
+        self._root = root
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes) if attributes else {}
+        self.error: Optional[str] = None
+        self.start_ns = 0
+        self.end_ns = 0
+
+    @property
+    def trace_id(self) -> str:
+        return self._trace.trace_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_error(self, message: str) -> None:
+        self.error = message
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        if exc is not None and self.error is None:
+            self.attributes["exception.type"] = exc_type.__name__
+            self.error = str(exc) or exc_type.__name__
+        trace = self._trace
+        if self._root:
+            # the request is done: ship its spans
+            trace.spans.append(self)
+            trace.exported = True
+            _export(trace.spans)
+            trace.spans = []
+        elif trace.exported:
+            # outlived the request (e.g. a render thread still finishing): ship it on its own
+            _export([self])
+        else:
+            trace.spans.append(self)
+
+
+class _NoopSpan:
+    """Returned for unsampled requests: does nothing, costs nothing."""
+
+    __slots__ = ()
+
+    recording = False
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("pptx_span", default=None)
+
+
+def current() -> Optional[Span]:
+    """Innermost open span of the current (sampled) request, None otherwise."""
+    return _current.get()
+
+
+def span(name: str, attributes: Optional[Mapping[str, Any]] = None):
+    """Child span of the current span; a no-op outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent._trace, name, parent.span_id, SPAN_KIND_INTERNAL, attributes)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """W3C trace context header → (trace_id, parent_span_id, sampled), None if absent/invalid."""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def trace(name: str, attributes: Optional[Mapping[str, Any]] = None,
+          traceparent: Optional[str] = None, kind: int = SPAN_KIND_SERVER):
+    """
+    Root span of a request (or a child span if a trace is already open).
+    Sampled by PPTX_TRACE_SAMPLE_RATE, or by the sampled flag of `traceparent`.
+    """
+    if _current.get() is not None:
+        return span(name, attributes)
+    if not enabled():
+        return _NOOP
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+    else:
+        trace_id, parent_id = _new_id(128), None
+        rate = sample_rate()
+        sampled = rate > 0 and (rate >= 1 or random.random() < rate)
+    if not sampled:
+        return _NOOP
+    metrics.incr("tracing.sampled")
+    return Span(_Trace(trace_id), name, parent_id, kind, attributes, root=True)
+
+
+# ---- OTLP/JSON encoding ----
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_span(sp: Span) -> Dict[str, Any]:
+    out = {
+        "traceId": sp.trace_id,
+        "spanId": sp.span_id,
+        "name": sp.name,
+        "kind": sp.kind,
+        "startTimeUnixNano": str(sp.start_ns),
+        "endTimeUnixNano": str(sp.end_ns),
+        "attributes": _otlp_attributes(sp.attributes),
+    }
+    if sp.parent_id:
+        out["parentSpanId"] = sp.parent_id
+    if sp.error is not None:
+        out["status"] = {"code": STATUS_CODE_ERROR, "message": sp.error}
+    return out
+
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """ExportTraceServiceRequest (OTLP/JSON) for `spans`."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME,
+                                                     "process.pid": os.getpid()})},
+        "scopeSpans": [{
+            "scope": {"name": __name__},
+            "spans": [_otlp_span(sp) for sp in spans],
+        }],
+    }]}
+
+
+# ---- Export (background thread) ----
+
+_queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=_QUEUE_SIZE)
+_exporter: Optional[threading.Thread] = None
+_exporter_lock = threading.Lock()
+
+
+def _export(spans: List[Span]) -> None:
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+                _exporter.start()
+    try:
+        _queue.put_nowait(spans)
+    except queue.Full:
+        metrics.incr("tracing.dropped_spans", len(spans))
+
+
+def _write_file(path: str, body: bytes) -> None:
+    # one write() per batch with O_APPEND: lines of several workers do not interleave
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, body + b"\n")
+    finally:
+        os.close(fd)
+
+
+def _post(endpoint: str, body: bytes) -> None:
+    request = urllib.request.Request(endpoint, data=body, method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=_EXPORT_TIMEOUT_SECONDS) as response:
+        response.read()
+
+
+def _export_batch(spans: List[Span]) -> None:
+    file_path, endpoint = _sinks()
+    body = json.dumps(to_otlp(spans), separators=(",", ":")).encode("utf-8")
+    for sink, send in ((file_path, _write_file), (endpoint, _post)):
+        if not sink:
+            continue
+        try:
+            send(sink, body)
+        except Exception as e:
+            metrics.incr("tracing.export_errors")
+            logger.warning(f"Trace export to {sink} failed: {e}")
+    metrics.incr("tracing.exported_spans", len(spans))
+
+
+def _export_loop() -> None:
+    while True:
+        batches = [_queue.get()]
+        while len(batches) < _BATCH_SIZE:
+            try:
+                batches.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _export_batch([sp for batch in batches for sp in batch])
+        except Exception:
+            logger.exception("Trace export failed")
+        finally:
+            for _ in batches:
+                _queue.task_done()
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Waits until queued traces are exported; False if `timeout` passed first."""
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+atexit.register(flush, 2.0)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: root span per HTTP request (method, path, status code).
+    Wraps the whole response, so streamed bodies (progress events, ZIP archives)
+    are part of the request's trace. Sampled responses carry X-PPTX-Trace-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = dict(scope.get("headers") or []).get(b"traceparent")
+        root = trace(f"{scope['method']} {scope['path']}",
+                     {"http.request.method": scope["method"], "url.path": scope["path"]},
+                     traceparent=traceparent.decode("latin-1") if traceparent else None)
+        if not root.recording:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                root.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    root.set_error(f"HTTP {status}")
+                message = dict(message, headers=list(message.get("headers") or [])
+                               + [(TRACE_HEADER.encode("latin-1"), root.trace_id.encode("latin-1"))])
+            await send(message)
+
+        with root:
+            await self.app(scope, receive, send_traced)